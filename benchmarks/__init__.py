@@ -0,0 +1,55 @@
+"""
+Benchmarks de performance de StockManager.
+
+Chaque module se lance depuis la racine du projet avec
+`python -m benchmarks.<module>` et travaille sur une base SQLite
+temporaire : la base de développement n'est jamais modifiée.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+
+def preparer_django(chemin_base=None, migrer=True, profil_sqlite=None):
+    """Configure Django sur une base SQLite (temporaire par défaut) migrée.
+
+    profil_sqlite='production' applique les options et PRAGMA SQLite de
+    production (SQLITE_OPTIONS_PRODUCTION, SQLITE_PRAGMAS_PRODUCTION).
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockmanager.settings')
+    from django.conf import settings
+
+    if chemin_base is None:
+        dossier = tempfile.mkdtemp(prefix='stockmanager-bench-')
+        atexit.register(shutil.rmtree, dossier, ignore_errors=True)
+        chemin_base = os.path.join(dossier, 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = chemin_base
+    if profil_sqlite == 'production':
+        settings.DATABASES['default']['OPTIONS'] = dict(settings.SQLITE_OPTIONS_PRODUCTION)
+        settings.SQLITE_PRAGMAS = settings.SQLITE_PRAGMAS_PRODUCTION
+    # Comme en production : en DEBUG, chaque requête SQL est formatée et
+    # conservée, ce qui fausse les mesures des écritures en masse
+    settings.DEBUG = False
+    # Les benchmarks interrogent les vues avec le client de test
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    if migrer:
+        call_command('migrate', verbosity=0)
+    return chemin_base
+
+
+def rss_actuel():
+    """Mémoire résidente actuelle du processus, en octets (Linux)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
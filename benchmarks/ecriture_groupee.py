@@ -0,0 +1,118 @@
+"""
+Débit de saisie des mouvements : un commit par requête ou écriture groupée.
+
+Des threads (comme ceux d'un worker gunicorn --threads) enregistrent des
+mouvements via inventory.ecriture_groupee.enregistrer_mouvement, d'abord
+avec un commit par mouvement, puis avec l'écriture groupée active. La base
+est temporaire, avec le profil SQLite de production.
+
+    python -m benchmarks.ecriture_groupee --duree 10 --threads 8 --fenetre 20
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+
+def _saisir(produits, depart, fin, resultats):
+    import random
+
+    from django.db import connection
+
+    from inventory.ecriture_groupee import enregistrer_mouvement
+    from inventory.models import Mouvement
+
+    hasard = random.Random(threading.get_ident())
+    durees = []
+    erreurs = 0
+    depart.wait()
+    try:
+        while time.perf_counter() < fin[0]:
+            debut = time.perf_counter()
+            try:
+                enregistrer_mouvement(Mouvement(
+                    produit_id=hasard.choice(produits),
+                    type_mouvement='entree',
+                    quantite=1,
+                    commentaire='Бенчмарк',
+                ))
+                durees.append(time.perf_counter() - debut)
+            except Exception:
+                erreurs += 1
+    finally:
+        connection.close()
+    resultats.append((durees, erreurs))
+
+
+def mesurer(groupee, options, produits):
+    """Lance les threads de saisie ; retourne (mouvements/s, p95 ms, erreurs)"""
+    from django.conf import settings
+
+    settings.ECRITURE_GROUPEE = {
+        **settings.ECRITURE_GROUPEE,
+        'ACTIF': groupee,
+        'FENETRE_MS': options.fenetre,
+        'TAILLE_MAX': options.taille_max,
+    }
+    depart = threading.Event()
+    fin = [0.0]
+    resultats = []
+    threads = [
+        threading.Thread(target=_saisir, args=(produits, depart, fin, resultats))
+        for _ in range(options.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    fin[0] = time.perf_counter() + options.duree
+    depart.set()
+    for thread in threads:
+        thread.join()
+    durees = [d for durees_thread, _ in resultats for d in durees_thread]
+    erreurs = sum(e for _, e in resultats)
+    p95 = statistics.quantiles(durees, n=20)[-1] * 1000 if len(durees) > 1 else 0
+    return len(durees) / options.duree, p95, erreurs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duree', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--produits', type=int, default=200)
+    parser.add_argument('--fenetre', type=int, default=20,
+                        help="fenêtre de regroupement en millisecondes")
+    parser.add_argument('--taille-max', type=int, default=50)
+    parser.add_argument('--synchronous', default=None,
+                        help="remplace le PRAGMA synchronous du profil (ex. FULL)")
+    options = parser.parse_args()
+
+    from benchmarks import preparer_django
+
+    preparer_django(profil_sqlite='production')
+    from decimal import Decimal
+
+    from django.conf import settings
+
+    if options.synchronous:
+        settings.SQLITE_PRAGMAS = {
+            **settings.SQLITE_PRAGMAS, 'synchronous': options.synchronous
+        }
+    from inventory.models import Produit
+
+    produits = [
+        Produit.objects.create(
+            description=f"Товар {i:04d}",
+            cout_achat=Decimal('10.00'),
+            prix_vente=Decimal('15.00'),
+        ).pk
+        for i in range(options.produits)
+    ]
+
+    print(f"{'mode':>18} {'mouvements/s':>13} {'p95 ms':>8} {'erreurs':>8}")
+    for groupee, nom in ((False, 'commit par requête'), (True, 'écriture groupée')):
+        debit, p95, erreurs = mesurer(groupee, options, produits)
+        print(f"{nom:>18} {debit:>13.0f} {p95:>8.1f} {erreurs:>8}")
+
+
+if __name__ == '__main__':
+    main()
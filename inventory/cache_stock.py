@@ -0,0 +1,187 @@
+"""
+Cache partagé entre workers des calculs de stock et de prix par produit.
+
+Stock, statut, prix et coût courants et valorisation sont rangés sous des
+clés versionnées. Chaque écriture sur un produit (mouvement, prix, coût,
+fiche) lui attribue un nouveau jeton de version : les anciennes entrées ne
+sont plus jamais lues et expirent d'elles-mêmes, sans effacement à
+coordonner entre processus. Les jetons sont aléatoires plutôt que des
+compteurs, pour qu'une version évincée du cache ne puisse jamais retomber
+sur une ancienne valeur.
+
+Les succès et échecs sont comptés en mémoire par chaque worker et versés
+dans le cache partagé au plus toutes les INTERVALLE_STATISTIQUES secondes
+(et à la sortie du processus), pour ne pas ajouter une lecture et une
+écriture du cache à chaque consultation.
+"""
+
+import atexit
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIXE = 'inventaire'
+CLE_GENERATION = f'{PREFIXE}:generation'
+# Version globale, renouvelée à chaque écriture (fragments du tableau de bord)
+CLE_VERSION_INVENTAIRE = f'{PREFIXE}:version'
+CLES_STATISTIQUES = {
+    'hits': f'{PREFIXE}:stats:hits',
+    'misses': f'{PREFIXE}:stats:misses',
+}
+# Intervalle minimal entre deux versements des compteurs (secondes)
+INTERVALLE_STATISTIQUES = 10
+CHAMPS = ('stock', 'statut', 'prix_vente_courant', 'cout_achat_courant', 'valeur')
+
+
+def _jeton():
+    return uuid.uuid4().hex[:16]
+
+
+def _cle_version(pk):
+    return f'{PREFIXE}:version:{pk}'
+
+
+def _versions(pks):
+    """Génération globale et jeton de version de chaque produit"""
+    cles = [CLE_GENERATION] + [_cle_version(pk) for pk in pks]
+    trouvees = cache.get_many(cles)
+    manquantes = [cle for cle in cles if cle not in trouvees]
+    if manquantes:
+        # Première lecture (ou éviction) : un jeton neuf, jamais utilisé
+        for cle in manquantes:
+            cache.add(cle, _jeton(), timeout=None)
+        trouvees.update(cache.get_many(manquantes))
+    generation = trouvees[CLE_GENERATION]
+    return generation, {pk: trouvees[_cle_version(pk)] for pk in pks}
+
+
+_compteurs = {'hits': 0, 'misses': 0}
+_verrou_compteurs = threading.Lock()
+_dernier_versement = [time.monotonic()]
+
+
+def _compter(hits, misses):
+    """Cumule les compteurs du worker ; les verse si c'est l'heure"""
+    with _verrou_compteurs:
+        _compteurs['hits'] += hits
+        _compteurs['misses'] += misses
+        if time.monotonic() - _dernier_versement[0] < INTERVALLE_STATISTIQUES:
+            return
+    _verser_statistiques()
+
+
+@atexit.register
+def _verser_statistiques():
+    """Ajoute les compteurs du worker aux compteurs partagés
+    (approximatifs sous forte concurrence) puis les remet à zéro"""
+    with _verrou_compteurs:
+        a_verser = {nom: n for nom, n in _compteurs.items() if n}
+        _compteurs.update(hits=0, misses=0)
+        _dernier_versement[0] = time.monotonic()
+    if not a_verser:
+        return
+    cles = {CLES_STATISTIQUES[nom]: n for nom, n in a_verser.items()}
+    valeurs = cache.get_many(cles)
+    cache.set_many(
+        {cle: valeurs.get(cle, 0) + n for cle, n in cles.items()}, timeout=None
+    )
+
+
+def version_inventaire():
+    """Jeton de la version courante de l'inventaire"""
+    version = cache.get(CLE_VERSION_INVENTAIRE)
+    if version is None:
+        cache.add(CLE_VERSION_INVENTAIRE, _jeton(), timeout=None)
+        version = cache.get(CLE_VERSION_INVENTAIRE)
+    return version
+
+
+def infos_produits(pks):
+    """Retourne {pk: {stock, statut, prix, coût, valeur}} via le cache.
+
+    Les produits absents du cache sont calculés en une seule requête
+    (Produit.objects.with_stock()) puis stockés.
+    """
+    from .models import Produit
+
+    pks = list(dict.fromkeys(pks))
+    if not pks:
+        return {}
+    generation, versions = _versions(pks)
+    cles = {
+        pk: f'{PREFIXE}:produit:{pk}:{generation}:{version}'
+        for pk, version in versions.items()
+    }
+    trouvees = cache.get_many(cles.values())
+    infos = {pk: trouvees[cle] for pk, cle in cles.items() if cle in trouvees}
+    manquants = [pk for pk in pks if pk not in infos]
+    if manquants:
+        calculees = {
+            ligne.pop('pk'): ligne
+            for ligne in Produit.objects.with_stock().filter(
+                pk__in=manquants
+            ).values('pk', *CHAMPS)
+        }
+        cache.set_many({cles[pk]: valeurs for pk, valeurs in calculees.items()})
+        infos.update(calculees)
+    _compter(len(pks) - len(manquants), len(manquants))
+    return infos
+
+
+def infos_produit(pk):
+    """Infos d'un seul produit (None s'il n'existe pas)"""
+    return infos_produits([pk]).get(pk)
+
+
+def invalider_produits(pks):
+    """Attribue une nouvelle version aux produits, tout de suite et au commit.
+
+    Le second passage, après le commit, écarte une valeur recalculée par un
+    autre worker entre l'écriture et la fin de la transaction.
+    """
+    pks = list(pks)
+
+    def renouveler():
+        versions = {_cle_version(pk): _jeton() for pk in pks}
+        versions[CLE_VERSION_INVENTAIRE] = _jeton()
+        cache.set_many(versions, timeout=None)
+
+    renouveler()
+    transaction.on_commit(renouveler)
+
+
+def invalider_tout():
+    """Invalide tous les produits (recalculs en masse, mises à jour directes)"""
+    def renouveler():
+        cache.set_many(
+            {CLE_GENERATION: _jeton(), CLE_VERSION_INVENTAIRE: _jeton()},
+            timeout=None
+        )
+
+    renouveler()
+    transaction.on_commit(renouveler)
+
+
+def statistiques():
+    """Compteurs de succès et d'échecs cumulés par tous les workers
+    (ceux des autres workers au dernier versement)"""
+    _verser_statistiques()
+    valeurs = cache.get_many(CLES_STATISTIQUES.values())
+    hits = valeurs.get(CLES_STATISTIQUES['hits'], 0)
+    misses = valeurs.get(CLES_STATISTIQUES['misses'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': hits / total if total else None,
+    }
+
+
+def reinitialiser_statistiques():
+    with _verrou_compteurs:
+        _compteurs.update(hits=0, misses=0)
+        _dernier_versement[0] = time.monotonic()
+    cache.delete_many(CLES_STATISTIQUES.values())
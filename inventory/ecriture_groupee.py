@@ -0,0 +1,170 @@
+"""
+Écriture groupée des mouvements (group commit).
+
+Chaque saisie de mouvement valide sa propre transaction, et chaque commit
+SQLite coûte une synchronisation disque et une prise du verrou d'écriture.
+Lorsque settings.ECRITURE_GROUPEE['ACTIF'] est vrai, les mouvements soumis
+par les threads d'un même worker sont confiés à un thread écrivain qui les
+enregistre ensemble : le lot est validé après FENETRE_MS millisecondes ou
+TAILLE_MAX mouvements (plus tôt si toutes les requêtes en attente y sont
+déjà), en une seule transaction (Mouvement.enregistrer_lot :
+une insertion, un solde par produit). Si le lot échoue, ses mouvements sont
+repris un par un et seul le mouvement fautif est refusé. La
+requête ne reçoit sa réponse qu'une fois son lot validé : l'accusé de
+réception reste celui d'une écriture par requête. Si l'attente dépasse
+ATTENTE_MAX, le mouvement encore en file est annulé avant que la requête
+n'échoue ; s'il est déjà dans un lot en cours d'écriture, la requête attend
+l'issue de ce lot.
+
+Les workers gunicorn doivent avoir plusieurs threads (--threads) pour que
+des saisies simultanées se retrouvent dans le même lot. Mesure :
+benchmarks/ecriture_groupee.py.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'ACTIF': False,
+    'FENETRE_MS': 20,
+    'TAILLE_MAX': 50,
+    # Attente maximale de la requête avant d'abandonner (secondes)
+    'ATTENTE_MAX': 30,
+}
+
+
+def configuration():
+    return {**CONFIGURATION_DEFAUT, **getattr(settings, 'ECRITURE_GROUPEE', {})}
+
+
+class _Demande:
+    """Mouvement en attente d'écriture et signal de fin pour la requête"""
+
+    def __init__(self, mouvement):
+        self.mouvement = mouvement
+        self.erreur = None
+        self.terminee = threading.Event()
+        # 'attente', puis 'prise' par l'écrivain ou 'annulee' par la requête
+        # (toujours sous _verrou)
+        self.etat = 'attente'
+
+
+_file = queue.Queue()
+_verrou = threading.Lock()
+# Requêtes en attente de leur lot : quand toutes sont dans le lot courant,
+# personne d'autre ne peut le rejoindre et la fenêtre se ferme aussitôt
+_ecrivain = {'thread': None, 'en_attente': 0}
+
+
+def _ecrire_lot(lot):
+    """Enregistre le lot en une transaction.
+
+    Le lot entier passe par Mouvement.enregistrer_lot ; s'il échoue, les
+    mouvements sont repris un par un, chacun dans son point de sauvegarde,
+    pour que seul le mouvement fautif soit refusé.
+    """
+    from .models import Mouvement
+
+    try:
+        close_old_connections()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Mouvement.enregistrer_lot(d.mouvement for d in lot)
+            except Exception:
+                for demande in lot:
+                    demande.mouvement.pk = None
+                    demande.mouvement._state.adding = True
+                    try:
+                        with transaction.atomic():
+                            demande.mouvement.save()
+                    except Exception as exc:
+                        demande.erreur = exc
+    except Exception as exc:
+        # Échec du commit : aucun mouvement du lot n'est enregistré
+        logger.exception("Échec de l'écriture groupée de %d mouvements", len(lot))
+        for demande in lot:
+            if demande.erreur is None:
+                demande.erreur = exc
+    finally:
+        for demande in lot:
+            demande.terminee.set()
+
+
+def _boucle_ecrivain():
+    while True:
+        lot = [_file.get()]
+        config = configuration()
+        limite = time.monotonic() + config['FENETRE_MS'] / 1000
+        while len(lot) < config['TAILLE_MAX']:
+            if _file.empty() and len(lot) >= _ecrivain['en_attente']:
+                break
+            reste = limite - time.monotonic()
+            if reste <= 0:
+                break
+            try:
+                lot.append(_file.get(timeout=reste))
+            except queue.Empty:
+                break
+        with _verrou:
+            lot = [d for d in lot if d.etat == 'attente']
+            for demande in lot:
+                demande.etat = 'prise'
+        if lot:
+            _ecrire_lot(lot)
+
+
+def _demarrer_ecrivain():
+    with _verrou:
+        thread = _ecrivain['thread']
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(
+                target=_boucle_ecrivain, name='ecriture-groupee', daemon=True
+            )
+            thread.start()
+            _ecrivain['thread'] = thread
+
+
+def enregistrer_mouvement(mouvement):
+    """Enregistre un mouvement, groupé avec d'autres si l'option est active.
+
+    Ne rend la main qu'une fois le mouvement validé en base ; une erreur
+    d'écriture est relevée dans l'appelant comme avec mouvement.save().
+    Dans une transaction en cours, le mouvement est enregistré directement
+    pour rester dans cette transaction.
+    """
+    config = configuration()
+    if not config['ACTIF'] or connection.in_atomic_block:
+        mouvement.save()
+        return mouvement
+
+    # Lectures des prix dans la requête : l'écrivain n'a plus qu'à écrire
+    mouvement.figer_prix()
+    demande = _Demande(mouvement)
+    _demarrer_ecrivain()
+    with _verrou:
+        _ecrivain['en_attente'] += 1
+    try:
+        _file.put(demande)
+        if not demande.terminee.wait(config['ATTENTE_MAX']):
+            with _verrou:
+                annulee = demande.etat == 'attente'
+                if annulee:
+                    demande.etat = 'annulee'
+            if annulee:
+                raise TimeoutError("Écriture groupée : mouvement non validé à temps")
+            # Déjà dans un lot : son issue sera connue à la fin de l'écriture
+            demande.terminee.wait()
+    finally:
+        with _verrou:
+            _ecrivain['en_attente'] -= 1
+    if demande.erreur is not None:
+        raise demande.erreur
+    return mouvement
@@ -1,7 +1,58 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+from .historique import debut_du_jour
 from .models import Produit, Mouvement, PrixVente, CoutAchat
 
 
+class SelectRecherche(forms.Select):
+    """Liste déroulante d'objets chargée à la demande.
+
+    Seules l'option vide et la valeur sélectionnée sont rendues dans le
+    HTML ; les autres options sont cherchées page par page auprès de la vue
+    recherche_options (voir templates/inventory/_select_recherche.html).
+    """
+
+    def __init__(self, source, attrs=None, produit_depuis=None):
+        attrs = {
+            'class': 'form-select',
+            'data-recherche-url': reverse_lazy('recherche_options', args=[source]),
+            **(attrs or {}),
+        }
+        if produit_depuis:
+            # Restreint la recherche au produit choisi dans ce champ
+            attrs['data-recherche-produit'] = produit_depuis
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        iterateur = self.choices
+        limites = []
+        if iterateur.field.empty_label is not None:
+            limites.append(('', iterateur.field.empty_label))
+        selection = [v for v in value if v not in (None, '')]
+        precharges = getattr(iterateur.field, 'precharges', None)
+        objets = []
+        if selection and precharges is not None:
+            objets = [
+                precharges[int(v)] for v in selection
+                if str(v).isdigit() and int(v) in precharges
+            ]
+        elif selection:
+            try:
+                objets = list(iterateur.queryset.filter(pk__in=selection))
+            except (ValueError, ValidationError):
+                objets = []
+        limites.extend(iterateur.choice(objet) for objet in objets)
+        self.choices = limites
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterateur
+
+
 class ProduitForm(forms.ModelForm):
     """Formulaire pour les produits"""
     
@@ -83,6 +134,25 @@ class PrixVenteForm(forms.ModelForm):
         }
 
 
+class ChoixPrecharge(forms.ModelChoiceField):
+    """ModelChoiceField résolu dans des objets déjà chargés (precharges).
+
+    Un formset renseigne precharges pour toutes ses lignes en une requête ;
+    sans precharges, le champ se comporte comme un ModelChoiceField.
+    """
+    precharges = None
+
+    def to_python(self, value):
+        if self.precharges is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            return self.precharges[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice'
+            )
+
+
 class MouvementForm(forms.ModelForm):
     """Formulaire pour les mouvements"""
     
@@ -93,8 +163,7 @@ class MouvementForm(forms.ModelForm):
             'prix_vente_utilise', 'cout_achat_utilise', 'commentaire'
         ]
         widgets = {
-            'produit': forms.Select(attrs={
-                'class': 'form-select',
+            'produit': SelectRecherche('produits', attrs={
                 'onchange': 'loadPrixVenteEtCout(this.value)'
             }),
             'type_mouvement': forms.Select(attrs={
@@ -104,14 +173,14 @@ class MouvementForm(forms.ModelForm):
             'quantite': forms.NumberInput(
                 attrs={'class': 'form-control', 'min': '1'}
             ),
-            'prix_vente_utilise': forms.Select(attrs={
-                'class': 'form-select',
-                'style': 'display: none;'
-            }),
-            'cout_achat_utilise': forms.Select(attrs={
-                'class': 'form-select',
-                'style': 'display: none;'
-            }),
+            'prix_vente_utilise': SelectRecherche(
+                'prix', attrs={'style': 'display: none;'},
+                produit_depuis='id_produit'
+            ),
+            'cout_achat_utilise': SelectRecherche(
+                'couts', attrs={'style': 'display: none;'},
+                produit_depuis='id_produit'
+            ),
             'commentaire': forms.Textarea(
                 attrs={
                     'class': 'form-control',
@@ -126,6 +195,20 @@ class MouvementForm(forms.ModelForm):
         self.fields['prix_vente_utilise'].required = False
         self.fields['cout_achat_utilise'].required = False
 
+    def clean(self):
+        """Vérifie que le prix ou le coût choisi appartient au produit.
+
+        Chaque choix est validé par une recherche ciblée sur sa clé
+        (ModelChoiceField), jamais en chargeant tout l'historique.
+        """
+        donnees = super().clean()
+        produit = donnees.get('produit')
+        for champ in ('prix_vente_utilise', 'cout_achat_utilise'):
+            choix = donnees.get(champ)
+            if produit and choix and choix.produit_id != produit.pk:
+                self.add_error(champ, 'Обране значення належить іншому товару.')
+        return donnees
+
 
 class FiltreMovementForm(forms.Form):
     """Formulaire de filtrage des mouvements"""
@@ -158,7 +241,182 @@ class FiltreMovementForm(forms.Form):
     produit = forms.ModelChoiceField(
         queryset=Produit.objects.all(),
         required=False,
-        widget=forms.Select(attrs={'class': 'form-select'}),
+        widget=SelectRecherche('produits'),
+        label='Товар',
+        empty_label='Всі товари'
+    )
+
+    def filtrer(self, mouvements):
+        """Applique les filtres valides à un QuerySet de mouvements.
+
+        Les dates sont converties en intervalles semi-ouverts
+        [début du jour, début du lendemain) dans le fuseau local
+        (Europe/Kyiv), ce qui permet d'utiliser les index sur
+        (produit, date_mouvement) et (type_mouvement, date_mouvement).
+        """
+        if not self.is_valid():
+            return mouvements
+        donnees = self.cleaned_data
+        if donnees['date_debut']:
+            mouvements = mouvements.filter(
+                date_mouvement__gte=debut_du_jour(donnees['date_debut'])
+            )
+        if donnees['date_fin']:
+            mouvements = mouvements.filter(
+                date_mouvement__lt=debut_du_jour(
+                    donnees['date_fin'] + timedelta(days=1)
+                )
+            )
+        if donnees['type_mouvement']:
+            mouvements = mouvements.filter(
+                type_mouvement=donnees['type_mouvement']
+            )
+        if donnees['produit']:
+            mouvements = mouvements.filter(produit=donnees['produit'])
+        return mouvements
+
+
+class StockADateForm(forms.Form):
+    """Formulaire de consultation du stock à une date"""
+    date = forms.DateField(
+        widget=forms.DateInput(
+            attrs={'class': 'form-control', 'type': 'date'}
+        ),
+        label='Дата'
+    )
+    produit = forms.ModelChoiceField(
+        queryset=Produit.objects.all(),
+        required=False,
+        widget=SelectRecherche('produits'),
         label='Товар',
         empty_label='Всі товари'
     )
+
+
+class ImportMouvementsForm(forms.Form):
+    """Formulaire d'import en masse de mouvements (CSV ou JSON lines)"""
+    FORMAT_CHOICES = [
+        ('', 'За розширенням файлу'),
+        ('csv', 'CSV'),
+        ('json', 'JSON lines'),
+    ]
+
+    fichier = forms.FileField(
+        widget=forms.ClearableFileInput(
+            attrs={'class': 'form-control', 'accept': '.csv,.json,.jsonl,.ndjson'}
+        ),
+        label='Файл',
+        help_text='Колонки: produit (код або опис), type_mouvement (entree/sortie), '
+                  'quantite; необов’язково commentaire, prix_unitaire, cout_unitaire'
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Формат'
+    )
+    partiel = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='Імпортувати коректні рядки, пропустивши помилкові'
+    )
+
+
+class LigneDocumentForm(forms.Form):
+    """Ligne d'un document de mouvements (un produit, un type, une quantité)"""
+    produit = ChoixPrecharge(
+        queryset=Produit.objects.all(),
+        widget=SelectRecherche('produits'),
+        label='Товар',
+        empty_label='Оберіть товар'
+    )
+    type_mouvement = forms.ChoiceField(
+        choices=Mouvement.TYPE_CHOICES,
+        initial='entree',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Тип операції'
+    )
+    quantite = forms.IntegerField(
+        min_value=1,
+        max_value=Mouvement.QUANTITE_MAX,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
+        label='Кількість'
+    )
+    prix = forms.DecimalField(
+        required=False,
+        max_digits=10,
+        decimal_places=2,
+        min_value=Decimal('0.00'),
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control', 'step': '0.01', 'placeholder': 'Поточна'
+        }),
+        label='Ціна / собівартість',
+        help_text='Ціна продажу для виходу, собівартість для надходження'
+    )
+
+    def mouvement(self, commentaire=''):
+        """Mouvement non enregistré correspondant à la ligne"""
+        donnees = self.cleaned_data
+        mouvement = Mouvement(
+            produit=donnees['produit'],
+            type_mouvement=donnees['type_mouvement'],
+            quantite=donnees['quantite'],
+            commentaire=commentaire,
+        )
+        if donnees['prix'] is not None:
+            if donnees['type_mouvement'] == 'sortie':
+                mouvement.prix_unitaire = donnees['prix']
+            else:
+                mouvement.cout_unitaire = donnees['prix']
+        return mouvement
+
+
+class BaseDocumentFormSet(forms.BaseFormSet):
+    """Lignes d'un document : tous les produits chargés en une requête"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        cles = set()
+        if self.is_bound:
+            for i in range(self.total_form_count()):
+                valeur = self.data.get(f'{self.add_prefix(i)}-produit', '')
+                if valeur.isdigit():
+                    cles.add(int(valeur))
+        self.produits = Produit.objects.only(
+            'description', *Produit.CHAMPS_PRIX_ACTUELS
+        ).in_bulk(cles) if cles else {}
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.fields['produit'].precharges = self.produits
+        return form
+
+    def mouvements(self, commentaire=''):
+        """Mouvements des lignes remplies, dans l'ordre de saisie"""
+        return [
+            form.mouvement(commentaire) for form in self.forms
+            if form.has_changed()
+        ]
+
+
+DocumentFormSet = forms.formset_factory(
+    LigneDocumentForm,
+    formset=BaseDocumentFormSet,
+    extra=5,
+    min_num=1,
+    validate_min=True,
+    max_num=500,
+    validate_max=True,
+)
+
+
+class DocumentMouvementsForm(forms.Form):
+    """En-tête d'un document de mouvements"""
+    commentaire = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Наприклад: накладна № 123'
+        }),
+        label='Коментар до всіх рядків'
+    )
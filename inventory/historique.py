@@ -0,0 +1,215 @@
+"""
+Stock historique : photographies périodiques (StockSnapshot) et calcul du
+stock à une date donnée à partir de la photographie la plus proche.
+
+Une échéance est une date locale (Europe/Kyiv) ; sa photographie contient
+le stock de chaque produit à la fin de cette journée. Les photographies sont
+denses : à chaque échéance, tous les produits ayant un historique ont une
+ligne, si bien que stock_at() ne rejoue jamais plus d'une période de
+mouvements.
+"""
+
+import calendar
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models import Mouvement, Produit, StockSnapshot
+
+PERIODES = ('jour', 'mois')
+
+
+def debut_du_jour(jour):
+    """Retourne le début (minuit local) d'une journée"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def fin_du_jour(jour):
+    """Retourne la borne exclusive de fin d'une journée"""
+    return debut_du_jour(jour + timedelta(days=1))
+
+
+def echeance_suivante(jour, periode):
+    """Retourne la première échéance strictement après `jour`"""
+    if periode == 'jour':
+        return jour + timedelta(days=1)
+    lendemain = jour + timedelta(days=1)
+    dernier = calendar.monthrange(lendemain.year, lendemain.month)[1]
+    return lendemain.replace(day=dernier)
+
+
+def _moment(quand):
+    """Convertit une date (fin de journée) ou un datetime en instant"""
+    if isinstance(quand, datetime):
+        return quand if timezone.is_aware(quand) else timezone.make_aware(quand)
+    return fin_du_jour(quand)
+
+
+def _couts_actuels(produit_ids=None):
+    """Coût d'achat actuel par produit (valorisation par défaut)"""
+    produits = Produit.objects.order_by()
+    if produit_ids is not None:
+        produits = produits.filter(pk__in=produit_ids)
+    return {
+        pk: negocie if negocie is not None else base
+        for pk, negocie, base in produits.values_list(
+            'pk', 'cout_achat_negocie', 'cout_achat'
+        )
+    }
+
+
+def ecrire_snapshots(periode='mois', jusqu_au=None, reconstruire=False):
+    """Écrit les photographies manquantes jusqu'à `jusqu_au` inclus.
+
+    Par défaut, seules les journées complètes (jusqu'à hier) sont
+    photographiées. Le calcul repart de la dernière photographie existante,
+    sauf si `reconstruire` est vrai. Retourne le nombre d'échéances écrites.
+    """
+    if periode not in PERIODES:
+        raise ValueError(f"Période inconnue : {periode}")
+    if jusqu_au is None:
+        jusqu_au = timezone.localdate() - timedelta(days=1)
+
+    if reconstruire:
+        StockSnapshot.objects.all().delete()
+
+    derniere = StockSnapshot.objects.aggregate(Max('date'))['date__max']
+    etat = {}
+    if derniere:
+        for pk, quantite, cout in StockSnapshot.objects.filter(
+            date=derniere
+        ).values_list('produit_id', 'quantite', 'cout_unitaire'):
+            etat[pk] = [quantite, cout]
+        echeance = echeance_suivante(derniere, periode)
+    else:
+        premier = Mouvement.objects.order_by('date_mouvement').values_list(
+            'date_mouvement', flat=True
+        ).first()
+        if premier is None:
+            return 0
+        echeance = echeance_suivante(
+            timezone.localtime(premier).date() - timedelta(days=1), periode
+        )
+
+    couts = _couts_actuels()
+    ecrites = 0
+    while echeance <= jusqu_au:
+        debut = fin_du_jour(derniere) if derniere else None
+        _ecrire_echeance(etat, debut, echeance, couts)
+        derniere = echeance
+        echeance = echeance_suivante(echeance, periode)
+        ecrites += 1
+    return ecrites
+
+
+def _ecrire_echeance(etat, debut, echeance, couts):
+    """Rejoue les mouvements d'une période et photographie l'état obtenu"""
+    mouvements = Mouvement.objects.filter(date_mouvement__lt=fin_du_jour(echeance))
+    if debut is not None:
+        mouvements = mouvements.filter(date_mouvement__gte=debut)
+    for produit_id, type_mouvement, quantite, cout in mouvements.order_by(
+        'date_mouvement', 'pk'
+    ).values_list(
+        'produit_id', 'type_mouvement', 'quantite', 'cout_unitaire'
+    ).iterator(chunk_size=2000):
+        ligne = etat.setdefault(produit_id, [0, None])
+        ligne[0] += quantite if type_mouvement == 'entree' else -quantite
+        if cout is not None:
+            ligne[1] = cout
+
+    snapshots = []
+    for produit_id, (quantite, cout) in etat.items():
+        if produit_id not in couts:
+            continue  # produit supprimé depuis
+        cout = cout if cout is not None else couts[produit_id]
+        snapshots.append(StockSnapshot(
+            produit_id=produit_id,
+            date=echeance,
+            quantite=quantite,
+            cout_unitaire=cout,
+            valeur=quantite * cout,
+        ))
+    with transaction.atomic():
+        StockSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['produit', 'date'],
+            update_fields=['quantite', 'cout_unitaire', 'valeur'],
+        )
+
+
+def stocks_at(quand, produit_ids=None):
+    """Retourne le stock de chaque produit à une date ou un instant donné.
+
+    `quand` est une date (stock en fin de journée) ou un datetime. Le
+    résultat part de la dernière photographie antérieure et n'ajoute que
+    les mouvements postérieurs : {produit_id: {'quantite', 'cout_unitaire',
+    'valeur'}}. Les produits sans historique à cette date sont omis.
+    """
+    moment = _moment(quand)
+    limite = timezone.localtime(moment).date() - timedelta(days=1)
+    snapshots = StockSnapshot.objects.filter(date__lte=limite)
+    mouvements = Mouvement.objects.filter(date_mouvement__lt=moment)
+    if produit_ids is not None:
+        snapshots = snapshots.filter(produit_id__in=produit_ids)
+        mouvements = mouvements.filter(produit_id__in=produit_ids)
+
+    # produit_id -> [quantité, coût unitaire connu]
+    etat = {}
+    echeance = StockSnapshot.objects.filter(date__lte=limite).aggregate(
+        Max('date')
+    )['date__max']
+    if echeance:
+        for pk, quantite, cout in snapshots.filter(date=echeance).values_list(
+            'produit_id', 'quantite', 'cout_unitaire'
+        ):
+            etat[pk] = [quantite, cout]
+        mouvements = mouvements.filter(
+            date_mouvement__gte=fin_du_jour(echeance)
+        )
+
+    derniers_mouvements = []
+    for pk, entrees, sorties, dernier in mouvements.order_by().values(
+        'produit_id'
+    ).annotate(
+        entrees=Sum('quantite', filter=Q(type_mouvement='entree')),
+        sorties=Sum('quantite', filter=Q(type_mouvement='sortie')),
+        dernier=Max('pk'),
+    ).values_list('produit_id', 'entrees', 'sorties', 'dernier'):
+        ligne = etat.setdefault(pk, [0, None])
+        ligne[0] += (entrees or 0) - (sorties or 0)
+        derniers_mouvements.append(dernier)
+
+    # Le coût figé sur le dernier mouvement prime sur celui de la photographie
+    if derniers_mouvements:
+        for pk, cout in Mouvement.objects.filter(
+            pk__in=derniers_mouvements, cout_unitaire__isnull=False
+        ).values_list('produit_id', 'cout_unitaire'):
+            etat[pk][1] = cout
+
+    couts = _couts_actuels(list(etat))
+    resultat = {}
+    for pk, (quantite, cout) in etat.items():
+        if pk not in couts:
+            continue
+        cout = cout if cout is not None else couts[pk]
+        resultat[pk] = {
+            'quantite': quantite,
+            'cout_unitaire': cout,
+            'valeur': quantite * cout,
+        }
+    return resultat
+
+
+def stock_at(produit, quand):
+    """Retourne le stock d'un produit à une date ou un instant donné"""
+    resultat = stocks_at(quand, [produit.pk])
+    return resultat.get(produit.pk, {
+        'quantite': 0,
+        'cout_unitaire': produit.cout_achat_actuel(),
+        'valeur': Decimal('0.00'),
+    })
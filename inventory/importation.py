@@ -0,0 +1,195 @@
+"""
+Import en masse de mouvements depuis un fichier CSV ou JSON lines.
+
+Une livraison fournisseur de plusieurs centaines de lignes s'importe en
+une fois : produits résolus en une seule requête, toutes les lignes
+validées avant écriture, puis insertion par Mouvement.inserer_en_masse
+(executemany par tranches dans une transaction, un seul ajustement de
+solde par produit). Utilisé par la vue importer_mouvements et par
+`manage.py import_mouvements`.
+
+Colonnes : produit (id ou description exacte), type_mouvement (entree ou
+sortie), quantite, et en option commentaire, prix_unitaire, cout_unitaire.
+"""
+
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import Mouvement, Produit, StockInsuffisant
+
+FORMATS = ('csv', 'json')
+TAILLE_LOT = 1000
+# Au-delà, tout le catalogue est chargé (toujours en une requête) plutôt
+# qu'une liste IN dépassant la limite de paramètres de SQLite
+MAX_CLES_PRODUITS = 900
+
+
+class RapportImport:
+    """Bilan d'un import : lignes lues et importées, erreurs par ligne, débit"""
+
+    def __init__(self):
+        self.lignes = 0
+        self.importees = 0
+        self.erreurs = []
+        self.duree = 0.0
+
+    def ajouter_erreur(self, numero, message):
+        self.erreurs.append((numero, message))
+
+    @property
+    def debit(self):
+        """Lignes importées par seconde"""
+        return self.importees / self.duree if self.duree else 0
+
+
+def format_depuis_nom(nom):
+    """Format déduit de l'extension du fichier (csv par défaut)"""
+    return 'json' if nom.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv'
+
+
+def lire_lignes(fichier, format_fichier):
+    """Génère (numéro de ligne, données, erreur) depuis un flux texte"""
+    if format_fichier == 'csv':
+        lecteur = csv.DictReader(fichier)
+        for donnees in lecteur:
+            yield lecteur.line_num, donnees, None
+        return
+    for numero, texte in enumerate(fichier, start=1):
+        if not texte.strip():
+            continue
+        try:
+            donnees = json.loads(texte)
+        except ValueError:
+            yield numero, None, 'Некоректний JSON'
+            continue
+        if not isinstance(donnees, dict):
+            yield numero, None, 'Очікується об’єкт JSON'
+            continue
+        yield numero, donnees, None
+
+
+def _texte(donnees, champ):
+    valeur = donnees.get(champ)
+    return '' if valeur is None else str(valeur).strip()
+
+
+def _resoudre_produits(cles):
+    """Produits par id et par description, chargés en une seule requête"""
+    produits = Produit.objects.only('description', *Produit.CHAMPS_PRIX_ACTUELS)
+    if len(cles) <= MAX_CLES_PRODUITS:
+        ids = [int(cle) for cle in cles if cle.isdigit()]
+        descriptions = [cle for cle in cles if not cle.isdigit()]
+        produits = produits.filter(Q(pk__in=ids) | Q(description__in=descriptions))
+    par_id = {}
+    par_description = {}
+    for produit in produits:
+        par_id[str(produit.pk)] = produit
+        par_description.setdefault(produit.description, []).append(produit)
+    return par_id, par_description
+
+
+def _decimal(donnees, champ):
+    """Prix ou coût de la ligne, dans les limites du champ de Mouvement"""
+    texte = _texte(donnees, champ)
+    if not texte:
+        return None
+    try:
+        valeur = Decimal(texte.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(texte)
+    if not valeur.is_finite() or valeur < 0:
+        raise ValueError(texte)
+    try:
+        for validateur in Mouvement._meta.get_field(champ).validators:
+            validateur(valeur)
+    except ValidationError:
+        raise ValueError(texte)
+    return valeur
+
+
+def importer(lignes, taille_lot=TAILLE_LOT, partiel=False):
+    """Valide puis importe des lignes issues de lire_lignes().
+
+    Par défaut, une seule ligne invalide annule tout l'import ; avec
+    partiel=True, les lignes valides sont importées et les autres
+    signalées. Des sorties dépassant le stock annulent l'import entier.
+    """
+    rapport = RapportImport()
+    debut = time.perf_counter()
+    lignes = list(lignes)
+    rapport.lignes = len(lignes)
+    par_id, par_description = _resoudre_produits({
+        _texte(donnees, 'produit') for _, donnees, _ in lignes if donnees
+    })
+    types = dict(Mouvement.TYPE_CHOICES)
+
+    mouvements = []
+    for numero, donnees, erreur in lignes:
+        if erreur:
+            rapport.ajouter_erreur(numero, erreur)
+            continue
+        cle = _texte(donnees, 'produit')
+        produit = par_id.get(cle) if cle.isdigit() else None
+        if produit is None:
+            candidats = par_description.get(cle, [])
+            if len(candidats) > 1:
+                rapport.ajouter_erreur(numero, f'Неоднозначний товар: «{cle}»')
+                continue
+            produit = candidats[0] if candidats else None
+        if produit is None:
+            rapport.ajouter_erreur(numero, f'Товар не знайдено: «{cle}»')
+            continue
+        type_mouvement = _texte(donnees, 'type_mouvement')
+        if type_mouvement not in types:
+            rapport.ajouter_erreur(
+                numero, f'Невідомий тип операції: «{type_mouvement}»'
+            )
+            continue
+        try:
+            quantite = int(_texte(donnees, 'quantite'))
+        except ValueError:
+            quantite = 0
+        if quantite <= 0:
+            rapport.ajouter_erreur(
+                numero, 'Кількість має бути цілим числом більше нуля'
+            )
+            continue
+        if quantite > Mouvement.QUANTITE_MAX:
+            rapport.ajouter_erreur(
+                numero, f'Кількість не може перевищувати {Mouvement.QUANTITE_MAX}'
+            )
+            continue
+        try:
+            prix_unitaire = _decimal(donnees, 'prix_unitaire')
+            cout_unitaire = _decimal(donnees, 'cout_unitaire')
+        except ValueError as exc:
+            rapport.ajouter_erreur(numero, f'Некоректна ціна: «{exc}»')
+            continue
+        # Prix figés ici, comme Mouvement.figer_prix() (Mouvement.COLONNES_MASSE)
+        mouvements.append((
+            produit.pk,
+            type_mouvement,
+            quantite,
+            _texte(donnees, 'commentaire'),
+            produit.prix_vente_actuel() if prix_unitaire is None else prix_unitaire,
+            produit.cout_achat_actuel() if cout_unitaire is None else cout_unitaire,
+        ))
+
+    if mouvements and (partiel or not rapport.erreurs):
+        try:
+            rapport.importees = Mouvement.inserer_en_masse(
+                mouvements, taille_lot=taille_lot
+            )
+        except StockInsuffisant as exc:
+            rapport.ajouter_erreur(
+                None,
+                f'Недостатньо товару «{par_id[str(exc.produit_id)].description}» '
+                'для виходів імпорту'
+            )
+    rapport.duree = time.perf_counter() - debut
+    return rapport
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.cache_stock import invalider_tout
+from inventory.models import (
+    CoutAchat, Mouvement, MouvementDaily, PrixVente, Produit, StockSnapshot
+)
+
+# Produits dont les cumuls journaliers sont recalculés ensemble
+LOT_CUMULS = 500
+
+
+class Command(BaseCommand):
+    """Renseigne prix_unitaire et cout_unitaire sur les mouvements existants.
+
+    Le prix ou coût choisi lors du mouvement est repris s'il existe, sinon
+    le prix ou coût actuel du produit (l'historique n'étant pas connu).
+    Les valeurs qui en dépendent sont ensuite remises à jour : cumuls
+    journaliers des produits concernés, photographies de stock depuis le
+    premier mouvement complété et cache partagé des calculs de stock.
+    """
+    help = "Заповнити ціну та собівартість за одиницю для існуючих рухів"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Кількість рухів на одну транзакцію (за замовчуванням 5000)"
+        )
+
+    def handle(self, *args, **options):
+        taille = options['chunk_size']
+        prix = Coalesce(
+            Subquery(PrixVente.objects.filter(
+                pk=OuterRef('prix_vente_utilise')
+            ).values('prix')[:1]),
+            Subquery(Produit.objects.filter(pk=OuterRef('produit')).values(
+                prix=Coalesce('prix_vente_negocie', 'prix_vente')
+            )[:1]),
+        )
+        cout = Coalesce(
+            Subquery(CoutAchat.objects.filter(
+                pk=OuterRef('cout_achat_utilise')
+            ).values('cout')[:1]),
+            Subquery(Produit.objects.filter(pk=OuterRef('produit')).values(
+                cout=Coalesce('cout_achat_negocie', 'cout_achat')
+            )[:1]),
+        )
+        a_completer = Mouvement.objects.filter(
+            Q(prix_unitaire__isnull=True) | Q(cout_unitaire__isnull=True)
+        ).order_by('pk')
+
+        dernier_pk = 0
+        total = 0
+        produits = set()
+        premiere_date = None
+        while True:
+            ids = list(a_completer.filter(pk__gt=dernier_pk).values_list(
+                'pk', flat=True
+            )[:taille])
+            if not ids:
+                break
+            with transaction.atomic():
+                lot = Mouvement.objects.filter(pk__in=ids)
+                produits.update(lot.values_list('produit_id', flat=True).distinct())
+                date_lot = lot.aggregate(Min('date_mouvement'))['date_mouvement__min']
+                premiere_date = min(premiere_date or date_lot, date_lot)
+                lot.filter(prix_unitaire__isnull=True).update(prix_unitaire=prix)
+                lot.filter(cout_unitaire__isnull=True).update(cout_unitaire=cout)
+            dernier_pk = ids[-1]
+            total += len(ids)
+            self.stdout.write(f"Оброблено рухів: {total}")
+
+        if total:
+            ids = sorted(produits)
+            for debut in range(0, len(ids), LOT_CUMULS):
+                lot = ids[debut:debut + LOT_CUMULS]
+                MouvementDaily.remplacer(lot, MouvementDaily.cumuls(lot))
+            StockSnapshot.invalider_depuis(timezone.localdate(premiere_date))
+            invalider_tout()
+            self.stdout.write(f"Перераховано щоденні підсумки товарів: {len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Заповнено рухів: {total}"))
@@ -0,0 +1,390 @@
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.metriques import Mesure
+from inventory.models import Mouvement, MouvementDaily, PrixVente, Produit
+from inventory.pagination import _encoder
+from inventory.views import TAILLE_PAGE_MOUVEMENTS
+
+# Référence versionnée, comparée à chaque exécution
+REFERENCE = settings.BASE_DIR / 'benchmarks' / 'reference_vues.json'
+# Au-delà de la tolérance relative, une hausse n'est signalée que si elle
+# dépasse aussi ces marges absolues (bruit des vues de quelques ms)
+MARGE_DUREE_MS = 5.0
+MARGE_MEMOIRE_KO = 256
+# Les vues rapides sont répétées au-delà de --repetitions jusqu'à cumuler
+# cette durée (secondes), dans la limite de MAX_REPETITIONS : le minimum
+# n'en est que plus stable
+DUREE_MESURE = 1.0
+MAX_REPETITIONS = 50
+
+
+class Command(BaseCommand):
+    """Benchmark des vues sur le jeu de données de benchmark.
+
+    Chaque scénario (vue et paramètres, voir scenarios()) est joué avec le
+    client de test de Django sur la base configurée, remplie au préalable
+    par `manage.py generate_benchmark_data`. Pour chacun : durée médiane et
+    minimale (réponse lue en entier, flux compris), nombre de requêtes SQL
+    et pic de mémoire Python (tracemalloc, sur une exécution à part car le
+    traçage ralentit). Les POST sont joués dans une transaction annulée :
+    la base n'est pas modifiée.
+
+    Les résultats sont écrits en JSON puis comparés à la référence
+    benchmarks/reference_vues.json : toute requête SQL en plus est une
+    régression, la durée minimale et la mémoire le sont au-delà de
+    --tolerance. Un scénario dont la durée dépasse la tolérance est
+    remesuré une fois avant d'être déclaré en régression : sur une machine
+    virtuelle partagée, une rafale de charge passagère y suffit.
+    """
+    help = "Заміряти час, SQL-запити та пам'ять представлень і порівняти з еталоном"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repetitions', type=int, default=5,
+            help="Мінімум вимірювань на сценарій (за замовчуванням 5)"
+        )
+        parser.add_argument(
+            '--echauffement', type=int, default=1,
+            help="Прогрівальних запусків перед вимірюванням (за замовчуванням 1)"
+        )
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help="Лише цей сценарій (можна повторювати)"
+        )
+        parser.add_argument(
+            '--sortie',
+            help="Файл результатів JSON (за замовчуванням logs/bench/<дата>.json)"
+        )
+        parser.add_argument(
+            '--reference', default=str(REFERENCE),
+            help="Еталон для порівняння (benchmarks/reference_vues.json)"
+        )
+        parser.add_argument(
+            '--enregistrer-reference', action='store_true',
+            help="Записати результати як новий еталон замість порівняння"
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help="Допустиме відносне зростання часу та пам'яті (за замовчуванням 0.5)"
+        )
+
+    def handle(self, *args, **options):
+        scenarios = self.scenarios()
+        if options['scenarios']:
+            inconnus = set(options['scenarios']) - {s['nom'] for s in scenarios}
+            if inconnus:
+                raise CommandError(
+                    f"Невідомі сценарії: {', '.join(sorted(inconnus))}"
+                )
+            scenarios = [s for s in scenarios if s['nom'] in options['scenarios']]
+
+        reference = None
+        if not options['enregistrer_reference']:
+            try:
+                with open(options['reference'], encoding='utf-8') as fichier:
+                    reference = json.load(fichier)
+            except FileNotFoundError:
+                pass
+
+        # Mesure de la vue seule : sans l'instrumentation de production
+        # (histogrammes, journal des requêtes lentes, profilage) ni DEBUG,
+        # qui conserve chaque requête SQL
+        with override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            METRIQUES={**getattr(settings, 'METRIQUES', {}), 'ACTIF': False},
+            REQUETES_LENTES={**getattr(settings, 'REQUETES_LENTES', {}), 'ACTIF': False},
+            PROFILAGE={**getattr(settings, 'PROFILAGE', {}), 'ACTIF': False},
+        ):
+            client = Client()
+            vues = {}
+            for scenario in scenarios:
+                mesure = self.mesurer(client, scenario, options)
+                ancien = (reference or {}).get('vues', {}).get(scenario['nom'])
+                if ancien and 'duree' in self.ecarts(ancien, mesure, options['tolerance']):
+                    seconde = self.mesurer(client, scenario, options)
+                    if seconde['duree_min_ms'] < mesure['duree_min_ms']:
+                        mesure = seconde
+                vues[scenario['nom']] = mesure
+                self.afficher(scenario['nom'], mesure)
+
+        resultats = {
+            'date': timezone.localtime().isoformat(timespec='seconds'),
+            'donnees': {
+                'produits': Produit.objects.count(),
+                'mouvements': Mouvement.objects.count(),
+            },
+            'repetitions': options['repetitions'],
+            'vues': vues,
+        }
+        if options['enregistrer_reference']:
+            self.ecrire(options['reference'], resultats)
+            self.stdout.write(self.style.SUCCESS(
+                f"Еталон записано: {options['reference']}"
+            ))
+            return
+
+        sortie = options['sortie'] or os.path.join(
+            settings.BASE_DIR, 'logs', 'bench',
+            f'{timezone.localtime():%Y%m%d-%H%M%S}.json'
+        )
+        self.ecrire(sortie, resultats)
+        self.stdout.write(f"Результати: {sortie}")
+
+        if reference is None:
+            self.stdout.write(self.style.WARNING(
+                "Еталон відсутній: запустіть з --enregistrer-reference"
+            ))
+            return
+        regressions = self.comparer(reference, resultats, options['tolerance'])
+        if regressions:
+            raise CommandError(f"Регресій: {len(regressions)}")
+        self.stdout.write(self.style.SUCCESS("Регресій немає"))
+
+    def scenarios(self):
+        """Requêtes jouées, paramétrées d'après le contenu de la base.
+
+        Le rang d'activité du produit et la dernière date de mouvement
+        rendent les scénarios comparables d'un jeu généré à l'autre.
+        """
+        dernier = Mouvement.objects.order_by('-date_mouvement').values_list(
+            'date_mouvement', flat=True
+        ).first()
+        if dernier is None:
+            raise CommandError(
+                "База порожня: спочатку виконайте generate_benchmark_data"
+            )
+        # Produit en stock (la sortie saisie doit passer) au 90e centile
+        # d'activité : bien fourni, sans être le best-seller dont
+        # l'historique complet écraserait les autres mesures
+        activite = list(MouvementDaily.objects.filter(
+            produit__stock_balance__quantite__gt=0
+        ).values('produit_id').annotate(
+            n=Sum('nombre')
+        ).order_by('-n', 'produit_id').values_list('produit_id', flat=True))
+        if activite:
+            produit = Produit.objects.get(pk=activite[len(activite) // 10])
+        else:
+            produit = Mouvement.objects.select_related('produit').first().produit
+        fin = timezone.localdate(dernier)
+        mois = {
+            'date_debut': (fin - timedelta(days=29)).isoformat(),
+            'date_fin': fin.isoformat(),
+        }
+        selection = ','.join(
+            str(pk) for pk in Produit.objects.order_by('pk').values_list(
+                'pk', flat=True
+            )[:50]
+        )
+        profondeur = 100 * TAILLE_PAGE_MOUVEMENTS
+        page_profonde = Mouvement.objects.order_by(
+            '-date_mouvement', '-id'
+        ).values_list('date_mouvement', 'id')[profondeur - 1:profondeur].first()
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        prix = PrixVente.objects.filter(produit=produit, actif=True).first()
+
+        scenarios = [
+            {'nom': 'tableau_bord', 'url': reverse('tableau_bord')},
+            {'nom': 'liste_produits', 'url': reverse('liste_produits')},
+            {'nom': 'detail_produit',
+             'url': reverse('detail_produit', args=[produit.pk])},
+            {'nom': 'catalogue_prix', 'url': reverse('catalogue_prix')},
+            {'nom': 'catalogue_prix_selection', 'url': reverse('catalogue_prix'),
+             'donnees': {'produits': selection}},
+            {'nom': 'liste_mouvements', 'url': reverse('liste_mouvements')},
+            {'nom': 'liste_mouvements_filtres', 'url': reverse('liste_mouvements'),
+             'donnees': {**mois, 'type_mouvement': 'sortie', 'produit': produit.pk}},
+            {'nom': 'liste_mouvements_mois', 'url': reverse('liste_mouvements'),
+             'donnees': mois},
+            {'nom': 'export_csv_mois', 'url': reverse('export_mouvements_csv'),
+             'donnees': {**mois, 'valeurs': '1'}},
+            {'nom': 'export_csv_produit', 'url': reverse('export_mouvements_csv'),
+             'donnees': {'produit': produit.pk}},
+            {'nom': 'prix_produit_ajax',
+             'url': reverse('get_prix_produit', args=[produit.pk]), 'entetes': ajax},
+            {'nom': 'cout_produit_ajax',
+             'url': reverse('get_cout_produit', args=[produit.pk]), 'entetes': ajax},
+            {'nom': 'recherche_produits',
+             'url': reverse('recherche_options', args=['produits']),
+             'donnees': {'q': produit.description.split()[0]}},
+            {'nom': 'recherche_prix',
+             'url': reverse('recherche_options', args=['prix']),
+             'donnees': {'produit': produit.pk}},
+            {'nom': 'stock_a_date', 'url': reverse('stock_a_date'),
+             'donnees': {'date': (fin - timedelta(days=30)).isoformat()}},
+            {'nom': 'stock_a_date_ajax', 'url': reverse('stock_a_date'),
+             'donnees': {'date': (fin - timedelta(days=30)).isoformat()},
+             'entetes': ajax},
+            {'nom': 'series_mois', 'url': reverse('series_mouvements')},
+            {'nom': 'series_jours_produit', 'url': reverse('series_mouvements'),
+             'donnees': {'granularite': 'jour', 'nombre': 90, 'produit': produit.pk}},
+            {'nom': 'ajouter_mouvement', 'url': reverse('ajouter_mouvement'),
+             'methode': 'post', 'donnees': {
+                 'produit': produit.pk, 'type_mouvement': 'sortie', 'quantite': 1,
+                 'prix_vente_utilise': prix.pk if prix else '',
+                 'commentaire': 'Бенчмарк',
+             }},
+            {'nom': 'document_mouvements', 'url': reverse('document_mouvements'),
+             'methode': 'post', 'donnees': self.document(produit)},
+        ]
+        if page_profonde is not None:
+            scenarios.insert(6, {
+                'nom': 'liste_mouvements_page_100', 'url': reverse('liste_mouvements'),
+                'donnees': {'curseur': _encoder('suivant', list(page_profonde))},
+            })
+        return scenarios
+
+    def document(self, produit):
+        """Document de 20 lignes : entrées sur le produit et ses voisins"""
+        produits = list(Produit.objects.filter(pk__gte=produit.pk).order_by(
+            'pk'
+        ).values_list('pk', 'cout_achat')[:20])
+        donnees = {
+            'commentaire': 'Бенчмарк',
+            'form-TOTAL_FORMS': str(len(produits)),
+            'form-INITIAL_FORMS': '0',
+            'form-MIN_NUM_FORMS': '1',
+            'form-MAX_NUM_FORMS': '500',
+        }
+        for i, (pk, cout) in enumerate(produits):
+            donnees.update({
+                f'form-{i}-produit': pk,
+                f'form-{i}-type_mouvement': 'entree',
+                f'form-{i}-quantite': 10,
+                f'form-{i}-prix': cout,
+            })
+        return donnees
+
+    def executer(self, client, scenario):
+        """Joue le scénario une fois ; retourne (statut, octets, requêtes SQL).
+
+        La réponse est lue en entier (les flux aussi) sans être conservée.
+        """
+        mesure = Mesure()
+        ecriture = scenario.get('methode', 'get') == 'post'
+        with ExitStack() as pile:
+            for alias in connections:
+                pile.enter_context(connections[alias].execute_wrapper(mesure))
+            if ecriture:
+                pile.enter_context(transaction.atomic())
+            response = getattr(client, scenario.get('methode', 'get'))(
+                scenario['url'], scenario.get('donnees', {}),
+                **scenario.get('entetes', {})
+            )
+            if response.streaming:
+                octets = sum(len(morceau) for morceau in response.streaming_content)
+            else:
+                octets = len(response.content)
+            if ecriture:
+                transaction.set_rollback(True)
+        return response.status_code, octets, mesure.requetes
+
+    def mesurer(self, client, scenario, options):
+        for _ in range(options['echauffement']):
+            self.executer(client, scenario)
+        durees = []
+        requetes = 0
+        while (len(durees) < max(options['repetitions'], 1)
+               or sum(durees) < DUREE_MESURE * 1000
+               and len(durees) < MAX_REPETITIONS):
+            debut = time.perf_counter()
+            statut, octets, nombre = self.executer(client, scenario)
+            durees.append((time.perf_counter() - debut) * 1000)
+            requetes = max(requetes, nombre)
+
+        tracemalloc.start()
+        try:
+            self.executer(client, scenario)
+            pic = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        # Un POST refusé (formulaire invalide, stock insuffisant) répond 200 :
+        # seul le succès redirige
+        attendu = 302 if scenario.get('methode') == 'post' else 200
+        if statut != attendu:
+            raise CommandError(
+                f"{scenario['nom']}: статус {statut}, очікувався {attendu}"
+            )
+        return {
+            'statut': statut,
+            'duree_ms': round(statistics.median(durees), 2),
+            'duree_min_ms': round(min(durees), 2),
+            'mesures': len(durees),
+            'requetes': requetes,
+            'memoire_pic_ko': round(pic / 1024, 1),
+            'octets': octets,
+        }
+
+    def afficher(self, nom, mesure):
+        self.stdout.write(
+            f"{nom:<28} {mesure['duree_ms']:>9.1f} мс "
+            f"(мін. {mesure['duree_min_ms']:.1f})  "
+            f"SQL: {mesure['requetes']:>3}  "
+            f"пам'ять: {mesure['memoire_pic_ko']:>9.1f} КБ"
+        )
+
+    def ecrire(self, chemin, resultats):
+        dossier = os.path.dirname(str(chemin))
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        with open(chemin, 'w', encoding='utf-8') as fichier:
+            json.dump(resultats, fichier, ensure_ascii=False, indent=2)
+            fichier.write('\n')
+
+    def ecarts(self, ancien, actuel, tolerance):
+        """Hausses au-delà des seuils : {'requetes'|'duree'|'memoire': texte}"""
+        ecarts = {}
+        if actuel['requetes'] > ancien['requetes']:
+            ecarts['requetes'] = f"SQL {ancien['requetes']} → {actuel['requetes']}"
+        # Durée minimale : la moins sensible à la charge de la machine
+        if (actuel['duree_min_ms'] > ancien['duree_min_ms'] * (1 + tolerance)
+                and actuel['duree_min_ms'] - ancien['duree_min_ms'] > MARGE_DUREE_MS):
+            ecarts['duree'] = (
+                f"час (мін.) {ancien['duree_min_ms']:.1f} → "
+                f"{actuel['duree_min_ms']:.1f} мс"
+            )
+        if (actuel['memoire_pic_ko'] > ancien['memoire_pic_ko'] * (1 + tolerance)
+                and actuel['memoire_pic_ko'] - ancien['memoire_pic_ko']
+                > MARGE_MEMOIRE_KO):
+            ecarts['memoire'] = (
+                f"пам'ять {ancien['memoire_pic_ko']:.0f} → "
+                f"{actuel['memoire_pic_ko']:.0f} КБ"
+            )
+        return ecarts
+
+    def comparer(self, reference, resultats, tolerance):
+        """Affiche les écarts à la référence ; retourne les régressions"""
+        if reference.get('donnees') != resultats['donnees']:
+            self.stdout.write(self.style.WARNING(
+                f"Еталон отримано на інших даних ({reference.get('donnees')}): "
+                "порівняння часу та пам'яті орієнтовне"
+            ))
+        regressions = []
+        for nom, actuel in resultats['vues'].items():
+            ancien = reference.get('vues', {}).get(nom)
+            if ancien is None:
+                self.stdout.write(f"{nom}: немає в еталоні")
+                continue
+            ecarts = self.ecarts(ancien, actuel, tolerance)
+            if ecarts:
+                regressions.append(nom)
+                self.stdout.write(self.style.ERROR(
+                    f"{nom}: регресія — {'; '.join(ecarts.values())}"
+                ))
+        return regressions
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from inventory.cache_stock import reinitialiser_statistiques, statistiques
+
+
+class Command(BaseCommand):
+    """Affiche les compteurs du cache partagé des calculs de stock"""
+    help = "Показати статистику кешу залишків і цін"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Обнулити лічильники після виведення"
+        )
+
+    def handle(self, *args, **options):
+        stats = statistiques()
+        ratio = stats['ratio']
+        self.stdout.write(f"Влучання: {stats['hits']}")
+        self.stdout.write(f"Промахи: {stats['misses']}")
+        self.stdout.write(
+            f"Частка влучань: {ratio:.1%}" if ratio is not None
+            else "Частка влучань: —"
+        )
+        if options['reset']:
+            reinitialiser_statistiques()
+            self.stdout.write(self.style.SUCCESS("Лічильники обнулено"))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from inventory.cache_stock import invalider_produits
+from inventory.models import CoutAchat, PrixVente, Produit
+
+
+class Command(BaseCommand):
+    """Vérifie les prix et coûts actifs mis en cache sur les produits"""
+    help = "Перевірити узгодженість активних цін і собівартостей товарів"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help="Виправити знайдені розбіжності"
+        )
+
+    def handle(self, *args, **options):
+        produits = Produit.objects.order_by('pk').annotate(
+            prix_attendu=Subquery(
+                PrixVente.objects.filter(produit=OuterRef('pk'), actif=True)
+                .order_by('-date_creation').values('prix')[:1]
+            ),
+            cout_attendu=Subquery(
+                CoutAchat.objects.filter(produit=OuterRef('pk'), actif=True)
+                .order_by('-date_creation').values('cout')[:1]
+            ),
+        ).values_list(
+            'pk', 'description', 'prix_vente_negocie', 'prix_attendu',
+            'cout_achat_negocie', 'cout_attendu'
+        )
+
+        ecarts = 0
+        for pk, description, prix, prix_attendu, cout, cout_attendu in produits:
+            if prix == prix_attendu and cout == cout_attendu:
+                continue
+            ecarts += 1
+            self.stdout.write(
+                f"#{pk} {description}: ціна {prix} ≠ {prix_attendu}, "
+                f"собівартість {cout} ≠ {cout_attendu}"
+            )
+            if options['fix']:
+                Produit.objects.filter(pk=pk).update(
+                    prix_vente_negocie=prix_attendu,
+                    cout_achat_negocie=cout_attendu,
+                )
+                invalider_produits([pk])
+
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS("Розбіжностей не знайдено"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Виправлено: {ecarts}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Розбіжностей: {ecarts}"))
@@ -0,0 +1,418 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from inventory.cache_stock import invalider_tout
+from inventory.historique import ecrire_snapshots
+from inventory.models import (
+    CoutAchat, Mouvement, MouvementDaily, MouvementDailyTotal, PrixVente, Produit,
+    StockBalance, StockSnapshot
+)
+
+CATEGORIES = (
+    'Болт', 'Гайка', 'Шайба', 'Шуруп', 'Дюбель', 'Анкер', 'Саморіз',
+    'Кабель', 'Розетка', 'Вимикач', 'Лампа', 'Автомат', 'Фарба', 'Ґрунтовка',
+    'Клей', 'Герметик', 'Труба', 'Кран', 'Фітинг', 'Фільтр', 'Ключ',
+    'Свердло', 'Диск', 'Рукавички', 'Скотч',
+)
+MARQUES = (
+    'Bosch', 'Makita', 'Stanley', 'Fischer', 'Henkel', 'Legrand', 'Schneider',
+    'Ceresit', 'Kärcher', 'Sigma', 'Intertool', 'Topex', 'Grad', 'Vitals',
+)
+VARIANTES = (
+    'М4', 'М5', 'М6', 'М8', 'М10', 'М12', '3x16', '4x25', '5x40', '6x60',
+    '1,5 мм²', '2,5 мм²', '0,75 л', '2,5 л', '10 л', '½"', '¾"', '1"',
+)
+CLIENTS = (
+    'ТОВ «Будмайстер»', 'ФОП Коваленко', 'ПП «Ремонт-Сервіс»', 'ТОВ «Еліт-Буд»',
+    'ФОП Шевчук', 'ТОВ «Домобуд»', 'Оптовий клієнт', 'Постійний клієнт',
+)
+FOURNISSEURS = (
+    'ТОВ «Метизи Україна»', 'ТОВ «Електрокомплект»', 'ТОВ «Будхімія»',
+    'ПрАТ «Укрінструмент»', 'Імпорт (Польща)', 'Імпорт (Німеччина)',
+)
+# Activité relative par jour de la semaine (lundi = 0)
+ACTIVITE_SEMAINE = (1.0, 1.05, 1.05, 1.1, 1.2, 0.7, 0.3)
+# Demande moyenne par sortie : beaucoup d'articles à l'unité, quelques-uns
+# vendus par dizaines (visserie)
+DEMANDES = (1, 2, 3, 5, 10, 25)
+POIDS_DEMANDES = (40, 20, 15, 12, 8, 5)
+COLONNES_MOUVEMENT = (
+    'produit', 'type_mouvement', 'quantite', 'prix_vente_utilise',
+    'cout_achat_utilise', 'prix_unitaire', 'cout_unitaire', 'date_mouvement',
+    'commentaire',
+)
+# Part des sorties (entrées) rattachées explicitement au prix (coût) négocié
+PART_PRIX_UTILISE = 0.2
+
+
+def _inserer(modele, noms, lignes):
+    """INSERT préparé exécuté par executemany, comme Mouvement.inserer_en_masse.
+
+    Les montants sont convertis une fois par valeur distincte, les dates une
+    par ligne ; les autres valeurs sont déjà au format de la base.
+    """
+    champs = [modele._meta.get_field(nom) for nom in noms]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(modele._meta.db_table),
+        ', '.join(quote(champ.column) for champ in champs),
+        ', '.join(['%s'] * len(champs)),
+    )
+    conversions = {}
+
+    def convertisseur(champ):
+        if isinstance(champ, models.DateTimeField):
+            # Dates déjà conscientes du fuseau : adaptation directe
+            return connection.ops.adapt_datetimefield_value
+        if isinstance(champ, models.DecimalField):
+            def convertir(valeur):
+                cle = (champ.name, valeur)
+                if cle not in conversions:
+                    conversions[cle] = champ.get_db_prep_save(valeur, connection)
+                return conversions[cle]
+            return convertir
+        return None
+
+    convertisseurs = [convertisseur(champ) for champ in champs]
+    valeurs = [
+        tuple(
+            valeur if convertir is None else convertir(valeur)
+            for convertir, valeur in zip(convertisseurs, ligne)
+        )
+        for ligne in lignes
+    ]
+    with connection.cursor() as curseur:
+        curseur.executemany(sql, valeurs)
+
+
+def _montant(valeur):
+    return Decimal(f'{max(valeur, 0.01):.2f}')
+
+
+class Historique:
+    """Prix ou coûts d'un produit par date, parcourus dans l'ordre du temps"""
+
+    def __init__(self, base):
+        self.base = base
+        self.dates = []
+        self.valeurs = []
+        self.ids = []
+        self.position = 0
+
+    def courant(self, instant):
+        """(valeur, id) en vigueur à l'instant (instants croissants)"""
+        while (self.position < len(self.dates)
+               and self.dates[self.position] <= instant):
+            self.position += 1
+        if not self.position:
+            return self.base, None
+        return self.valeurs[self.position - 1], self.ids[self.position - 1]
+
+
+class Command(BaseCommand):
+    """Remplit la base avec un jeu de données volumineux et réaliste.
+
+    Catalogue de produits aux prix log-normaux, popularité en loi de Zipf,
+    historiques de prix et de coûts datés, mouvements répartis sur la
+    période (jours ouvrés, heures d'ouverture) avec réapprovisionnements
+    qui gardent le stock positif. Même graine et même date de fin : même
+    jeu de données. Les mouvements sont insérés par tranches (executemany)
+    puis soldes et cumuls journaliers sont recalculés une fois.
+    """
+    help = "Заповнити базу великим реалістичним набором даних для бенчмарків"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--produits', type=int, default=10_000,
+            help="Кількість товарів (за замовчуванням 10 000)"
+        )
+        parser.add_argument(
+            '--mouvements', type=int, default=5_000_000,
+            help="Кількість рухів (за замовчуванням 5 000 000)"
+        )
+        parser.add_argument(
+            '--jours', type=int, default=365,
+            help="Тривалість історії в днях (за замовчуванням 365)"
+        )
+        parser.add_argument(
+            '--fin', type=date.fromisoformat, default=None,
+            help="Остання дата історії, РРРР-ММ-ДД (за замовчуванням сьогодні)"
+        )
+        parser.add_argument(
+            '--prix-par-produit', type=float, default=2.0,
+            help="Середня кількість цін продажу на товар (за замовчуванням 2)"
+        )
+        parser.add_argument(
+            '--couts-par-produit', type=float, default=2.0,
+            help="Середня кількість собівартостей на товар (за замовчуванням 2)"
+        )
+        parser.add_argument(
+            '--graine', type=int, default=42,
+            help="Зерно генератора випадкових чисел (за замовчуванням 42)"
+        )
+        parser.add_argument(
+            '--taille-lot', type=int, default=20_000,
+            help="Рухів в одній транзакції (за замовчуванням 20 000)"
+        )
+        parser.add_argument(
+            '--vider', action='store_true',
+            help="Спочатку видалити всі товари, ціни та рухи"
+        )
+
+    def handle(self, *args, **options):
+        if options['produits'] < 1 or options['jours'] < 1:
+            raise CommandError("Потрібен принаймні один товар і один день")
+        if options['vider']:
+            self.vider()
+        elif Produit.objects.exists():
+            raise CommandError(
+                "База вже містить товари: додайте --vider, щоб їх видалити"
+            )
+
+        hasard = random.Random(options['graine'])
+        fin = options['fin'] or timezone.localdate()
+        fuseau = timezone.get_current_timezone()
+        premier_jour = fin - timedelta(days=options['jours'] - 1)
+        debut = datetime.combine(premier_jour, datetime.min.time(), fuseau)
+        periode = timedelta(days=options['jours'])
+        depart = time.perf_counter()
+
+        produits, prix, couts = self.creer_catalogue(hasard, options, debut, periode)
+        self.etape(depart, f"товари: {len(produits)}, цін: {prix}, собівартостей: {couts}")
+
+        total = self.creer_mouvements(
+            hasard, options, produits, premier_jour, fuseau, depart
+        )
+        self.etape(depart, f"рухи: {total}")
+
+        StockBalance.reconstruire()
+        self.etape(depart, "залишки перераховано")
+        # Un seul thread : en journal DELETE (profil de développement), les
+        # lectures parallèles échouent en « database is locked » pendant
+        # les écritures des autres lots.
+        call_command('rebuild_mouvements_daily', '--workers', '1', stdout=self.stdout)
+        # Photographies mensuelles, comme `manage.py snapshot_stock` par cron :
+        # le stock à date part de la dernière au lieu de rejouer le journal
+        self.etape(depart, f"знімки запасів: {ecrire_snapshots()}")
+        invalider_tout()
+        self.stdout.write(self.style.SUCCESS(
+            f"Набір даних створено за {time.perf_counter() - depart:.0f} с"
+        ))
+
+    def etape(self, depart, message):
+        self.stdout.write(f"[{time.perf_counter() - depart:6.1f} с] {message}")
+
+    def vider(self):
+        quote = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as curseur:
+            for modele in (
+                MouvementDailyTotal, MouvementDaily, StockSnapshot, StockBalance,
+                Mouvement, PrixVente, CoutAchat, Produit,
+            ):
+                curseur.execute(f'DELETE FROM {quote(modele._meta.db_table)}')
+        invalider_tout()
+
+    def creer_catalogue(self, hasard, options, debut, periode):
+        """Produits et historiques de prix et de coûts.
+
+        Retourne une liste de dict par produit (pk, poids de popularité,
+        demande moyenne, taille de réapprovisionnement, historiques) et les
+        nombres de prix et de coûts créés.
+        """
+        nombre = options['produits']
+        catalogue = []
+        for i in range(nombre):
+            cout = _montant(hasard.lognormvariate(3.0, 1.1))
+            prix_vente = _montant(float(cout) * hasard.uniform(1.15, 1.8))
+            demande = hasard.choices(DEMANDES, POIDS_DEMANDES)[0]
+            element = {
+                'produit': Produit(
+                    description=(
+                        f'{hasard.choice(CATEGORIES)} {hasard.choice(MARQUES)} '
+                        f'{hasard.choice(VARIANTES)} — арт. {i + 1:06d}'
+                    ),
+                    cout_achat=cout,
+                    prix_vente=prix_vente,
+                    seuil_alerte=hasard.choice((0, 5, 5, 10, 10, 20, 50)),
+                ),
+                'demande': demande,
+                'reappro': demande * hasard.randint(20, 60),
+                'prix': Historique(prix_vente),
+                'couts': Historique(cout),
+            }
+            for cle, moyenne, ecart in (
+                ('prix', options['prix_par_produit'], (0.85, 1.05)),
+                ('couts', options['couts_par_produit'], (0.9, 1.15)),
+            ):
+                historique = element[cle]
+                for _ in range(self.poisson(hasard, moyenne)):
+                    historique.dates.append(debut + periode * hasard.random())
+                historique.dates.sort()
+                historique.valeurs = [
+                    _montant(float(historique.base) * hasard.uniform(*ecart))
+                    for _ in historique.dates
+                ]
+            # Le dernier prix (coût) de l'historique est le seul encore actif
+            element['produit'].prix_vente_negocie = (
+                element['prix'].valeurs[-1] if element['prix'].valeurs else None
+            )
+            element['produit'].cout_achat_negocie = (
+                element['couts'].valeurs[-1] if element['couts'].valeurs else None
+            )
+            catalogue.append(element)
+
+        # Popularité en loi de Zipf, rangs répartis au hasard dans le catalogue
+        rangs = list(range(1, nombre + 1))
+        hasard.shuffle(rangs)
+        for element, rang in zip(catalogue, rangs):
+            element['poids'] = 1 / rang ** 1.1
+
+        with transaction.atomic():
+            Produit.objects.bulk_create(
+                [element['produit'] for element in catalogue],
+                batch_size=options['taille_lot'],
+            )
+            prix = self.inserer_historique(
+                catalogue, 'prix', PrixVente, 'prix', 'client', CLIENTS, hasard
+            )
+            couts = self.inserer_historique(
+                catalogue, 'couts', CoutAchat, 'cout', 'fournisseur',
+                FOURNISSEURS, hasard
+            )
+        return catalogue, prix, couts
+
+    @staticmethod
+    def poisson(hasard, moyenne):
+        """Tirage de Poisson (méthode de Knuth, moyennes faibles)"""
+        limite, produit, tirage = 2.718281828459045 ** -moyenne, 1.0, -1
+        while produit > limite:
+            produit *= hasard.random()
+            tirage += 1
+        return tirage
+
+    @staticmethod
+    def inserer_historique(catalogue, cle, modele, champ, contexte, noms, hasard):
+        """Insère l'historique cle de chaque produit ; renseigne les ids"""
+        dernier = modele.objects.aggregate(dernier=Max('pk'))['dernier'] or 0
+        lignes = []
+        for element in catalogue:
+            historique = element[cle]
+            for i, (instant, valeur) in enumerate(
+                zip(historique.dates, historique.valeurs)
+            ):
+                lignes.append((
+                    element['produit'].pk, valeur, hasard.choice(noms),
+                    i == len(historique.dates) - 1, '', instant,
+                ))
+        _inserer(
+            modele,
+            ('produit', champ, contexte, 'actif', 'commentaire', 'date_creation'),
+            lignes,
+        )
+        # Clés attribuées dans l'ordre d'insertion
+        ids = iter(
+            modele.objects.filter(pk__gt=dernier).order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        for element in catalogue:
+            element[cle].ids = [next(ids) for _ in element[cle].dates]
+        return len(lignes)
+
+    def creer_mouvements(self, hasard, options, catalogue, premier_jour, fuseau, depart):
+        """Simule les mouvements jour par jour et les insère par tranches"""
+        total = options['mouvements']
+        jours = options['jours']
+        activites = [
+            ACTIVITE_SEMAINE[(premier_jour + timedelta(days=j)).weekday()]
+            for j in range(jours)
+        ]
+        somme = sum(activites)
+        quotas = [int(total * activite / somme) for activite in activites]
+        for j in range(total - sum(quotas)):
+            quotas[j % jours] += 1
+
+        cumul_poids = []
+        cumul = 0.0
+        for element in catalogue:
+            cumul += element['poids']
+            cumul_poids.append(cumul)
+        stocks = [0] * len(catalogue)
+        # Stock initial : une entrée par produit le premier jour
+        a_ouvrir = list(range(len(catalogue)))
+        taille_lot = options['taille_lot']
+        tranche = []
+        ecrits = 0
+        prochain_rapport = total // 10
+
+        def ecrire():
+            nonlocal ecrits, prochain_rapport
+            with transaction.atomic():
+                _inserer(Mouvement, COLONNES_MOUVEMENT, tranche)
+            ecrits += len(tranche)
+            tranche.clear()
+            if ecrits >= prochain_rapport:
+                self.etape(depart, f"рухи: {ecrits} / {total}")
+                prochain_rapport += total // 10 or 1
+
+        def ajouter(index, type_mouvement, quantite, instant):
+            element = catalogue[index]
+            prix, prix_id = element['prix'].courant(instant)
+            cout, cout_id = element['couts'].courant(instant)
+            explicite = hasard.random() < PART_PRIX_UTILISE
+            tranche.append((
+                element['produit'].pk, type_mouvement, quantite,
+                prix_id if explicite and type_mouvement == 'sortie' else None,
+                cout_id if explicite and type_mouvement == 'entree' else None,
+                prix, cout, instant,
+                'Поставка' if type_mouvement == 'entree' else '',
+            ))
+            if len(tranche) >= taille_lot:
+                ecrire()
+
+        for j, quota in enumerate(quotas):
+            minuit = datetime.combine(
+                premier_jour + timedelta(days=j), datetime.min.time(), fuseau
+            )
+            # Heures d'ouverture : 7 h - 21 h, pointe en début d'après-midi
+            instants = sorted(
+                minuit + timedelta(seconds=hasard.triangular(25200, 75600, 48600))
+                for _ in range(quota)
+            )
+            choix = iter(hasard.choices(
+                range(len(catalogue)), cum_weights=cumul_poids, k=quota
+            ))
+            restants = quota
+            for instant in instants:
+                if restants <= 0:
+                    break
+                if a_ouvrir:
+                    index = a_ouvrir.pop()
+                    quantite = catalogue[index]['reappro']
+                    ajouter(index, 'entree', quantite, instant)
+                    stocks[index] += quantite
+                    restants -= 1
+                    continue
+                index = next(choix)
+                element = catalogue[index]
+                demande = 1 + int(hasard.expovariate(1 / element['demande']))
+                if stocks[index] < demande:
+                    quantite = element['reappro'] + demande
+                    ajouter(index, 'entree', quantite, instant)
+                    stocks[index] += quantite
+                    restants -= 1
+                    if restants <= 0:
+                        break
+                ajouter(index, 'sortie', demande, instant)
+                stocks[index] -= demande
+                restants -= 1
+        if tranche:
+            ecrire()
+        return ecrits
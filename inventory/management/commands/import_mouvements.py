@@ -0,0 +1,71 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importation import (
+    FORMATS, TAILLE_LOT, format_depuis_nom, importer, lire_lignes
+)
+
+
+class Command(BaseCommand):
+    """Importe des mouvements depuis un fichier CSV ou JSON lines.
+
+    Toutes les lignes sont validées avant écriture ; une ligne invalide
+    annule l'import, sauf avec --partiel. Voir inventory/importation.py.
+    """
+    help = "Імпортувати рухи товарів з файлу CSV або JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fichier',
+            help="Шлях до файлу («-» — стандартний ввід)"
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help="Формат файлу (за замовчуванням — за розширенням)"
+        )
+        parser.add_argument(
+            '--taille-lot', type=int, default=TAILLE_LOT,
+            help=f"Рядків на один INSERT (за замовчуванням {TAILLE_LOT})"
+        )
+        parser.add_argument(
+            '--partiel', action='store_true',
+            help="Імпортувати коректні рядки, пропустивши помилкові"
+        )
+
+    def handle(self, *args, **options):
+        nom = options['fichier']
+        format_fichier = options['format'] or format_depuis_nom(nom)
+        if nom == '-':
+            rapport = self.importer(sys.stdin, format_fichier, options)
+        else:
+            try:
+                fichier = open(nom, encoding='utf-8-sig', newline='')
+            except OSError as exc:
+                raise CommandError(f"Не вдалося відкрити файл: {exc}")
+            with fichier:
+                rapport = self.importer(fichier, format_fichier, options)
+
+        for numero, message in rapport.erreurs:
+            prefixe = f"Рядок {numero}: " if numero else ""
+            self.stderr.write(f"{prefixe}{message}")
+        if rapport.erreurs and not rapport.importees:
+            raise CommandError(
+                f"Імпорт скасовано: помилок {len(rapport.erreurs)} "
+                f"з {rapport.lignes} рядків"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Імпортовано {rapport.importees} з {rapport.lignes} рядків "
+            f"за {rapport.duree:.2f} с ({rapport.debit:.0f} рядків/с)"
+        ))
+
+    def importer(self, fichier, format_fichier, options):
+        try:
+            return importer(
+                lire_lignes(fichier, format_fichier),
+                taille_lot=options['taille_lot'],
+                partiel=options['partiel'],
+            )
+        except csv.Error as exc:
+            raise CommandError(f"Некоректний файл CSV: {exc}")
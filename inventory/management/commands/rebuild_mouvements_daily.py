@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory.models import MouvementDaily, Produit
+
+
+def _cumuls_du_lot(produit_ids):
+    """Calcule les cumuls d'un lot de produits (dans un thread dédié)"""
+    try:
+        return produit_ids, MouvementDaily.cumuls(produit_ids)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """Recalcule les cumuls journaliers depuis le journal des mouvements.
+
+    Les lots de produits sont agrégés en parallèle (une connexion en lecture
+    par thread) puis écrits séquentiellement, SQLite n'acceptant qu'un seul
+    écrivain à la fois.
+    """
+    help = "Перерахувати щоденні підсумки рухів товарів"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help="Кількість паралельних потоків (за замовчуванням 4)"
+        )
+        parser.add_argument(
+            '--lot', type=int, default=500,
+            help="Кількість товарів в одному пакеті (за замовчуванням 500)"
+        )
+
+    def handle(self, *args, **options):
+        ids = list(Produit.objects.order_by('pk').values_list('pk', flat=True))
+        taille = options['lot']
+        lots = [ids[i:i + taille] for i in range(0, len(ids), taille)]
+
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                resultats = pool.map(_cumuls_du_lot, lots)
+                total = sum(
+                    MouvementDaily.remplacer(lot, cumuls)
+                    for lot, cumuls in resultats
+                )
+        else:
+            total = sum(
+                MouvementDaily.remplacer(lot, MouvementDaily.cumuls(lot))
+                for lot in lots
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Перераховано підсумків: {total} ({len(ids)} товарів)"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import StockBalance
+
+
+class Command(BaseCommand):
+    """Recalcule les soldes de stock dénormalisés depuis les mouvements"""
+    help = "Перерахувати залишки товарів з журналу рухів"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--produit', type=int, action='append', dest='produits',
+            help="ID товару (можна вказати кілька разів)"
+        )
+
+    def handle(self, *args, **options):
+        total = StockBalance.reconstruire(options['produits'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Перераховано залишків: {total}"
+        ))
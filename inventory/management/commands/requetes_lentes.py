@@ -0,0 +1,132 @@
+import glob
+import json
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.requetes_lentes import configuration
+
+# Longueur du SQL affiché par forme
+APERCU_SQL = 300
+
+
+class Command(BaseCommand):
+    """Synthèse du journal des requêtes lentes et répétées.
+
+    Regroupe les enregistrements par forme de requête (empreinte), rotations
+    du fichier comprises, et classe les formes par durée cumulée. Voir
+    inventory/requetes_lentes.py.
+    """
+    help = "Показати найповільніші та повторювані SQL-запити з журналу"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fichier',
+            help="Файл журналу (за замовчуванням REQUETES_LENTES['FICHIER'])"
+        )
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help="Кількість форм запитів у звіті (за замовчуванням 20)"
+        )
+        parser.add_argument(
+            '--type', choices=('lente', 'repetition'),
+            help="Лише повільні запити або лише повтори (N+1)"
+        )
+        parser.add_argument(
+            '--vue', help="Лише запити цього представлення"
+        )
+
+    def handle(self, *args, **options):
+        fichier = options['fichier'] or configuration()['FICHIER']
+        if not fichier:
+            raise CommandError(
+                "Файл журналу не задано (--fichier або REQUETES_LENTES['FICHIER'])"
+            )
+        fichiers = [str(fichier)] + sorted(glob.glob(f'{glob.escape(str(fichier))}.*'))
+
+        formes = {}
+        illisibles = 0
+        for chemin in fichiers:
+            try:
+                flux = open(chemin, encoding='utf-8')
+            except OSError:
+                continue
+            with flux:
+                for ligne in flux:
+                    try:
+                        enregistrement = json.loads(ligne)
+                    except ValueError:
+                        illisibles += 1
+                        continue
+                    if options['type'] and enregistrement.get('type') != options['type']:
+                        continue
+                    if options['vue'] and enregistrement.get('vue') != options['vue']:
+                        continue
+                    self.cumuler(formes, enregistrement)
+
+        if not formes:
+            self.stdout.write("Журнал порожній")
+            return
+        classement = sorted(
+            formes.values(), key=lambda f: f['duree_ms'], reverse=True
+        )
+        for rang, stats in enumerate(classement[:options['top']], start=1):
+            self.afficher(rang, stats)
+        if illisibles:
+            self.stderr.write(f"Пропущено некоректних рядків: {illisibles}")
+
+    def cumuler(self, formes, enregistrement):
+        stats = formes.setdefault(enregistrement['empreinte'], {
+            'empreinte': enregistrement['empreinte'],
+            'forme': enregistrement.get('forme', ''),
+            'lentes': 0,
+            'repetitions': 0,
+            'executions': 0,
+            'duree_ms': 0.0,
+            'max_ms': 0.0,
+            'vues': Counter(),
+            'origines': Counter(),
+            'plan': None,
+        })
+        nombre = enregistrement.get('nombre', 1)
+        duree = enregistrement.get('duree_ms', 0.0)
+        if enregistrement.get('type') == 'repetition':
+            stats['repetitions'] += 1
+            stats['max_ms'] = max(stats['max_ms'], duree / nombre)
+        else:
+            stats['lentes'] += 1
+            stats['max_ms'] = max(stats['max_ms'], duree)
+        stats['executions'] += nombre
+        stats['duree_ms'] += duree
+        stats['vues'][enregistrement.get('vue') or '—'] += nombre
+        if enregistrement.get('origine'):
+            stats['origines'][enregistrement['origine']] += nombre
+        if enregistrement.get('plan'):
+            stats['plan'] = enregistrement['plan']
+
+    def afficher(self, rang, stats):
+        genres = []
+        if stats['repetitions']:
+            genres.append(f"N+1 ×{stats['repetitions']}")
+        if stats['lentes']:
+            genres.append(f"повільних: {stats['lentes']}")
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{rang}. {stats['empreinte']}  {', '.join(genres)}  "
+            f"виконань: {stats['executions']}, "
+            f"загалом {stats['duree_ms']:.1f} мс, макс {stats['max_ms']:.1f} мс"
+        ))
+        self.stdout.write(
+            "   Представлення: " + ', '.join(
+                f'{vue} ({nombre})' for vue, nombre in stats['vues'].most_common(5)
+            )
+        )
+        if stats['origines']:
+            self.stdout.write(
+                f"   Місце: {stats['origines'].most_common(1)[0][0]}"
+            )
+        forme = stats['forme']
+        if len(forme) > APERCU_SQL:
+            forme = forme[:APERCU_SQL] + '…'
+        self.stdout.write(f"   SQL: {forme}")
+        if stats['plan']:
+            self.stdout.write("   План: " + ' | '.join(stats['plan']))
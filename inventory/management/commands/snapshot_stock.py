@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.historique import PERIODES, ecrire_snapshots
+
+
+class Command(BaseCommand):
+    """Écrit les photographies de stock manquantes (à lancer par cron)"""
+    help = "Створити знімки запасів за завершені періоди"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--periode', choices=PERIODES, default='mois',
+            help="Періодичність знімків: jour або mois (за замовчуванням mois)"
+        )
+        parser.add_argument(
+            '--jusqu-au', dest='jusqu_au',
+            help="Остання дата знімка, РРРР-ММ-ДД (за замовчуванням вчора)"
+        )
+        parser.add_argument(
+            '--reconstruire', action='store_true',
+            help="Видалити всі знімки та перерахувати з початку історії"
+        )
+
+    def handle(self, *args, **options):
+        jusqu_au = None
+        if options['jusqu_au']:
+            try:
+                jusqu_au = date.fromisoformat(options['jusqu_au'])
+            except ValueError:
+                raise CommandError("Невірний формат дати, очікується РРРР-ММ-ДД")
+        ecrites = ecrire_snapshots(
+            periode=options['periode'],
+            jusqu_au=jusqu_au,
+            reconstruire=options['reconstruire'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Створено знімків: {ecrites}"))
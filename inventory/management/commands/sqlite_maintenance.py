@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    """Maintenance périodique de la base SQLite (checkpoint WAL, optimize).
+
+    À lancer régulièrement (cron, par exemple toutes les heures) : le
+    checkpoint reporte le journal WAL dans la base et le tronque, PRAGMA
+    optimize met à jour les statistiques utiles au planificateur.
+    """
+    help = "Обслуговування бази SQLite: контрольна точка WAL і optimize"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', default='TRUNCATE',
+            choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            help="Режим wal_checkpoint (за замовчуванням TRUNCATE)"
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help="Виконати повний ANALYZE замість PRAGMA optimize"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Команда призначена лише для SQLite")
+        with connection.cursor() as curseur:
+            curseur.execute('PRAGMA journal_mode')
+            mode_journal = curseur.fetchone()[0]
+            self.stdout.write(f"Режим журналу: {mode_journal}")
+            if mode_journal.lower() == 'wal':
+                curseur.execute(f"PRAGMA wal_checkpoint({options['mode']})")
+                bloque, pages_journal, pages_reportees = curseur.fetchone()
+                self.stdout.write(
+                    f"Контрольна точка: {pages_reportees}/{pages_journal} сторінок"
+                    + (" (заблоковано читачами)" if bloque else "")
+                )
+            curseur.execute('ANALYZE' if options['analyze'] else 'PRAGMA optimize')
+        self.stdout.write(self.style.SUCCESS("Обслуговування завершено"))
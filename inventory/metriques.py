@@ -0,0 +1,367 @@
+"""
+Mesures de performance par vue : requêtes SQL, temps SQL, rendu des
+gabarits et durée totale.
+
+MiddlewareMetriques mesure chaque requête, renvoie les durées dans l'en-tête
+Server-Timing (onglet Réseau du navigateur) et les cumule dans des
+histogrammes par nom de vue (resolver_match.view_name). Chaque worker verse
+périodiquement ses histogrammes dans un fichier SQLite partagé
+(settings.METRIQUES['FICHIER']) : /metrics expose ainsi, au format texte
+Prometheus, l'agrégat de tous les workers gunicorn, avec p50/p95/p99
+estimés depuis les seaux. Sans fichier, /metrics ne voit que son worker.
+
+Le temps de rendu est celui des gabarits chargés par le moteur
+DjangoTemplatesMesures (settings.TEMPLATES). Pour une réponse en flux
+(export CSV), seul le temps jusqu'au début de l'envoi est compté.
+"""
+
+import atexit
+import contextvars
+import logging
+import math
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'ACTIF': True,
+    # Fichier SQLite partagé entre workers (None : histogrammes du worker seul)
+    'FICHIER': None,
+    # Intervalle minimal entre deux versements dans le fichier (secondes)
+    'INTERVALLE': 10,
+    # Jeton de « Authorization: Bearer <jeton> » pour /metrics ; vide, seul
+    # le personnel connecté y a accès
+    'JETON': '',
+}
+
+SEAUX_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SEAUX_REQUETES = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Mesure : (nom Prometheus, description, bornes des seaux hors +Inf)
+METRIQUES = {
+    'total': (
+        'stockmanager_request_duration_seconds',
+        'Загальний час обробки запиту', SEAUX_DUREE,
+    ),
+    'sql': (
+        'stockmanager_sql_duration_seconds',
+        'Час SQL-запитів за запит', SEAUX_DUREE,
+    ),
+    'requetes': (
+        'stockmanager_sql_queries',
+        'Кількість SQL-запитів за запит', SEAUX_REQUETES,
+    ),
+    'rendu': (
+        'stockmanager_template_duration_seconds',
+        'Час рендерингу шаблонів за запит', SEAUX_DUREE,
+    ),
+}
+QUANTILES = (0.5, 0.95, 0.99)
+VUE_NON_RESOLUE = 'non_resolue'
+
+
+def configuration():
+    return {**CONFIGURATION_DEFAUT, **getattr(settings, 'METRIQUES', {})}
+
+
+_mesure = contextvars.ContextVar('mesure', default=None)
+
+
+class Mesure:
+    """Compteurs de la requête en cours ; sert aussi d'execute_wrapper"""
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.total = 0.0
+        self.requetes = 0
+        self.sql = 0.0
+        self.rendu = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - debut
+            self.requetes += 1
+
+    def terminer(self):
+        self.total = time.perf_counter() - self.debut
+
+    def valeurs(self):
+        return {
+            'total': self.total,
+            'sql': self.sql,
+            'requetes': self.requetes,
+            'rendu': self.rendu,
+        }
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+        return (
+            f'sql;dur={self.sql * 1000:.2f};desc="{self.requetes} queries", '
+            f'tpl;dur={self.rendu * 1000:.2f}, '
+            f'total;dur={self.total * 1000:.2f}'
+        )
+
+
+class TemplateMesure(Template):
+    """Gabarit dont le rendu est compté dans la mesure de la requête"""
+
+    def render(self, context=None, request=None):
+        mesure = _mesure.get()
+        if mesure is None:
+            return super().render(context, request)
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            mesure.rendu += time.perf_counter() - debut
+
+
+class DjangoTemplatesMesures(DjangoTemplates):
+    """Moteur DjangoTemplates qui mesure le rendu des gabarits chargés.
+
+    Seuls les gabarits demandés au moteur (render(), get_template()) sont
+    chronométrés ; les {% include %} sont compris dans leur parent.
+    """
+
+    def from_string(self, template_code):
+        return TemplateMesure(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TemplateMesure(super().get_template(template_name).template, self)
+
+
+def _quantile(q, bornes, comptes):
+    """Quantile estimé par interpolation linéaire dans son seau (comme
+    histogram_quantile de Prometheus) ; borne haute finie pour +Inf."""
+    total = sum(comptes)
+    if not total:
+        return math.nan
+    rang = q * total
+    cumul = 0
+    for i, compte in enumerate(comptes):
+        if compte and cumul + compte >= rang:
+            if i == len(bornes):
+                return bornes[-1]
+            bas = bornes[i - 1] if i else 0
+            return bas + (bornes[i] - bas) * (rang - cumul) / compte
+        cumul += compte
+    return bornes[-1]
+
+
+class Histogrammes:
+    """Histogrammes (vue, mesure) -> [comptes par seau, +Inf compris], somme"""
+
+    def __init__(self):
+        self.donnees = {}
+        self.verrou = threading.Lock()
+        self.dernier_versement = time.monotonic()
+
+    def observer(self, vue, valeurs):
+        with self.verrou:
+            for metrique, valeur in valeurs.items():
+                bornes = METRIQUES[metrique][2]
+                cle = (vue, metrique)
+                if cle not in self.donnees:
+                    self.donnees[cle] = ([0] * (len(bornes) + 1), [0.0])
+                comptes, somme = self.donnees[cle]
+                comptes[bisect_left(bornes, valeur)] += 1
+                somme[0] += valeur
+
+    def fusionner(self, donnees):
+        with self.verrou:
+            for cle, (comptes, somme) in donnees.items():
+                if cle not in self.donnees:
+                    self.donnees[cle] = ([0] * len(comptes), [0.0])
+                cumul, total = self.donnees[cle]
+                for i, compte in enumerate(comptes):
+                    cumul[i] += compte
+                total[0] += somme[0]
+
+    def copie(self):
+        with self.verrou:
+            return {
+                cle: (list(comptes), list(somme))
+                for cle, (comptes, somme) in self.donnees.items()
+            }
+
+    def verser(self, fichier):
+        """Ajoute les histogrammes au fichier partagé puis les remet à zéro.
+
+        En cas d'échec (fichier verrouillé trop longtemps), les valeurs sont
+        conservées pour le versement suivant.
+        """
+        with self.verrou:
+            donnees, self.donnees = self.donnees, {}
+            self.dernier_versement = time.monotonic()
+        if not donnees:
+            return
+        try:
+            base = _ouvrir(fichier)
+            try:
+                with base:
+                    base.executemany(
+                        'INSERT INTO seaux VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT (vue, metrique, seau) '
+                        'DO UPDATE SET compte = compte + excluded.compte',
+                        [
+                            (vue, metrique, seau, compte)
+                            for (vue, metrique), (comptes, _) in donnees.items()
+                            for seau, compte in enumerate(comptes) if compte
+                        ]
+                    )
+                    base.executemany(
+                        'INSERT INTO sommes VALUES (?, ?, ?) '
+                        'ON CONFLICT (vue, metrique) '
+                        'DO UPDATE SET somme = somme + excluded.somme',
+                        [
+                            (vue, metrique, somme[0])
+                            for (vue, metrique), (_, somme) in donnees.items()
+                        ]
+                    )
+            finally:
+                base.close()
+        except sqlite3.Error:
+            logger.warning('Versement des métriques impossible', exc_info=True)
+            self.fusionner(donnees)
+
+
+def _ouvrir(fichier):
+    """Connexion au fichier partagé, tables créées au besoin"""
+    base = sqlite3.connect(fichier, timeout=5)
+    base.execute('PRAGMA journal_mode=WAL')
+    base.execute(
+        'CREATE TABLE IF NOT EXISTS seaux (vue TEXT, metrique TEXT, '
+        'seau INTEGER, compte INTEGER, PRIMARY KEY (vue, metrique, seau)) '
+        'WITHOUT ROWID'
+    )
+    base.execute(
+        'CREATE TABLE IF NOT EXISTS sommes (vue TEXT, metrique TEXT, '
+        'somme REAL, PRIMARY KEY (vue, metrique)) WITHOUT ROWID'
+    )
+    return base
+
+
+def lire_fichier(fichier):
+    """Histogrammes agrégés de tous les workers, lus dans le fichier partagé"""
+    donnees = {}
+    base = _ouvrir(fichier)
+    try:
+        for vue, metrique, somme in base.execute('SELECT * FROM sommes'):
+            if metrique in METRIQUES:
+                taille = len(METRIQUES[metrique][2]) + 1
+                donnees[(vue, metrique)] = ([0] * taille, [somme])
+        for vue, metrique, seau, compte in base.execute('SELECT * FROM seaux'):
+            comptes = donnees.get((vue, metrique), ([], None))[0]
+            if seau < len(comptes):
+                comptes[seau] = compte
+    finally:
+        base.close()
+    return donnees
+
+
+_histogrammes = Histogrammes()
+
+
+def enregistrer(vue, mesure):
+    """Cumule la mesure d'une requête ; verse dans le fichier si c'est l'heure"""
+    _histogrammes.observer(vue, mesure.valeurs())
+    config = configuration()
+    if (config['FICHIER'] and time.monotonic() - _histogrammes.dernier_versement
+            >= config['INTERVALLE']):
+        _histogrammes.verser(config['FICHIER'])
+
+
+@atexit.register
+def _verser_a_la_sortie():
+    fichier = configuration()['FICHIER']
+    if fichier:
+        _histogrammes.verser(fichier)
+
+
+def _etiquette(valeur):
+    return str(valeur).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _nombre(valeur):
+    if math.isnan(valeur):
+        return 'NaN'
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+def exposer():
+    """Histogrammes au format texte Prometheus (tous workers si FICHIER)"""
+    fichier = configuration()['FICHIER']
+    if fichier:
+        _histogrammes.verser(fichier)
+        donnees = lire_fichier(fichier)
+    else:
+        donnees = _histogrammes.copie()
+
+    lignes = []
+    for metrique, (nom, description, bornes) in METRIQUES.items():
+        series = sorted(
+            (vue, valeurs) for (vue, cle), valeurs in donnees.items()
+            if cle == metrique
+        )
+        lignes.append(f'# HELP {nom} {description}')
+        lignes.append(f'# TYPE {nom} histogram')
+        for vue, (comptes, somme) in series:
+            etiquette = f'view="{_etiquette(vue)}"'
+            cumul = 0
+            for borne, compte in zip(list(bornes) + ['+Inf'], comptes):
+                cumul += compte
+                lignes.append(f'{nom}_bucket{{{etiquette},le="{borne}"}} {cumul}')
+            lignes.append(f'{nom}_sum{{{etiquette}}} {_nombre(somme[0])}')
+            lignes.append(f'{nom}_count{{{etiquette}}} {cumul}')
+        lignes.append(f'# HELP {nom}_quantile {description} (p50/p95/p99)')
+        lignes.append(f'# TYPE {nom}_quantile gauge')
+        for vue, (comptes, _) in series:
+            for q in QUANTILES:
+                lignes.append(
+                    f'{nom}_quantile{{view="{_etiquette(vue)}",quantile="{q}"}} '
+                    f'{_nombre(_quantile(q, bornes, comptes))}'
+                )
+    return '\n'.join(lignes) + '\n'
+
+
+class MiddlewareMetriques:
+    """Mesure chaque requête : en-tête Server-Timing et histogrammes par vue.
+
+    À placer en tête de settings.MIDDLEWARE pour que la durée totale
+    comprenne les autres middlewares.
+    """
+
+    def __init__(self, get_response):
+        if not configuration()['ACTIF']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mesure = Mesure()
+        jeton = _mesure.set(mesure)
+        try:
+            with ExitStack() as pile:
+                for alias in connections:
+                    pile.enter_context(connections[alias].execute_wrapper(mesure))
+                response = self.get_response(request)
+        finally:
+            _mesure.reset(jeton)
+        mesure.terminer()
+        response['Server-Timing'] = mesure.server_timing()
+        correspondance = request.resolver_match
+        enregistrer(
+            correspondance.view_name if correspondance else VUE_NON_RESOLUE,
+            mesure,
+        )
+        return response
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def calculer_soldes(apps, schema_editor):
+    """Initialise les soldes à partir des mouvements existants"""
+    Produit = apps.get_model("inventory", "Produit")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+    totaux = Produit.objects.order_by().annotate(
+        entrees=Coalesce(
+            Sum("mouvement__quantite", filter=Q(mouvement__type_mouvement="entree")),
+            0,
+        ),
+        sorties=Coalesce(
+            Sum("mouvement__quantite", filter=Q(mouvement__type_mouvement="sortie")),
+            0,
+        ),
+    ).values_list("pk", "entrees", "sorties")
+    StockBalance.objects.bulk_create(
+        [
+            StockBalance(
+                produit_id=pk,
+                quantite=entrees - sorties,
+                total_entrees=entrees,
+                total_sorties=sorties,
+            )
+            for pk, entrees, sorties in totaux
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_produit_photo_alter_produit_cout_achat_coutachat_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockBalance",
+            fields=[
+                (
+                    "produit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stock_balance",
+                        serialize=False,
+                        to="inventory.produit",
+                        verbose_name="Товар",
+                    ),
+                ),
+                ("quantite", models.IntegerField(default=0, verbose_name="Залишок")),
+                (
+                    "total_entrees",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Всього надходжень"
+                    ),
+                ),
+                (
+                    "total_sorties",
+                    models.BigIntegerField(default=0, verbose_name="Всього виходів"),
+                ),
+                (
+                    "date_modification",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата зміни"),
+                ),
+            ],
+            options={
+                "verbose_name": "Залишок товару",
+                "verbose_name_plural": "Залишки товарів",
+            },
+        ),
+        migrations.RunPython(calculer_soldes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:16
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def calculer_prix_negocies(apps, schema_editor):
+    """Initialise les prix et coûts actifs mis en cache sur les produits"""
+    Produit = apps.get_model("inventory", "Produit")
+    PrixVente = apps.get_model("inventory", "PrixVente")
+    CoutAchat = apps.get_model("inventory", "CoutAchat")
+    Produit.objects.update(
+        prix_vente_negocie=Subquery(
+            PrixVente.objects.filter(produit=OuterRef("pk"), actif=True)
+            .order_by("-date_creation")
+            .values("prix")[:1]
+        ),
+        cout_achat_negocie=Subquery(
+            CoutAchat.objects.filter(produit=OuterRef("pk"), actif=True)
+            .order_by("-date_creation")
+            .values("cout")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_stockbalance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="produit",
+            name="cout_achat_negocie",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                help_text="Остання активна собівартість (кеш, оновлюється автоматично)",
+                max_digits=10,
+                null=True,
+                verbose_name="Активна собівартість",
+            ),
+        ),
+        migrations.AddField(
+            model_name="produit",
+            name="prix_vente_negocie",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                help_text="Остання активна ціна продажу (кеш, оновлюється автоматично)",
+                max_digits=10,
+                null=True,
+                verbose_name="Активна ціна продажу",
+            ),
+        ),
+        migrations.RunPython(calculer_prix_negocies, migrations.RunPython.noop),
+    ]
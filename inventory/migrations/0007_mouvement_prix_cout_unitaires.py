@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_produit_prix_cout_negocies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mouvement",
+            name="cout_unitaire",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                help_text="Собівартість, зафіксована під час операції",
+                max_digits=10,
+                null=True,
+                verbose_name="Собівартість за одиницю",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mouvement",
+            name="prix_unitaire",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                help_text="Ціна продажу, зафіксована під час операції",
+                max_digits=10,
+                null=True,
+                verbose_name="Ціна за одиницю",
+            ),
+        ),
+    ]
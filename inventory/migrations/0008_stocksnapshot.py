@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0007_mouvement_prix_cout_unitaires"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(db_index=True, verbose_name="Дата")),
+                ("quantite", models.IntegerField(verbose_name="Залишок")),
+                (
+                    "cout_unitaire",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        verbose_name="Собівартість за одиницю",
+                    ),
+                ),
+                (
+                    "valeur",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=16, verbose_name="Вартість запасу"
+                    ),
+                ),
+                (
+                    "produit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="inventory.produit",
+                        verbose_name="Товар",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Знімок запасу",
+                "verbose_name_plural": "Знімки запасів",
+                "ordering": ["-date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("produit", "date"), name="unique_snapshot_produit_date"
+                    )
+                ],
+            },
+        ),
+    ]
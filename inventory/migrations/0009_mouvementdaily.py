@@ -0,0 +1,126 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Case, Count, DecimalField, F, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def calculer_cumuls(apps, schema_editor):
+    """Initialise les cumuls journaliers à partir des mouvements existants"""
+    Mouvement = apps.get_model("inventory", "Mouvement")
+    MouvementDaily = apps.get_model("inventory", "MouvementDaily")
+    unitaire = Case(
+        When(type_mouvement="sortie", then=F("prix_unitaire")),
+        default=F("cout_unitaire"),
+    )
+    lignes = (
+        Mouvement.objects.order_by()
+        .annotate(jour=TruncDate("date_mouvement"))
+        .values("produit_id", "jour", "type_mouvement")
+        .annotate(
+            total_quantite=Sum("quantite"),
+            total_valeur=Coalesce(
+                Sum(
+                    F("quantite") * unitaire,
+                    output_field=DecimalField(max_digits=16, decimal_places=2),
+                ),
+                Decimal("0.00"),
+            ),
+            total_nombre=Count("pk"),
+        )
+    )
+    MouvementDaily.objects.bulk_create(
+        [
+            MouvementDaily(
+                produit_id=ligne["produit_id"],
+                jour=ligne["jour"],
+                type_mouvement=ligne["type_mouvement"],
+                quantite=ligne["total_quantite"],
+                valeur=ligne["total_valeur"],
+                nombre=ligne["total_nombre"],
+            )
+            for ligne in lignes
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0008_stocksnapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MouvementDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("jour", models.DateField(verbose_name="День")),
+                (
+                    "type_mouvement",
+                    models.CharField(
+                        choices=[("entree", "Надходження"), ("sortie", "Вихід")],
+                        max_length=10,
+                        verbose_name="Тип операції",
+                    ),
+                ),
+                (
+                    "quantite",
+                    models.BigIntegerField(default=0, verbose_name="Кількість"),
+                ),
+                (
+                    "valeur",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=16,
+                        verbose_name="Вартість",
+                    ),
+                ),
+                (
+                    "nombre",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Кількість операцій"
+                    ),
+                ),
+                (
+                    "produit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mouvements_journaliers",
+                        to="inventory.produit",
+                        verbose_name="Товар",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Підсумок рухів за день",
+                "verbose_name_plural": "Підсумки рухів за день",
+                "ordering": ["-jour"],
+                "indexes": [
+                    models.Index(
+                        fields=["jour", "type_mouvement"],
+                        name="mvt_daily_jour_type_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("produit", "jour", "type_mouvement"),
+                        name="unique_mouvement_daily",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(calculer_cumuls, migrations.RunPython.noop),
+    ]
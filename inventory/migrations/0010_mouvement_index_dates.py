@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0009_mouvementdaily"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mouvement",
+            index=models.Index(
+                fields=["produit", "date_mouvement"], name="mvt_produit_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mouvement",
+            index=models.Index(
+                fields=["type_mouvement", "date_mouvement"], name="mvt_type_date_idx"
+            ),
+        ),
+    ]
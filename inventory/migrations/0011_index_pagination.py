@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0010_mouvement_index_dates"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mouvement",
+            index=models.Index(fields=["date_mouvement", "id"], name="mvt_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="produit",
+            index=models.Index(
+                fields=["description", "id"], name="produit_description_id_idx"
+            ),
+        ),
+    ]
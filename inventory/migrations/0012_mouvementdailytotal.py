@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:28
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def calculer_totaux(apps, schema_editor):
+    """Initialise les cumuls tous produits à partir des cumuls par produit"""
+    MouvementDaily = apps.get_model("inventory", "MouvementDaily")
+    MouvementDailyTotal = apps.get_model("inventory", "MouvementDailyTotal")
+    lignes = (
+        MouvementDaily.objects.order_by()
+        .values("jour", "type_mouvement")
+        .annotate(
+            total_quantite=Sum("quantite"),
+            total_valeur=Sum("valeur"),
+            total_nombre=Sum("nombre"),
+        )
+    )
+    MouvementDailyTotal.objects.bulk_create(
+        [
+            MouvementDailyTotal(
+                jour=ligne["jour"],
+                type_mouvement=ligne["type_mouvement"],
+                quantite=ligne["total_quantite"],
+                valeur=ligne["total_valeur"],
+                nombre=ligne["total_nombre"],
+            )
+            for ligne in lignes
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0011_index_pagination"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MouvementDailyTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("jour", models.DateField(verbose_name="День")),
+                (
+                    "type_mouvement",
+                    models.CharField(
+                        choices=[("entree", "Надходження"), ("sortie", "Вихід")],
+                        max_length=10,
+                        verbose_name="Тип операції",
+                    ),
+                ),
+                (
+                    "quantite",
+                    models.BigIntegerField(default=0, verbose_name="Кількість"),
+                ),
+                (
+                    "valeur",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=16,
+                        verbose_name="Вартість",
+                    ),
+                ),
+                (
+                    "nombre",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Кількість операцій"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Загальний підсумок рухів за день",
+                "verbose_name_plural": "Загальні підсумки рухів за день",
+                "ordering": ["-jour"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("jour", "type_mouvement"),
+                        name="unique_mouvement_daily_total",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(calculer_totaux, migrations.RunPython.noop),
+    ]
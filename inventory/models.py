@@ -1,6 +1,73 @@
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, TruncDate
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from collections import defaultdict
 from decimal import Decimal
+import itertools
+
+from .cache_stock import infos_produit, invalider_produits
+from .tableau_bord import programmer_rechauffage
+
+
+# Version des calculs de stock par produit, changée à chaque écriture
+# (mouvement, prix, coût) : les instances déjà chargées comparent leur
+# version à celle-ci pour savoir si leurs calculs mémorisés sont périmés.
+_versions_produits = {}
+_compteur_versions = itertools.count(1)
+
+
+class StockInsuffisant(Exception):
+    """Sortie refusée : le solde du produit ne couvre pas la quantité"""
+
+    def __init__(self, produit_id, quantite):
+        self.produit_id = produit_id
+        self.quantite = quantite
+        super().__init__(
+            f"Stock insuffisant pour le produit #{produit_id} ({quantite} demandés)"
+        )
+
+
+def invalider_produit(produit_id):
+    """Périme les calculs mémorisés de toutes les instances d'un produit"""
+    _versions_produits[produit_id] = next(_compteur_versions)
+
+
+class ProduitQuerySet(models.QuerySet):
+    """QuerySet des produits avec annotations de stock et de prix"""
+
+    def with_stock(self):
+        """Annote stock, statut, prix, coût et valeur en une seule requête.
+
+        Les annotations (entrees, sorties, stock, statut, prix_vente_courant,
+        cout_achat_courant, valeur) sont reprises par les méthodes du modèle
+        (stock_actuel, statut_stock, valeur_stock...) sans requête
+        supplémentaire.
+        """
+        return self.annotate(
+            entrees=Coalesce(F('stock_balance__total_entrees'), 0),
+            sorties=Coalesce(F('stock_balance__total_sorties'), 0),
+            stock=Coalesce(F('stock_balance__quantite'), 0),
+            prix_vente_courant=Coalesce(
+                F('prix_vente_negocie'), F('prix_vente')
+            ),
+            cout_achat_courant=Coalesce(
+                F('cout_achat_negocie'), F('cout_achat')
+            ),
+        ).annotate(
+            statut=Case(
+                When(stock__lte=0, then=Value('rupture')),
+                When(stock__lte=F('seuil_alerte'), then=Value('alerte')),
+                default=Value('normal'),
+            ),
+            valeur=ExpressionWrapper(
+                F('stock') * F('cout_achat_courant'),
+                output_field=DecimalField(max_digits=16, decimal_places=2)
+            ),
+        )
 
 
 class Produit(models.Model):
@@ -32,6 +99,24 @@ class Produit(models.Model):
         verbose_name="Поріг попередження",
         help_text="Мінімальна кількість для попередження"
     )
+    prix_vente_negocie = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Активна ціна продажу",
+        help_text="Остання активна ціна продажу (кеш, оновлюється автоматично)"
+    )
+    cout_achat_negocie = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Активна собівартість",
+        help_text="Остання активна собівартість (кеш, оновлюється автоматично)"
+    )
     date_creation = models.DateTimeField(
         auto_now_add=True, verbose_name="Дата створення"
     )
@@ -39,24 +124,99 @@ class Produit(models.Model):
         auto_now=True, verbose_name="Дата зміни"
     )
 
+    objects = ProduitQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товари"
         ordering = ['description']
+        indexes = [
+            # Clé de la pagination par curseur (inventory.pagination)
+            models.Index(
+                fields=['description', 'id'],
+                name='produit_description_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.description
 
+    # Champs lus par prix_vente_actuel() et cout_achat_actuel() : à charger
+    # avec only() pour figer les prix de mouvements sans requête par produit
+    CHAMPS_PRIX_ACTUELS = (
+        'prix_vente', 'cout_achat', 'prix_vente_negocie', 'cout_achat_negocie',
+    )
+
+    # Calculs mémorisés dans l'instance (ou fournis par with_stock())
+    CHAMPS_MEMORISES = (
+        'entrees', 'sorties', 'stock', 'statut', 'valeur',
+        'prix_vente_courant', 'cout_achat_courant',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._version_calculs = _versions_produits.get(instance.pk, 0)
+        return instance
+
+    # Prix et coût actifs mis en cache, tenus à jour par rafraichir_*() en
+    # UPDATE ciblé : jamais réécrits par le save() d'une instance chargée
+    # avant le changement de prix
+    CHAMPS_NEGOCIES = ('prix_vente_negocie', 'cout_achat_negocie')
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            differes = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                champ.name for champ in self._meta.concrete_fields
+                if not champ.primary_key
+                and champ.name not in self.CHAMPS_NEGOCIES
+                and champ.attname not in differes
+            ]
+        super().save(*args, **kwargs)
+        # Le seuil d'alerte ou le coût de base peuvent avoir changé
+        invalider_produit(self.pk)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.invalider_calculs()
+
+    def invalider_calculs(self):
+        """Oublie les calculs de stock mémorisés sur l'instance"""
+        for champ in self.CHAMPS_MEMORISES:
+            self.__dict__.pop(champ, None)
+        self._version_calculs = _versions_produits.get(self.pk, 0)
+
+    def _calculs_a_jour(self):
+        """Vide les calculs mémorisés si le produit a été modifié depuis"""
+        if getattr(self, '_version_calculs', None) != _versions_produits.get(self.pk, 0):
+            self.invalider_calculs()
+
+    def _charger_calculs(self):
+        """Charge stock, statut, prix, coût et valeur depuis le cache partagé.
+
+        En cas d'absence du cache, inventory.cache_stock les calcule en une
+        requête (with_stock) ; un produit non enregistré a un stock nul.
+        """
+        infos = infos_produit(self.pk) if self.pk is not None else None
+        if infos is None:
+            self.stock = 0
+        else:
+            self.__dict__.update(infos)
+
     def stock_actuel(self):
-        """Calcule le stock actuel (entrées - sorties)"""
-        from django.db.models import Sum
-        entrees = self.mouvement_set.filter(
-            type_mouvement='entree'
-        ).aggregate(total=Sum('quantite'))['total'] or 0
-        sorties = self.mouvement_set.filter(
-            type_mouvement='sortie'
-        ).aggregate(total=Sum('quantite'))['total'] or 0
-        return entrees - sorties
+        """Retourne le stock actuel depuis le solde dénormalisé (StockBalance).
+
+        Le résultat est mémorisé dans l'instance jusqu'à la prochaine
+        écriture d'un mouvement, prix ou coût du produit, et partagé entre
+        workers par inventory.cache_stock.
+        """
+        self._calculs_a_jour()
+        if 'stock' not in self.__dict__:
+            self._charger_calculs()
+        return self.stock
 
     def est_en_rupture(self):
         """Vérifie si le produit est en rupture de stock"""
@@ -69,6 +229,8 @@ class Produit(models.Model):
     def statut_stock(self):
         """Retourne le statut du stock (normal, alerte, rupture)"""
         stock = self.stock_actuel()
+        if 'statut' in self.__dict__:
+            return self.statut
         if stock <= 0:
             return 'rupture'
         elif stock <= self.seuil_alerte:
@@ -78,19 +240,43 @@ class Produit(models.Model):
 
     def valeur_stock(self):
         """Calcule la valeur du stock actuel (quantité × coût actuel)"""
-        return self.stock_actuel() * self.cout_achat_actuel()
+        stock = self.stock_actuel()
+        if 'valeur' in self.__dict__:
+            return self.valeur
+        return stock * self.cout_achat_actuel()
 
     def prix_vente_actuel(self):
-        """Retourne le prix de vente le plus récent ou le prix de base"""
-        dernier_prix = self.prix_vente_historique.filter(actif=True).order_by('-date_creation').first()
-        return dernier_prix.prix if dernier_prix else self.prix_vente
+        """Retourne le prix de vente actif le plus récent ou le prix de base"""
+        if self.prix_vente_negocie is not None:
+            return self.prix_vente_negocie
+        return self.prix_vente
 
     def cout_achat_actuel(self):
-        """Retourne le coût d'achat le plus récent ou le coût de base"""
-        dernier_cout = self.cout_achat_historique.filter(
+        """Retourne le coût d'achat actif le plus récent ou le coût de base"""
+        if self.cout_achat_negocie is not None:
+            return self.cout_achat_negocie
+        return self.cout_achat
+
+    def rafraichir_prix_vente_negocie(self):
+        """Recalcule le prix de vente actif mis en cache sur le produit"""
+        self.prix_vente_negocie = self.prix_vente_historique.filter(
+            actif=True
+        ).order_by('-date_creation').values_list('prix', flat=True).first()
+        # date_modification sert de validateur au catalogue des prix
+        Produit.objects.filter(pk=self.pk).update(
+            prix_vente_negocie=self.prix_vente_negocie, date_modification=timezone.now()
+        )
+        invalider_produit(self.pk)
+
+    def rafraichir_cout_achat_negocie(self):
+        """Recalcule le coût d'achat actif mis en cache sur le produit"""
+        self.cout_achat_negocie = self.cout_achat_historique.filter(
             actif=True
-        ).order_by('-date_creation').first()
-        return dernier_cout.cout if dernier_cout else self.cout_achat
+        ).order_by('-date_creation').values_list('cout', flat=True).first()
+        Produit.objects.filter(pk=self.pk).update(
+            cout_achat_negocie=self.cout_achat_negocie, date_modification=timezone.now()
+        )
+        invalider_produit(self.pk)
 
     def marge_beneficiaire(self):
         """Calcule la marge bénéficiaire actuelle"""
@@ -137,6 +323,12 @@ class CoutAchat(models.Model):
         verbose_name_plural = "Собівартості"
         ordering = ['-date_creation']
 
+    def save(self, *args, **kwargs):
+        """Enregistre le coût et met à jour le coût actif du produit"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.produit.rafraichir_cout_achat_negocie()
+
     def __str__(self):
         fournisseur_info = f" ({self.fournisseur})" if self.fournisseur else ""
         return f"{self.produit.description} - {self.cout}€{fournisseur_info}"
@@ -182,17 +374,48 @@ class PrixVente(models.Model):
         verbose_name_plural = "Ціни продажу"
         ordering = ['-date_creation']
 
+    def save(self, *args, **kwargs):
+        """Enregistre le prix et met à jour le prix actif du produit"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.produit.rafraichir_prix_vente_negocie()
+
     def __str__(self):
         client_info = f" ({self.client})" if self.client else ""
         return f"{self.produit.description} - {self.prix}€{client_info}"
 
 
+class MouvementQuerySet(models.QuerySet):
+    """QuerySet des mouvements avec valorisation en SQL"""
+
+    def with_valeur(self):
+        """Annote la valeur du mouvement depuis les prix figés.
+
+        Sortie : quantité × prix unitaire, entrée : quantité × coût
+        unitaire (0 si le prix n'a pas encore été figé).
+        """
+        return self.annotate(
+            valeur=ExpressionWrapper(
+                F('quantite') * Coalesce(
+                    Case(
+                        When(type_mouvement='sortie', then=F('prix_unitaire')),
+                        default=F('cout_unitaire'),
+                    ),
+                    Value(Decimal('0.00')),
+                ),
+                output_field=DecimalField(max_digits=16, decimal_places=2)
+            )
+        )
+
+
 class Mouvement(models.Model):
     """Modèle pour les mouvements de stock"""
     TYPE_CHOICES = [
         ('entree', 'Надходження'),
         ('sortie', 'Вихід'),
     ]
+    # Plus grande quantité admise par PositiveIntegerField (entier 32 bits)
+    QUANTITE_MAX = 2147483647
 
     produit = models.ForeignKey(
         Produit,
@@ -223,23 +446,282 @@ class Mouvement(models.Model):
         help_text="Собівартість використана для цієї операції "
                   "(тільки для надходжень)"
     )
+    prix_unitaire = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Ціна за одиницю",
+        help_text="Ціна продажу, зафіксована під час операції"
+    )
+    cout_unitaire = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Собівартість за одиницю",
+        help_text="Собівартість, зафіксована під час операції"
+    )
     date_mouvement = models.DateTimeField(
         auto_now_add=True, verbose_name="Дата операції"
     )
     commentaire = models.TextField(blank=True, verbose_name="Коментар")
 
+    objects = MouvementQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Рух товару"
         verbose_name_plural = "Рухи товарів"
         ordering = ['-date_mouvement']
+        indexes = [
+            models.Index(
+                fields=['produit', 'date_mouvement'],
+                name='mvt_produit_date_idx'
+            ),
+            models.Index(
+                fields=['type_mouvement', 'date_mouvement'],
+                name='mvt_type_date_idx'
+            ),
+            models.Index(
+                fields=['date_mouvement', 'id'],
+                name='mvt_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return (f"{self.get_type_mouvement_display()} - "
                 f"{self.produit.description} ({self.quantite})")
 
+    def figer_prix(self):
+        """Fige le prix et le coût unitaires en vigueur sur le mouvement"""
+        if self.prix_unitaire is None:
+            self.prix_unitaire = (
+                self.prix_vente_utilise.prix if self.prix_vente_utilise
+                else self.produit.prix_vente_actuel()
+            )
+        if self.cout_unitaire is None:
+            self.cout_unitaire = (
+                self.cout_achat_utilise.cout if self.cout_achat_utilise
+                else self.produit.cout_achat_actuel()
+            )
+
+    def save(self, *args, **kwargs):
+        """Enregistre le mouvement et met à jour le solde dans la même transaction.
+
+        Une sortie que le solde ne couvre pas lève StockInsuffisant ; rien
+        n'est alors enregistré.
+        """
+        ajout = self._state.adding
+        if ajout:
+            self.figer_prix()
+        try:
+            self._enregistrer(*args, **kwargs)
+        except StockInsuffisant:
+            if ajout:
+                self.pk = None
+                self._state.adding = True
+            raise
+
+    # Champs dont dépendent les photographies du stock (StockSnapshot)
+    CHAMPS_STOCK = (
+        'produit_id', 'type_mouvement', 'quantite', 'date_mouvement',
+        'cout_unitaire',
+    )
+
+    def _enregistrer(self, *args, **kwargs):
+        with transaction.atomic():
+            ancien = None
+            if self.pk:
+                ancien = Mouvement.objects.filter(pk=self.pk).only(
+                    'produit', 'type_mouvement', 'quantite', 'date_mouvement',
+                    'prix_unitaire', 'cout_unitaire'
+                ).first()
+            super().save(*args, **kwargs)
+            # Solde absent : recalculé depuis le journal, qui contient déjà
+            # la nouvelle version ; plus aucun delta ne doit s'y ajouter
+            reconstruit = False
+            if ancien:
+                reconstruit = StockBalance.appliquer(
+                    ancien.produit_id, ancien.type_mouvement, -ancien.quantite
+                ) and ancien.produit_id == self.produit_id
+                MouvementDaily.appliquer(ancien, signe=-1)
+                # Un mouvement neuf est daté de l'instant présent, après les
+                # échéances photographiées ; une modification peut porter
+                # sur le passé
+                if any(
+                    getattr(ancien, champ) != getattr(self, champ)
+                    for champ in self.CHAMPS_STOCK
+                ):
+                    StockSnapshot.invalider_depuis(min(
+                        timezone.localdate(ancien.date_mouvement),
+                        timezone.localdate(self.date_mouvement),
+                    ))
+            if reconstruit:
+                if self.type_mouvement == 'sortie' and StockBalance.objects.filter(
+                    produit_id=self.produit_id, quantite__lt=0
+                ).exists():
+                    raise StockInsuffisant(self.produit_id, self.quantite)
+            elif self.type_mouvement == 'sortie':
+                StockBalance.retirer(self.produit_id, self.quantite)
+            else:
+                StockBalance.appliquer(
+                    self.produit_id, self.type_mouvement, self.quantite
+                )
+            MouvementDaily.appliquer(self)
+
+    @classmethod
+    def enregistrer_lot(cls, mouvements, taille_lot=None):
+        """Enregistre des mouvements neufs en une transaction.
+
+        Équivaut à save() sur chacun, mais les mouvements sont insérés par
+        bulk_create et soldes et cumuls journaliers ne sont mis à jour
+        qu'une fois par produit (et par jour et type) ; taille_lot découpe
+        l'insertion en plusieurs requêtes. Si les sorties d'un produit
+        dépassent son solde, tout le lot est refusé (StockInsuffisant).
+        Aucun signal post_save n'est émis : le cache des produits concernés
+        est invalidé une seule fois pour le lot.
+        """
+        mouvements = list(mouvements)
+        for mouvement in mouvements:
+            mouvement.figer_prix()
+        with transaction.atomic():
+            cls._preparer_soldes({m.produit_id for m in mouvements})
+            cls.objects.bulk_create(mouvements, batch_size=taille_lot)
+            cls._cumuler_lot(
+                (m.produit_id, m.type_mouvement, m.quantite, m.valeur_figee(),
+                 timezone.localdate(m.date_mouvement))
+                for m in mouvements
+            )
+        return mouvements
+
+    # Colonnes des tuples passés à inserer_en_masse(), dans l'ordre
+    COLONNES_MASSE = (
+        'produit', 'type_mouvement', 'quantite', 'commentaire',
+        'prix_unitaire', 'cout_unitaire',
+    )
+
+    @classmethod
+    def inserer_en_masse(cls, lignes, taille_lot=None):
+        """Insère des mouvements neufs décrits par des tuples (COLONNES_MASSE).
+
+        Variante d'enregistrer_lot pour les imports volumineux : ni
+        instances ni bulk_create (limité à une centaine de lignes par INSERT
+        sous SQLite), mais une requête préparée exécutée par executemany.
+        Les prix doivent être figés par l'appelant. Même traitement des
+        soldes, cumuls et du cache ; retourne le nombre de mouvements.
+        """
+        lignes = list(lignes)
+        maintenant = timezone.now()
+        champs = [
+            cls._meta.get_field(nom)
+            for nom in cls.COLONNES_MASSE + ('date_mouvement',)
+        ]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(cls._meta.db_table),
+            ', '.join(quote(champ.column) for champ in champs),
+            ', '.join(['%s'] * len(champs)),
+        )
+        # Conversions pour la base, une fois par valeur distincte
+        prix, cout, date = champs[4], champs[5], champs[6]
+        conversions = {}
+
+        def convertir(champ, valeur):
+            cle = (champ.name, valeur)
+            if cle not in conversions:
+                conversions[cle] = champ.get_db_prep_save(valeur, connection)
+            return conversions[cle]
+
+        valeurs = [
+            (produit_id, type_mouvement, quantite, commentaire,
+             convertir(prix, prix_unitaire), convertir(cout, cout_unitaire),
+             convertir(date, maintenant))
+            for produit_id, type_mouvement, quantite, commentaire,
+            prix_unitaire, cout_unitaire in lignes
+        ]
+        taille_lot = taille_lot or len(valeurs) or 1
+        jour = timezone.localdate(maintenant)
+        with transaction.atomic():
+            cls._preparer_soldes({ligne[0] for ligne in lignes})
+            with connection.cursor() as curseur:
+                for debut in range(0, len(valeurs), taille_lot):
+                    curseur.executemany(sql, valeurs[debut:debut + taille_lot])
+            resumes = []
+            for (produit_id, type_mouvement, quantite, _,
+                 prix_unitaire, cout_unitaire) in lignes:
+                # Même valeur que valeur_figee()
+                unitaire = (
+                    prix_unitaire if type_mouvement == 'sortie' else cout_unitaire
+                )
+                valeur = (
+                    quantite * unitaire if unitaire is not None
+                    else Decimal('0.00')
+                )
+                resumes.append((produit_id, type_mouvement, quantite, valeur, jour))
+            cls._cumuler_lot(resumes)
+        return len(lignes)
+
+    @staticmethod
+    def _preparer_soldes(produit_ids):
+        """Crée les soldes manquants avant l'insertion d'un lot.
+
+        Recalculés après l'insertion, ils compteraient déjà tout le lot.
+        """
+        manquants = produit_ids - set(
+            StockBalance.objects.filter(produit_id__in=produit_ids)
+            .values_list('produit_id', flat=True)
+        )
+        if manquants:
+            StockBalance.reconstruire(manquants)
+
+    @staticmethod
+    def _cumuler_lot(lignes):
+        """Met à jour soldes et cumuls journaliers une fois par produit.
+
+        lignes : (produit_id, type_mouvement, quantite, valeur, jour).
+        """
+        soldes = defaultdict(int)
+        cumuls = defaultdict(lambda: [0, Decimal('0.00'), 0])
+        totaux = defaultdict(lambda: [0, Decimal('0.00'), 0])
+        for produit_id, type_mouvement, quantite, valeur, jour in lignes:
+            soldes[produit_id, type_mouvement] += quantite
+            for cumul in (
+                cumuls[produit_id, jour, type_mouvement],
+                totaux[jour, type_mouvement],
+            ):
+                cumul[0] += quantite
+                cumul[1] += valeur
+                cumul[2] += 1
+        # Entrées d'abord : une sortie du lot peut porter sur elles
+        for (produit_id, type_mouvement), quantite in sorted(
+            soldes.items(), key=lambda solde: solde[0][1] == 'sortie'
+        ):
+            if type_mouvement == 'sortie':
+                StockBalance.retirer(produit_id, quantite)
+            else:
+                StockBalance.appliquer(produit_id, type_mouvement, quantite)
+        for cle, (quantite, valeur, nombre) in cumuls.items():
+            MouvementDaily.cumuler(*cle, quantite, valeur, nombre)
+        for cle, (quantite, valeur, nombre) in totaux.items():
+            MouvementDailyTotal.cumuler(*cle, quantite, valeur, nombre)
+        invalider_produits({produit_id for produit_id, _ in soldes})
+        programmer_rechauffage()
+
+    def valeur_figee(self):
+        """Valeur du mouvement depuis le prix ou coût figé (sans requête)"""
+        unitaire = (
+            self.prix_unitaire if self.type_mouvement == 'sortie'
+            else self.cout_unitaire
+        )
+        return self.quantite * unitaire if unitaire is not None else Decimal('0.00')
+
     def prix_utilise(self):
         """Retourne le prix utilisé pour ce mouvement"""
-        if self.type_mouvement == 'sortie' and self.prix_vente_utilise:
+        if self.type_mouvement == 'sortie' and self.prix_unitaire is not None:
+            return self.prix_unitaire
+        elif self.type_mouvement == 'sortie' and self.prix_vente_utilise:
             return self.prix_vente_utilise.prix
         elif self.type_mouvement == 'sortie':
             return self.produit.prix_vente_actuel()
@@ -247,7 +729,9 @@ class Mouvement(models.Model):
 
     def cout_utilise(self):
         """Retourne le coût d'achat utilisé pour ce mouvement"""
-        if self.type_mouvement == 'entree' and self.cout_achat_utilise:
+        if self.type_mouvement == 'entree' and self.cout_unitaire is not None:
+            return self.cout_unitaire
+        elif self.type_mouvement == 'entree' and self.cout_achat_utilise:
             return self.cout_achat_utilise.cout
         elif self.type_mouvement == 'entree':
             return self.produit.cout_achat_actuel()
@@ -262,3 +746,373 @@ class Mouvement(models.Model):
             cout = self.cout_utilise()
             return self.quantite * cout if cout else 0
         return 0
+
+
+class StockBalance(models.Model):
+    """Solde de stock dénormalisé, maintenu à chaque écriture de Mouvement"""
+    produit = models.OneToOneField(
+        Produit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stock_balance',
+        verbose_name="Товар"
+    )
+    quantite = models.IntegerField(default=0, verbose_name="Залишок")
+    total_entrees = models.BigIntegerField(
+        default=0, verbose_name="Всього надходжень"
+    )
+    total_sorties = models.BigIntegerField(
+        default=0, verbose_name="Всього виходів"
+    )
+    date_modification = models.DateTimeField(
+        auto_now=True, verbose_name="Дата зміни"
+    )
+
+    class Meta:
+        verbose_name = "Залишок товару"
+        verbose_name_plural = "Залишки товарів"
+
+    def __str__(self):
+        return f"{self.produit.description}: {self.quantite}"
+
+    @classmethod
+    def appliquer(cls, produit_id, type_mouvement, quantite):
+        """Applique un delta (signé) au solde d'un produit.
+
+        Doit être appelé dans la transaction qui écrit le mouvement. Si le
+        solde n'existe pas encore, il est recalculé depuis le journal, qui
+        contient déjà l'écriture en cours : retourne alors True, et
+        l'appelant ne doit plus appliquer d'autre delta à ce produit.
+        """
+        if type_mouvement == 'entree':
+            champs = {
+                'quantite': F('quantite') + quantite,
+                'total_entrees': F('total_entrees') + quantite,
+            }
+        else:
+            champs = {
+                'quantite': F('quantite') - quantite,
+                'total_sorties': F('total_sorties') + quantite,
+            }
+        mis_a_jour = cls.objects.filter(produit_id=produit_id).update(
+            date_modification=timezone.now(), **champs
+        )
+        if not mis_a_jour:
+            cls.reconstruire([produit_id])
+        invalider_produit(produit_id)
+        return not mis_a_jour
+
+    @classmethod
+    def retirer(cls, produit_id, quantite):
+        """Sort une quantité du solde seulement s'il la couvre.
+
+        Contrôle et décrément tiennent dans un seul UPDATE ... WHERE
+        quantite >= %s : pas de lecture préalable, et deux workers ne
+        peuvent pas vendre le même stock. Lève StockInsuffisant si aucune
+        ligne n'est modifiée. Comme pour appliquer(), un solde absent est
+        recalculé depuis le journal, qui contient déjà la sortie en cours.
+        """
+        soldes = cls.objects.filter(produit_id=produit_id)
+        mis_a_jour = soldes.filter(quantite__gte=quantite).update(
+            date_modification=timezone.now(),
+            quantite=F('quantite') - quantite,
+            total_sorties=F('total_sorties') + quantite,
+        )
+        if not mis_a_jour:
+            if soldes.exists():
+                raise StockInsuffisant(produit_id, quantite)
+            cls.reconstruire([produit_id])
+            if soldes.filter(quantite__lt=0).exists():
+                raise StockInsuffisant(produit_id, quantite)
+        invalider_produit(produit_id)
+
+    @classmethod
+    def reconstruire(cls, produit_ids=None):
+        """Recalcule les soldes depuis le journal des mouvements.
+
+        Retourne le nombre de soldes écrits.
+        """
+        produits = Produit.objects.order_by()
+        if produit_ids is not None:
+            produits = produits.filter(pk__in=produit_ids)
+        totaux = produits.annotate(
+            entrees=Coalesce(Sum(
+                'mouvement__quantite',
+                filter=Q(mouvement__type_mouvement='entree')
+            ), 0),
+            sorties=Coalesce(Sum(
+                'mouvement__quantite',
+                filter=Q(mouvement__type_mouvement='sortie')
+            ), 0),
+        ).values_list('pk', 'entrees', 'sorties')
+        maintenant = timezone.now()
+        soldes = [
+            cls(
+                produit_id=pk,
+                quantite=entrees - sorties,
+                total_entrees=entrees,
+                total_sorties=sorties,
+                date_modification=maintenant,
+            )
+            for pk, entrees, sorties in totaux
+        ]
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                soldes,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['produit'],
+                update_fields=[
+                    'quantite', 'total_entrees', 'total_sorties',
+                    'date_modification'
+                ],
+            )
+        for solde in soldes:
+            invalider_produit(solde.produit_id)
+        invalider_produits(solde.produit_id for solde in soldes)
+        return len(soldes)
+
+
+class StockSnapshot(models.Model):
+    """Photographie du stock d'un produit à la fin d'une journée (échéance)"""
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name="Товар"
+    )
+    date = models.DateField(db_index=True, verbose_name="Дата")
+    quantite = models.IntegerField(verbose_name="Залишок")
+    cout_unitaire = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="Собівартість за одиницю"
+    )
+    valeur = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        verbose_name="Вартість запасу"
+    )
+
+    @classmethod
+    def invalider_depuis(cls, jour):
+        """Supprime les échéances à partir de `jour` (mouvement passé modifié).
+
+        Les photographies sont denses : l'échéance entière est retirée, pas
+        la seule ligne du produit. stocks_at() rejoue alors les mouvements
+        depuis l'échéance précédente et ecrire_snapshots() réécrit les
+        suivantes à son prochain passage.
+        """
+        cls.objects.filter(date__gte=jour).delete()
+
+    class Meta:
+        verbose_name = "Знімок запасу"
+        verbose_name_plural = "Знімки запасів"
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['produit', 'date'], name='unique_snapshot_produit_date'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.produit.description} - {self.date}: {self.quantite}"
+
+
+class MouvementDaily(models.Model):
+    """Cumul journalier des mouvements par produit et par type"""
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='mouvements_journaliers',
+        verbose_name="Товар"
+    )
+    jour = models.DateField(verbose_name="День")
+    type_mouvement = models.CharField(
+        max_length=10,
+        choices=Mouvement.TYPE_CHOICES,
+        verbose_name="Тип операції"
+    )
+    quantite = models.BigIntegerField(default=0, verbose_name="Кількість")
+    valeur = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Вартість"
+    )
+    nombre = models.PositiveIntegerField(
+        default=0, verbose_name="Кількість операцій"
+    )
+
+    class Meta:
+        verbose_name = "Підсумок рухів за день"
+        verbose_name_plural = "Підсумки рухів за день"
+        ordering = ['-jour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['produit', 'jour', 'type_mouvement'],
+                name='unique_mouvement_daily'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['jour', 'type_mouvement'], name='mvt_daily_jour_type_idx'),
+        ]
+
+    def __str__(self):
+        return (f"{self.produit.description} - {self.jour} "
+                f"{self.type_mouvement}: {self.quantite}")
+
+    @classmethod
+    def appliquer(cls, mouvement, signe=1):
+        """Ajoute (ou retire si signe=-1) un mouvement au cumul de son jour.
+
+        Doit être appelé dans la transaction qui écrit le mouvement. Le
+        cumul tous produits (MouvementDailyTotal) est mis à jour aussi.
+        """
+        jour = timezone.localdate(mouvement.date_mouvement)
+        totaux = (
+            signe * mouvement.quantite, signe * mouvement.valeur_figee(), signe
+        )
+        cls.cumuler(mouvement.produit_id, jour, mouvement.type_mouvement, *totaux)
+        MouvementDailyTotal.cumuler(jour, mouvement.type_mouvement, *totaux)
+
+    @classmethod
+    def cumuler(cls, produit_id, jour, type_mouvement, quantite, valeur, nombre):
+        """Ajoute des totaux (signés) au cumul d'un produit pour un jour et un type"""
+        _cumuler(cls, {
+            'produit_id': produit_id,
+            'jour': jour,
+            'type_mouvement': type_mouvement,
+        }, quantite, valeur, nombre)
+
+    @classmethod
+    def cumuls(cls, produit_ids=None):
+        """Calcule les cumuls journaliers depuis le journal des mouvements"""
+        mouvements = Mouvement.objects.order_by()
+        if produit_ids is not None:
+            mouvements = mouvements.filter(produit_id__in=produit_ids)
+        return [
+            cls(
+                produit_id=ligne['produit_id'],
+                jour=ligne['jour'],
+                type_mouvement=ligne['type_mouvement'],
+                quantite=ligne['total_quantite'],
+                valeur=ligne['total_valeur'],
+                nombre=ligne['total_nombre'],
+            )
+            for ligne in mouvements.with_valeur().annotate(
+                jour=TruncDate('date_mouvement')
+            ).values('produit_id', 'jour', 'type_mouvement').annotate(
+                total_quantite=Sum('quantite'),
+                total_valeur=Sum('valeur'),
+                total_nombre=models.Count('pk'),
+            )
+        ]
+
+    @classmethod
+    def remplacer(cls, produit_ids, cumuls):
+        """Remplace les cumuls des produits donnés (None : tous)"""
+        with transaction.atomic():
+            anciens = cls.objects.all()
+            if produit_ids is not None:
+                anciens = anciens.filter(produit_id__in=produit_ids)
+                MouvementDailyTotal.retrancher(produit_ids)
+            else:
+                MouvementDailyTotal.objects.all().delete()
+            anciens.delete()
+            cls.objects.bulk_create(cumuls, batch_size=1000)
+            MouvementDailyTotal.ajouter(cumuls)
+        return len(cumuls)
+
+
+class MouvementDailyTotal(models.Model):
+    """Cumul journalier des mouvements de tous les produits, par type.
+
+    Tenu à jour avec MouvementDaily, dont il est la somme sur les produits :
+    les séries globales lisent une ligne par jour et par type au lieu
+    d'agréger les cumuls de tout le catalogue.
+    """
+    jour = models.DateField(verbose_name="День")
+    type_mouvement = models.CharField(
+        max_length=10,
+        choices=Mouvement.TYPE_CHOICES,
+        verbose_name="Тип операції"
+    )
+    quantite = models.BigIntegerField(default=0, verbose_name="Кількість")
+    valeur = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Вартість"
+    )
+    nombre = models.PositiveIntegerField(
+        default=0, verbose_name="Кількість операцій"
+    )
+
+    class Meta:
+        verbose_name = "Загальний підсумок рухів за день"
+        verbose_name_plural = "Загальні підсумки рухів за день"
+        ordering = ['-jour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['jour', 'type_mouvement'],
+                name='unique_mouvement_daily_total'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} {self.type_mouvement}: {self.quantite}"
+
+    @classmethod
+    def cumuler(cls, jour, type_mouvement, quantite, valeur, nombre):
+        """Ajoute des totaux (signés) au cumul d'un jour et d'un type"""
+        _cumuler(cls, {
+            'jour': jour,
+            'type_mouvement': type_mouvement,
+        }, quantite, valeur, nombre)
+
+    @classmethod
+    def ajouter(cls, cumuls):
+        """Ajoute des cumuls par produit (instances de MouvementDaily)"""
+        totaux = defaultdict(lambda: [0, Decimal('0.00'), 0])
+        for cumul in cumuls:
+            total = totaux[cumul.jour, cumul.type_mouvement]
+            total[0] += cumul.quantite
+            total[1] += cumul.valeur
+            total[2] += cumul.nombre
+        for cle, (quantite, valeur, nombre) in totaux.items():
+            cls.cumuler(*cle, quantite, valeur, nombre)
+
+    @classmethod
+    def retrancher(cls, produit_ids):
+        """Retire les cumuls enregistrés des produits donnés"""
+        for ligne in MouvementDaily.objects.filter(
+            produit_id__in=produit_ids
+        ).order_by().values('jour', 'type_mouvement').annotate(
+            total_quantite=Sum('quantite'),
+            total_valeur=Sum('valeur'),
+            total_nombre=Sum('nombre'),
+        ):
+            cls.cumuler(
+                ligne['jour'], ligne['type_mouvement'], -ligne['total_quantite'],
+                -ligne['total_valeur'], -ligne['total_nombre'],
+            )
+
+
+def _cumuler(modele, cle, quantite, valeur, nombre):
+    """Ajoute des totaux signés à la ligne `cle` d'un cumul, créée au besoin"""
+    champs = {
+        'quantite': F('quantite') + quantite,
+        'valeur': F('valeur') + valeur,
+        'nombre': F('nombre') + nombre,
+    }
+    if modele.objects.filter(**cle).update(**champs) or nombre < 0:
+        return
+    try:
+        with transaction.atomic():
+            modele.objects.create(
+                quantite=quantite, valeur=valeur, nombre=nombre, **cle
+            )
+    except IntegrityError:
+        # Créé entre-temps par un autre processus
+        modele.objects.filter(**cle).update(**champs)
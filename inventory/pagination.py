@@ -0,0 +1,138 @@
+"""
+Pagination par clé (keyset) des listes de produits et de mouvements.
+
+Contrairement à OFFSET, chaque page est lue à partir de la clé de tri de la
+dernière ligne affichée (par exemple date_mouvement puis id) : le coût d'une
+page ne dépend pas de sa position dans la liste.
+"""
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Au-delà, le total affiché devient « N+ » (comptage borné)
+LIMITE_TOTAL_APPROX = 1000
+
+# Clés de tri uniques des listes paginées
+ORDRE_PRODUITS = ('description', 'id')
+ORDRE_MOUVEMENTS = ('-date_mouvement', '-id')
+
+
+def _encoder(sens, valeurs):
+    brut = json.dumps([sens, valeurs], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def _decoder(curseur, champs_modele):
+    """Retourne (sens, valeurs) ou None si le curseur est invalide"""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        sens, valeurs = json.loads(brut)
+        if sens not in ('suivant', 'precedent') or len(valeurs) != len(champs_modele):
+            return None
+        return sens, [
+            champ.to_python(valeur)
+            for champ, valeur in zip(champs_modele, valeurs)
+        ]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+def _apres(ordre, valeurs):
+    """Condition « strictement après `valeurs` » dans l'ordre lexicographique.
+
+    La borne sur la première colonne est répétée hors du OR pour que SQLite
+    puisse parcourir l'index comme un intervalle.
+    """
+    def comparer(descendant, strict):
+        if descendant:
+            return 'lt' if strict else 'lte'
+        return 'gt' if strict else 'gte'
+
+    premier, premier_desc = ordre[0]
+    borne = Q(**{f'{premier}__{comparer(premier_desc, False)}': valeurs[0]})
+    condition = Q()
+    egalites = {}
+    for (nom, descendant), valeur in zip(ordre, valeurs):
+        condition |= Q(**egalites, **{f'{nom}__{comparer(descendant, True)}': valeur})
+        egalites[nom] = valeur
+    return borne & condition
+
+
+class PageCurseur:
+    """Page de résultats avec les curseurs vers les pages voisines"""
+
+    def __init__(self, objets, curseur_suivant, curseur_precedent, total_approx):
+        self.objets = objets
+        self.curseur_suivant = curseur_suivant
+        self.curseur_precedent = curseur_precedent
+        # (nombre, borné) : borné vaut True si le total dépasse la limite
+        self.total_approx = total_approx
+
+    def __iter__(self):
+        return iter(self.objets)
+
+    def __len__(self):
+        return len(self.objets)
+
+    def __bool__(self):
+        return bool(self.objets)
+
+    @property
+    def total_affiche(self):
+        if self.total_approx is None:
+            return None
+        nombre, borne = self.total_approx
+        return f'{nombre}+' if borne else str(nombre)
+
+
+def paginer_par_cle(queryset, ordre, curseur=None, taille=50, compter=False):
+    """Retourne la page de `queryset` désignée par `curseur`.
+
+    `ordre` est la clé de tri unique, par exemple ('-date_mouvement', '-id').
+    Sans curseur (ou avec un curseur invalide), la première page est
+    renvoyée. `compter` ajoute un total approximatif, borné à
+    LIMITE_TOTAL_APPROX lignes pour que son coût reste constant.
+    """
+    cle = [(nom.lstrip('-'), nom.startswith('-')) for nom in ordre]
+    champs_modele = [queryset.model._meta.get_field(nom) for nom, _ in cle]
+    inverse = [('' if desc else '-') + nom for nom, desc in cle]
+
+    position = _decoder(curseur, champs_modele) if curseur else None
+    if position is None:
+        lignes = list(queryset.order_by(*ordre)[:taille + 1])
+        a_suivante, a_precedente = len(lignes) > taille, False
+    elif position[0] == 'suivant':
+        lignes = list(
+            queryset.filter(_apres(cle, position[1])).order_by(*ordre)[:taille + 1]
+        )
+        a_suivante, a_precedente = len(lignes) > taille, True
+    else:
+        cle_inverse = [(nom, not desc) for nom, desc in cle]
+        lignes = list(
+            queryset.filter(_apres(cle_inverse, position[1]))
+            .order_by(*inverse)[:taille + 1]
+        )
+        a_suivante, a_precedente = True, len(lignes) > taille
+        lignes = lignes[:taille][::-1]
+    lignes = lignes[:taille]
+
+    def valeurs_de(objet):
+        return [champ.value_from_object(objet) for champ in champs_modele]
+
+    curseur_suivant = curseur_precedent = None
+    if lignes and a_suivante:
+        curseur_suivant = _encoder('suivant', valeurs_de(lignes[-1]))
+    if lignes and a_precedente:
+        curseur_precedent = _encoder('precedent', valeurs_de(lignes[0]))
+
+    total_approx = None
+    if compter:
+        nombre = queryset.order_by()[:LIMITE_TOTAL_APPROX + 1].count()
+        total_approx = (
+            min(nombre, LIMITE_TOTAL_APPROX), nombre > LIMITE_TOTAL_APPROX
+        )
+    return PageCurseur(lignes, curseur_suivant, curseur_precedent, total_approx)
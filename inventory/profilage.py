@@ -0,0 +1,284 @@
+"""
+Profilage à la demande d'une requête (cProfile), sans redéploiement.
+
+MiddlewareProfilage exécute la requête sous cProfile lorsqu'elle le demande :
+paramètre ?profiler=1 ou en-tête « X-Profiler: 1 » pour un utilisateur
+staff connecté, ou en-tête « X-Profiler: <jeton> » avec un jeton signé
+(generer_jeton(), affiché sur la page d'administration des profils) pour
+curl ou un outil de charge. Les réponses en flux (export CSV) sont profilées
+jusqu'à la fin de l'envoi. Une seule requête est profilée à la fois par
+processus (depuis Python 3.12, cProfile refuse un second profileur actif) :
+les demandes concurrentes sont servies sans profilage.
+
+Chaque capture est rangée dans settings.PROFILAGE['DOSSIER'] :
+<id>.prof (pstats, pour snakeviz ou `python -m pstats`), <id>.txt (piles
+échantillonnées toutes les millisecondes, au format replié de
+flamegraph.pl et speedscope) et <id>.json (vue, chemin, durée...). Seules
+les CONSERVER captures les plus récentes sont gardées.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+CONFIGURATION_DEFAUT = {
+    'ACTIF': True,
+    'DOSSIER': None,
+    'CONSERVER': 200,
+    # Validité des jetons signés (secondes)
+    'DUREE_JETON': 3600,
+}
+PARAMETRE = 'profiler'
+ENTETE = 'X-Profiler'
+SEL_JETON = 'inventory.profilage'
+IDENTIFIANT = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+# Intervalle entre deux relevés de pile pour le flamegraph (secondes)
+INTERVALLE_ECHANTILLONS = 0.001
+# Tenu pendant toute une capture, jusqu'à la fin d'une réponse en flux
+_verrou_profil = threading.Lock()
+
+
+def configuration():
+    return {**CONFIGURATION_DEFAUT, **getattr(settings, 'PROFILAGE', {})}
+
+
+def dossier():
+    return configuration()['DOSSIER'] or settings.BASE_DIR / 'logs' / 'profiles'
+
+
+def generer_jeton(utilisateur):
+    """Jeton signé autorisant le profilage sans session (voir DUREE_JETON)"""
+    return signing.dumps({'utilisateur': utilisateur.get_username()}, salt=SEL_JETON)
+
+
+def _jeton_valide(jeton):
+    try:
+        signing.loads(
+            jeton, salt=SEL_JETON, max_age=configuration()['DUREE_JETON']
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def demande(request):
+    """Vrai si la requête demande et peut obtenir un profilage"""
+    entete = request.headers.get(ENTETE, '')
+    if entete not in ('', '1'):
+        return _jeton_valide(entete)
+    if entete != '1' and request.GET.get(PARAMETRE) != '1':
+        return False
+    utilisateur = getattr(request, 'user', None)
+    return bool(utilisateur and utilisateur.is_active and utilisateur.is_staff)
+
+
+class Echantillonneur(threading.Thread):
+    """Relève la pile d'un thread toutes les INTERVALLE secondes.
+
+    Les statistiques de cProfile ne gardent que les arcs appelant -> appelé
+    (la chaîne des middlewares, qui repasse par les mêmes fonctions, n'y
+    est pas reconstituable) : les piles du flamegraph sont donc
+    échantillonnées pendant que la requête s'exécute (actif posé).
+    """
+
+    def __init__(self, cible, intervalle=INTERVALLE_ECHANTILLONS):
+        super().__init__(name='profilage', daemon=True)
+        self.cible = cible
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self.actif = threading.Event()
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.wait(self.intervalle):
+            if not self.actif.is_set():
+                continue
+            cadre = sys._current_frames().get(self.cible)
+            pile = []
+            while cadre is not None:
+                code = cadre.f_code
+                pile.append(
+                    f'{os.path.basename(code.co_filename)}:{code.co_name}:'
+                    f'{code.co_firstlineno}'
+                )
+                cadre = cadre.f_back
+            if pile:
+                self.piles[';'.join(reversed(pile))] += 1
+
+    def terminer(self):
+        self.actif.clear()
+        self.arret.set()
+        self.join()
+
+    def piles_repliees(self):
+        """Lignes « a;b;c échantillons » (flamegraph.pl, speedscope)"""
+        return [f'{pile} {nombre}' for pile, nombre in self.piles.items()]
+
+
+def enregistrer(profil, echantillonneur, request, response, duree):
+    """Écrit la capture (.prof, .txt, .json) et purge les plus anciennes"""
+    repertoire = dossier()
+    os.makedirs(repertoire, exist_ok=True)
+    identifiant = (
+        f'{timezone.localtime():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    )
+    base = os.path.join(repertoire, identifiant)
+    profil.dump_stats(f'{base}.prof')
+    statistiques = pstats.Stats(profil)
+    with open(f'{base}.txt', 'w', encoding='utf-8') as fichier:
+        fichier.write('\n'.join(echantillonneur.piles_repliees()) + '\n')
+    correspondance = request.resolver_match
+    utilisateur = getattr(request, 'user', None)
+    meta = {
+        'id': identifiant,
+        'date': timezone.localtime().isoformat(),
+        'vue': correspondance.view_name if correspondance else None,
+        'methode': request.method,
+        'chemin': request.get_full_path(),
+        'statut': response.status_code,
+        'duree_ms': round(duree * 1000, 1),
+        'appels': statistiques.total_calls,
+        'utilisateur': (
+            utilisateur.get_username()
+            if utilisateur and utilisateur.is_authenticated else None
+        ),
+    }
+    with open(f'{base}.json', 'w', encoding='utf-8') as fichier:
+        json.dump(meta, fichier, ensure_ascii=False)
+    purger(repertoire, configuration()['CONSERVER'])
+    return meta
+
+
+def purger(repertoire, conserver):
+    identifiants = sorted(
+        nom[:-5] for nom in os.listdir(repertoire)
+        if nom.endswith('.json') and IDENTIFIANT.match(nom[:-5])
+    )
+    for identifiant in identifiants[:max(len(identifiants) - conserver, 0)]:
+        for extension in ('json', 'prof', 'txt'):
+            try:
+                os.remove(os.path.join(repertoire, f'{identifiant}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def captures(limite=None):
+    """Métadonnées des captures, de la plus récente à la plus ancienne"""
+    repertoire = dossier()
+    try:
+        noms = sorted(
+            (nom for nom in os.listdir(repertoire)
+             if nom.endswith('.json') and IDENTIFIANT.match(nom[:-5])),
+            reverse=True,
+        )
+    except FileNotFoundError:
+        return []
+    resultat = []
+    for nom in noms[:limite]:
+        try:
+            with open(os.path.join(repertoire, nom), encoding='utf-8') as fichier:
+                resultat.append(json.load(fichier))
+        except (OSError, ValueError):
+            continue
+    return resultat
+
+
+def chemin_capture(identifiant, extension):
+    """Chemin d'un fichier de capture, ou None si l'identifiant est invalide"""
+    if not IDENTIFIANT.match(identifiant) or extension not in ('prof', 'txt'):
+        return None
+    chemin = os.path.join(dossier(), f'{identifiant}.{extension}')
+    return chemin if os.path.exists(chemin) else None
+
+
+class MiddlewareProfilage:
+    """Profile les requêtes qui le demandent (après AuthenticationMiddleware)"""
+
+    def __init__(self, get_response):
+        if not configuration()['ACTIF']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not demande(request) or not _verrou_profil.acquire(blocking=False):
+            return self.get_response(request)
+        liberer = _liberation_unique()
+        profil = cProfile.Profile()
+        echantillonneur = Echantillonneur(threading.get_ident())
+        echantillonneur.start()
+        debut = time.perf_counter()
+        echantillonneur.actif.set()
+        try:
+            response = profil.runcall(self.get_response, request)
+        except BaseException:
+            echantillonneur.terminer()
+            liberer()
+            raise
+        echantillonneur.actif.clear()
+        if response.streaming:
+            response.streaming_content = self._iterer(
+                response.streaming_content, profil, echantillonneur,
+                request, response, debut, liberer
+            )
+            # Flux jamais parcouru : le verrou est rendu à la fermeture
+            response._resource_closers.append(liberer)
+        else:
+            try:
+                echantillonneur.terminer()
+                enregistrer(
+                    profil, echantillonneur, request, response,
+                    time.perf_counter() - debut
+                )
+            finally:
+                liberer()
+        return response
+
+    def _iterer(self, contenu, profil, echantillonneur, request, response, debut,
+                liberer):
+        """Profile la production du contenu en flux, puis enregistre"""
+        iterateur = iter(contenu)
+        try:
+            try:
+                while True:
+                    echantillonneur.actif.set()
+                    profil.enable()
+                    try:
+                        morceau = next(iterateur)
+                    except StopIteration:
+                        break
+                    finally:
+                        profil.disable()
+                        echantillonneur.actif.clear()
+                    yield morceau
+            finally:
+                echantillonneur.terminer()
+            enregistrer(
+                profil, echantillonneur, request, response,
+                time.perf_counter() - debut
+            )
+        finally:
+            liberer()
+
+
+def _liberation_unique():
+    """Fonction qui rend _verrou_profil à son premier appel seulement"""
+    etat = {'libere': False}
+
+    def liberer():
+        if not etat['libere']:
+            etat['libere'] = True
+            _verrou_profil.release()
+
+    return liberer
@@ -0,0 +1,221 @@
+"""
+Journal des requêtes SQL lentes et répétées (N+1).
+
+MiddlewareRequetesLentes installe, pour chaque requête HTTP, un
+execute_wrapper sur toutes les connexions. Une requête SQL plus longue que
+settings.REQUETES_LENTES['SEUIL_MS'] est journalisée avec son SQL, ses
+paramètres, sa durée, la vue d'origine, l'emplacement du code appelant et
+le plan SQLite (EXPLAIN QUERY PLAN). Les requêtes de même forme (SQL aux
+paramètres et listes IN près) exécutées au moins REPETITIONS fois pendant
+une requête HTTP sont regroupées en une seule ligne avec leur nombre :
+c'est la signature d'un N+1 (stock_actuel() par produit, prix par
+mouvement...).
+
+Les enregistrements sont des lignes JSON envoyées au logger
+« inventory.requetes_lentes » (fichier tournant en production, voir
+settings/production.py) ; `manage.py requetes_lentes` en fait la synthèse.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CONFIGURATION_DEFAUT = {
+    'ACTIF': False,
+    'SEUIL_MS': 100,
+    # Exécutions d'une même forme dans une requête HTTP signalées comme N+1
+    'REPETITIONS': 10,
+    # Fichier JSONL lu par `manage.py requetes_lentes` (rotations .1, .2...)
+    'FICHIER': None,
+}
+
+# Taille maximale du SQL et nombre de paramètres conservés par enregistrement
+MAX_SQL = 4000
+MAX_PARAMETRES = 50
+
+_FICHIERS_IGNORES = (
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metriques.py'),
+)
+
+
+def configuration():
+    return {**CONFIGURATION_DEFAUT, **getattr(settings, 'REQUETES_LENTES', {})}
+
+
+def forme(sql):
+    """SQL normalisé : listes de paramètres et nombres remplacés"""
+    sql = re.sub(r'%s(?:\s*,\s*%s)+', '%s, ...', sql)
+    sql = re.sub(r'(?<![\w"])\d+(?:\.\d+)?\b', 'N', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def empreinte(forme_sql):
+    return hashlib.sha1(forme_sql.encode()).hexdigest()[:12]
+
+
+def origine():
+    """Emplacement du code du projet à l'origine de la requête SQL"""
+    racine = str(settings.BASE_DIR)
+    for cadre in reversed(traceback.extract_stack()):
+        fichier = os.path.abspath(cadre.filename)
+        if (fichier.startswith(racine) and 'site-packages' not in fichier
+                and fichier not in _FICHIERS_IGNORES):
+            return f'{os.path.relpath(fichier, racine)}:{cadre.lineno} {cadre.name}'
+    return None
+
+
+def _parametres(params):
+    if params is None:
+        return None
+    params = list(params)
+    valeurs = [
+        p if isinstance(p, (str, int, float, bool, type(None))) else str(p)
+        for p in params[:MAX_PARAMETRES]
+    ]
+    if len(params) > MAX_PARAMETRES:
+        valeurs.append(f'... ({len(params)})')
+    return valeurs
+
+
+def plan(connexion, sql, params):
+    """Sortie d'EXPLAIN QUERY PLAN (SQLite, requêtes de lecture seulement).
+
+    Exécuté sur un curseur brut : ne repasse pas par les execute_wrapper.
+    """
+    if connexion.vendor != 'sqlite' or not re.match(r'\s*(SELECT|WITH)\b', sql, re.I):
+        return None
+    try:
+        curseur = connexion.connection.cursor(factory=SQLiteCursorWrapper)
+        try:
+            curseur.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [ligne[-1] for ligne in curseur.fetchall()]
+        finally:
+            curseur.close()
+    except Exception as exc:
+        return [f'EXPLAIN impossible : {exc}']
+
+
+def journaliser(enregistrement):
+    logger.warning(json.dumps(enregistrement, ensure_ascii=False, default=str))
+
+
+class Suivi:
+    """Requêtes SQL d'une requête HTTP ; sert d'execute_wrapper"""
+
+    def __init__(self, request, alias, config):
+        self.request = request
+        self.alias = alias
+        self.seuil = config['SEUIL_MS'] / 1000
+        self.repetitions = config['REPETITIONS']
+        # forme -> [nombre, durée totale, premier SQL, paramètres, origine]
+        self.formes = {}
+
+    def vue(self):
+        correspondance = self.request.resolver_match
+        return correspondance.view_name if correspondance else None
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.perf_counter() - debut
+            forme_sql = forme(sql)
+            suivi = self.formes.get(forme_sql)
+            if suivi is None:
+                suivi = self.formes[forme_sql] = [
+                    0, 0.0, sql, None if many else params, None
+                ]
+            suivi[0] += 1
+            suivi[1] += duree
+            if suivi[0] == self.repetitions:
+                suivi[4] = origine()
+            if duree >= self.seuil:
+                journaliser({
+                    'type': 'lente',
+                    'date': timezone.now().isoformat(),
+                    'vue': self.vue(),
+                    'alias': self.alias,
+                    'empreinte': empreinte(forme_sql),
+                    'forme': forme_sql[:MAX_SQL],
+                    'sql': sql[:MAX_SQL],
+                    'parametres': None if many else _parametres(params),
+                    'duree_ms': round(duree * 1000, 3),
+                    'nombre': 1,
+                    'origine': origine(),
+                    'plan': None if many else plan(context['connection'], sql, params),
+                })
+
+    def terminer(self):
+        """Journalise les formes répétées au moins REPETITIONS fois"""
+        for forme_sql, (nombre, duree, sql, params, lieu) in self.formes.items():
+            if nombre >= self.repetitions:
+                journaliser({
+                    'type': 'repetition',
+                    'date': timezone.now().isoformat(),
+                    'vue': self.vue(),
+                    'alias': self.alias,
+                    'empreinte': empreinte(forme_sql),
+                    'forme': forme_sql[:MAX_SQL],
+                    'sql': sql[:MAX_SQL],
+                    'parametres': _parametres(params),
+                    'duree_ms': round(duree * 1000, 3),
+                    'nombre': nombre,
+                    'origine': lieu,
+                    'plan': None,
+                })
+
+
+class MiddlewareRequetesLentes:
+    """Suit les requêtes SQL de chaque requête HTTP (inactif par défaut)"""
+
+    def __init__(self, get_response):
+        if not configuration()['ACTIF']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = configuration()
+        suivis = [Suivi(request, alias, config) for alias in connections]
+        with _suivre(suivis):
+            response = self.get_response(request)
+        if response.streaming:
+            # Le contenu en flux (export CSV) est lu après le retour de la vue
+            response.streaming_content = _iterer_suivi(
+                response.streaming_content, suivis
+            )
+        else:
+            for suivi in suivis:
+                suivi.terminer()
+        return response
+
+
+def _suivre(suivis):
+    """Installe les suivis sur leurs connexions le temps d'un bloc with"""
+    pile = ExitStack()
+    for suivi in suivis:
+        pile.enter_context(connections[suivi.alias].execute_wrapper(suivi))
+    return pile
+
+
+def _iterer_suivi(contenu, suivis):
+    try:
+        with _suivre(suivis):
+            yield from contenu
+    finally:
+        for suivi in suivis:
+            suivi.terminer()
@@ -0,0 +1,83 @@
+"""
+Routage des lectures vers une connexion SQLite en lecture seule.
+
+Les vues de consultation (décorées par lecture_seule) lisent via l'alias
+ALIAS_LECTURE : même fichier, mais connexion ouverte avec PRAGMA
+query_only. En WAL, un export ou un tableau de bord long ne retient alors
+aucun verrou susceptible de retarder la saisie des mouvements. Les
+écritures et les blocs transaction.atomic restent sur `default`. Sans
+alias de lecture configuré (développement, tests), tout passe par
+`default` ; le même routeur permettrait de pointer les lectures vers une
+réplique.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ALIAS_LECTURE = 'lecture'
+
+_lecture_seule = contextvars.ContextVar('lecture_seule', default=False)
+
+
+@contextmanager
+def en_lecture_seule():
+    """Route les lectures du bloc vers l'alias de lecture"""
+    jeton = _lecture_seule.set(True)
+    try:
+        yield
+    finally:
+        _lecture_seule.reset(jeton)
+
+
+def _iterer_en_lecture(contenu):
+    with en_lecture_seule():
+        yield from contenu
+
+
+def lecture_seule(vue):
+    """Décorateur des vues de consultation (GET et HEAD uniquement).
+
+    Le contenu des réponses en streaming (export CSV) est lu après le retour
+    de la vue : son itération est donc elle aussi placée en lecture seule.
+    """
+    @wraps(vue)
+    def enveloppe(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return vue(request, *args, **kwargs)
+        with en_lecture_seule():
+            response = vue(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _iterer_en_lecture(
+                response.streaming_content
+            )
+        return response
+    return enveloppe
+
+
+class RouteurLectureEcriture:
+    """Lectures des vues de consultation sur ALIAS_LECTURE, le reste sur default"""
+
+    def db_for_read(self, model, **hints):
+        if (
+            _lecture_seule.get()
+            and ALIAS_LECTURE in settings.DATABASES
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return ALIAS_LECTURE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les deux alias désignent la même base
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ALIAS_LECTURE:
+            return False
+        return None
@@ -0,0 +1,96 @@
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache_stock import invalider_produits
+from .tableau_bord import programmer_rechauffage
+from .models import (
+    CoutAchat, Mouvement, MouvementDaily, MouvementDailyTotal, PrixVente, Produit,
+    StockBalance, StockSnapshot,
+)
+
+
+@receiver(connection_created)
+def appliquer_pragmas_sqlite(sender, connection, **kwargs):
+    """Applique settings.SQLITE_PRAGMAS à chaque nouvelle connexion SQLite.
+
+    Le profil de production y active WAL, synchronous=NORMAL, busy_timeout,
+    mmap, cache de pages et tables temporaires en mémoire. La clé PRAGMAS
+    d'un alias de DATABASES complète la liste pour cet alias (query_only
+    pour l'alias de lecture, voir inventory.routers).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = {
+        **getattr(settings, 'SQLITE_PRAGMAS', {}),
+        **connection.settings_dict.get('PRAGMAS', {}),
+    }
+    for nom, valeur in pragmas.items():
+        if not re.fullmatch(r'\w+', nom) or not re.fullmatch(r'[\w-]+', str(valeur)):
+            raise ValueError(f"PRAGMA invalide : {nom}={valeur}")
+        connection.connection.execute(f'PRAGMA {nom} = {valeur}')
+
+
+def _suppression_de_produit(origin):
+    """Vrai si la suppression est une cascade depuis un Produit"""
+    return isinstance(origin, Produit) or getattr(origin, 'model', None) is Produit
+
+
+@receiver(pre_delete, sender=Produit)
+def retirer_produit_des_totaux(sender, instance, **kwargs):
+    """Retire l'historique d'un produit supprimé des cumuls tous produits"""
+    # Ses cumuls par produit partent en cascade, sans signal de mouvement
+    MouvementDailyTotal.retrancher([instance.pk])
+
+
+@receiver(post_delete, sender=Mouvement)
+def retirer_mouvement_du_solde(sender, instance, origin=None, **kwargs):
+    """Retire un mouvement supprimé du solde et du cumul journalier"""
+    # Suppression en cascade d'un produit : son solde disparaît avec lui
+    if _suppression_de_produit(origin):
+        return
+    StockBalance.appliquer(
+        instance.produit_id, instance.type_mouvement, -instance.quantite
+    )
+    MouvementDaily.appliquer(instance, signe=-1)
+    StockSnapshot.invalider_depuis(timezone.localdate(instance.date_mouvement))
+
+
+@receiver(post_delete, sender=PrixVente)
+def rafraichir_prix_apres_suppression(sender, instance, origin=None, **kwargs):
+    """Recalcule le prix actif du produit après suppression d'un prix"""
+    if _suppression_de_produit(origin):
+        return
+    instance.produit.rafraichir_prix_vente_negocie()
+
+
+@receiver(post_delete, sender=CoutAchat)
+def rafraichir_cout_apres_suppression(sender, instance, origin=None, **kwargs):
+    """Recalcule le coût actif du produit après suppression d'un coût"""
+    if _suppression_de_produit(origin):
+        return
+    instance.produit.rafraichir_cout_achat_negocie()
+
+
+@receiver(post_save, sender=Produit)
+@receiver(post_delete, sender=Produit)
+def invalider_cache_produit(sender, instance, **kwargs):
+    """Nouvelle version du produit dans le cache partagé"""
+    invalider_produits([instance.pk])
+    programmer_rechauffage()
+
+
+@receiver(post_save, sender=Mouvement)
+@receiver(post_delete, sender=Mouvement)
+@receiver(post_save, sender=PrixVente)
+@receiver(post_delete, sender=PrixVente)
+@receiver(post_save, sender=CoutAchat)
+@receiver(post_delete, sender=CoutAchat)
+def invalider_cache_du_produit_lie(sender, instance, **kwargs):
+    """Nouvelle version du produit d'un mouvement, prix ou coût modifié"""
+    invalider_produits([instance.produit_id])
+    programmer_rechauffage()
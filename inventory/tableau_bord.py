@@ -0,0 +1,110 @@
+"""
+Tableau de bord découpé en fragments mis en cache.
+
+Indicateurs, alertes, tableau des produits et derniers mouvements sont
+mis en cache séparément sous la version d'inventaire courante
+(cache_stock.version_inventaire), renouvelée par toute écriture. Les
+valeurs du contexte sont paresseuses : un fragment servi par le cache ne
+coûte aucune requête. Après chaque écriture validée, les fragments sont
+recalculés en arrière-plan pour que les lecteurs ne les trouvent presque
+jamais froids.
+"""
+
+import logging
+import threading
+import time
+
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
+
+from .cache_stock import version_inventaire
+from .pagination import ORDRE_PRODUITS, paginer_par_cle
+from .routers import en_lecture_seule
+
+logger = logging.getLogger(__name__)
+
+# Les clés changent avec la version : la durée ne sert qu'au ménage
+DUREE_FRAGMENTS = 24 * 3600
+TAILLE_PAGE_PRODUITS = 20
+# Attente avant le rendu : regroupe une rafale d'écritures en un seul rendu
+DELAI_RECHAUFFAGE = 1.0
+
+
+def contexte_tableau_bord():
+    """Contexte du tableau de bord, évalué seulement si un fragment est froid"""
+    from .models import Mouvement, Produit
+
+    produits = Produit.objects.with_stock()
+    return {
+        'version_inventaire': version_inventaire(),
+        'duree_fragments': DUREE_FRAGMENTS,
+        'produits': SimpleLazyObject(
+            lambda: paginer_par_cle(
+                produits, ORDRE_PRODUITS, taille=TAILLE_PAGE_PRODUITS
+            )
+        ),
+        'mouvements_recents': SimpleLazyObject(
+            lambda: list(Mouvement.objects.select_related('produit')[:10])
+        ),
+        'total_produits': SimpleLazyObject(Produit.objects.count),
+        'total_mouvements': SimpleLazyObject(Mouvement.objects.count),
+        # Alertes de stock (seuls les produits concernés sont chargés)
+        'produits_en_rupture': SimpleLazyObject(
+            lambda: list(produits.filter(statut='rupture'))
+        ),
+        'produits_en_alerte': SimpleLazyObject(
+            lambda: list(produits.filter(statut='alerte'))
+        ),
+        'valeur_totale_stock': SimpleLazyObject(
+            lambda: produits.aggregate(total=Sum('valeur'))['total'] or 0
+        ),
+    }
+
+
+def rechauffer_tableau_bord():
+    """Rend le tableau de bord pour remplir les fragments de la version courante"""
+    with en_lecture_seule():
+        render_to_string('inventory/tableau_bord.html', contexte_tableau_bord())
+
+
+_verrou = threading.Lock()
+_etat = {'en_cours': False, 'a_refaire': False}
+
+
+def _boucle_rechauffage():
+    try:
+        while True:
+            time.sleep(DELAI_RECHAUFFAGE)
+            with _verrou:
+                _etat['a_refaire'] = False
+            try:
+                rechauffer_tableau_bord()
+            except Exception:
+                logger.exception("Échec du préchauffage du tableau de bord")
+            with _verrou:
+                if not _etat['a_refaire']:
+                    _etat['en_cours'] = False
+                    return
+    finally:
+        connections.close_all()
+
+
+def _demander_rechauffage():
+    """Lance un préchauffage, ou en redemande un si un autre est en cours.
+
+    Sous un flux continu d'écritures, le tableau de bord est ainsi rendu au
+    plus une fois par DELAI_RECHAUFFAGE (plus la durée du rendu).
+    """
+    with _verrou:
+        if _etat['en_cours']:
+            _etat['a_refaire'] = True
+            return
+        _etat['en_cours'] = True
+    threading.Thread(target=_boucle_rechauffage, daemon=True).start()
+
+
+def programmer_rechauffage():
+    """Préchauffe les fragments une fois la transaction courante validée"""
+    transaction.on_commit(_demander_rechauffage)
@@ -5,6 +5,8 @@ urlpatterns = [
     path('', views.tableau_bord, name='tableau_bord'),
     path('produits/', views.liste_produits, name='liste_produits'),
     path('produits/<int:pk>/', views.detail_produit, name='detail_produit'),
+    path('produits/catalogue-prix/', views.catalogue_prix,
+         name='catalogue_prix'),
     path('produits/ajouter/', views.ajouter_produit, name='ajouter_produit'),
     path('produits/<int:pk>/modifier/', views.modifier_produit, 
          name='modifier_produit'),
@@ -25,6 +27,16 @@ urlpatterns = [
     path('mouvements/', views.liste_mouvements, name='liste_mouvements'),
     path('mouvements/ajouter/', views.ajouter_mouvement, 
          name='ajouter_mouvement'),
+    path('mouvements/document/', views.document_mouvements,
+         name='document_mouvements'),
+    path('mouvements/importer/', views.importer_mouvements,
+         name='importer_mouvements'),
     path('mouvements/export/', views.export_mouvements_csv, 
          name='export_mouvements_csv'),
+    path('mouvements/series/', views.series_mouvements,
+         name='series_mouvements'),
+    path('recherche/<str:source>/', views.recherche_options,
+         name='recherche_options'),
+    path('stock-a-date/', views.stock_a_date, name='stock_a_date'),
+    path('metrics', views.metriques, name='metriques'),
 ]
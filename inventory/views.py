@@ -1,55 +1,63 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Sum, Q
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Produit, Mouvement, PrixVente, CoutAchat
+from datetime import timedelta
+from .models import (
+    Produit, Mouvement, PrixVente, CoutAchat, MouvementDaily, MouvementDailyTotal,
+    StockInsuffisant
+)
 from .forms import (
     ProduitForm, MouvementForm, FiltreMovementForm, 
-    PrixVenteForm, CoutAchatForm
+    PrixVenteForm, CoutAchatForm, StockADateForm, ImportMouvementsForm,
+    DocumentFormSet, DocumentMouvementsForm
 )
+from .historique import stocks_at
+from .ecriture_groupee import enregistrer_mouvement
+from .importation import format_depuis_nom, importer, lire_lignes
+from .routers import lecture_seule
+from .pagination import ORDRE_MOUVEMENTS, ORDRE_PRODUITS, paginer_par_cle
+from .tableau_bord import contexte_tableau_bord
+from . import metriques as mesures
+from . import profilage
 import csv
-from django.http import HttpResponse, JsonResponse
+import io
+from django.contrib import admin
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
 
+# Nombre de lignes par page des listes paginées par curseur
+TAILLE_PAGE_PRODUITS = 50
+TAILLE_PAGE_MOUVEMENTS = 50
 
+
+@lecture_seule
 def tableau_bord(request):
-    """Vue du tableau de bord principal"""
-    produits = Produit.objects.all()
-    mouvements_recents = Mouvement.objects.select_related('produit')[:10]
-    
-    # Statistiques
-    total_produits = produits.count()
-    total_mouvements = Mouvement.objects.count()
-    
-    # Alertes de stock
-    produits_en_rupture = [p for p in produits if p.est_en_rupture()]
-    produits_en_alerte = [p for p in produits if p.est_en_alerte() and not p.est_en_rupture()]
-    
-    # Valeur totale du stock
-    valeur_totale_stock = sum(p.valeur_stock() for p in produits)
-    
-    context = {
-        'produits': produits,
-        'mouvements_recents': mouvements_recents,
-        'total_produits': total_produits,
-        'total_mouvements': total_mouvements,
-        'produits_en_rupture': produits_en_rupture,
-        'produits_en_alerte': produits_en_alerte,
-        'valeur_totale_stock': valeur_totale_stock,
-    }
-    return render(request, 'inventory/tableau_bord.html', context)
+    """Vue du tableau de bord principal (fragments mis en cache)"""
+    return render(request, 'inventory/tableau_bord.html', contexte_tableau_bord())
 
 
+@lecture_seule
 def liste_produits(request):
-    """Liste de tous les produits"""
-    produits = Produit.objects.all()
+    """Liste des produits, paginée par curseur sur (description, id)"""
+    produits = paginer_par_cle(
+        Produit.objects.with_stock(), ORDRE_PRODUITS,
+        curseur=request.GET.get('curseur'), taille=TAILLE_PAGE_PRODUITS,
+    )
     return render(request, 'inventory/liste_produits.html', 
                   {'produits': produits})
 
 
+@lecture_seule
 def detail_produit(request, pk):
     """Détail d'un produit avec ses mouvements et prix de vente"""
-    produit = get_object_or_404(Produit, pk=pk)
+    produit = get_object_or_404(Produit.objects.with_stock(), pk=pk)
     mouvements = produit.mouvement_set.all()
     prix_historique = produit.prix_vente_historique.all()
     cout_historique = produit.cout_achat_historique.all()
@@ -104,40 +112,20 @@ def supprimer_produit(request, pk):
                   {'produit': produit})
 
 
+@lecture_seule
 def liste_mouvements(request):
-    """Liste de tous les mouvements avec filtres"""
-    mouvements = Mouvement.objects.select_related('produit').all()
+    """Liste des mouvements filtrés, paginée par curseur sur (date, id)"""
     form = FiltreMovementForm(request.GET)
-    
-    if form.is_valid():
-        # Filtrage par date de début
-        if form.cleaned_data['date_debut']:
-            mouvements = mouvements.filter(
-                date_mouvement__date__gte=form.cleaned_data['date_debut']
-            )
-        
-        # Filtrage par date de fin
-        if form.cleaned_data['date_fin']:
-            mouvements = mouvements.filter(
-                date_mouvement__date__lte=form.cleaned_data['date_fin']
-            )
-        
-        # Filtrage par type de mouvement
-        if form.cleaned_data['type_mouvement']:
-            mouvements = mouvements.filter(
-                type_mouvement=form.cleaned_data['type_mouvement']
-            )
-        
-        # Filtrage par produit
-        if form.cleaned_data['produit']:
-            mouvements = mouvements.filter(
-                produit=form.cleaned_data['produit']
-            )
+    mouvements = paginer_par_cle(
+        form.filtrer(Mouvement.objects.select_related('produit')),
+        ORDRE_MOUVEMENTS, curseur=request.GET.get('curseur'),
+        taille=TAILLE_PAGE_MOUVEMENTS, compter=True,
+    )
     
     context = {
         'mouvements': mouvements,
         'form': form,
-        'total_mouvements': mouvements.count(),
+        'total_mouvements': mouvements.total_affiche,
     }
     return render(request, 'inventory/liste_mouvements.html', context)
 
@@ -147,56 +135,157 @@ def ajouter_mouvement(request):
     if request.method == 'POST':
         form = MouvementForm(request.POST)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Рух товару успішно зареєстровано!')
-            return redirect('liste_mouvements')
+            try:
+                enregistrer_mouvement(form.save(commit=False))
+            except StockInsuffisant:
+                # Refus atomique du solde (pas de contrôle préalable qui
+                # pourrait être devancé par un autre worker)
+                form.add_error('quantite', (
+                    'Недостатньо товару на складі. Доступно: '
+                    f'{form.cleaned_data["produit"].stock_actuel()}.'
+                ))
+            else:
+                messages.success(request, 'Рух товару успішно зареєстровано!')
+                return redirect('liste_mouvements')
     else:
         form = MouvementForm()
     return render(request, 'inventory/form_mouvement.html', 
                   {'form': form, 'title': 'Додати рух товару'})
 
-def export_mouvements_csv(request):
-    """Exporter les mouvements en CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="mouvements.csv"'
-    response.write('\ufeff')  # BOM pour Excel
+def document_mouvements(request):
+    """Saisir un document de plusieurs lignes, enregistré en une transaction.
 
-    writer = csv.writer(response)
-    writer.writerow([
-        'Дата', 'Товар', 'Тип операції', 'Кількість', 'Коментар'
-    ])
+    Produits de toutes les lignes chargés en une requête (BaseDocumentFormSet),
+    puis Mouvement.enregistrer_lot : un seul ajustement de solde par produit,
+    et une sortie dépassant le stock annule le document entier.
+    """
+    if request.method == 'POST':
+        form = DocumentMouvementsForm(request.POST)
+        formset = DocumentFormSet(request.POST)
+        if form.is_valid() and formset.is_valid():
+            mouvements = formset.mouvements(form.cleaned_data['commentaire'])
+            try:
+                Mouvement.enregistrer_lot(mouvements)
+            except StockInsuffisant as exc:
+                produit = formset.produits[exc.produit_id]
+                formset.non_form_errors().append(
+                    f'Недостатньо товару «{produit.description}» на складі. '
+                    f'Доступно: {produit.stock_actuel()}. Документ не збережено.'
+                )
+            else:
+                messages.success(
+                    request,
+                    f'Документ зареєстровано: рухів {len(mouvements)}.'
+                )
+                return redirect('liste_mouvements')
+    else:
+        form = DocumentMouvementsForm()
+        formset = DocumentFormSet()
+    return render(request, 'inventory/document_mouvements.html', {
+        'form': form,
+        'formset': formset,
+    })
 
-    mouvements = Mouvement.objects.select_related('produit').all()
-    
-    # Appliquer les mêmes filtres que la liste
-    form = FiltreMovementForm(request.GET)
-    if form.is_valid():
-        if form.cleaned_data['date_debut']:
-            mouvements = mouvements.filter(
-                date_mouvement__date__gte=form.cleaned_data['date_debut']
-            )
-        if form.cleaned_data['date_fin']:
-            mouvements = mouvements.filter(
-                date_mouvement__date__lte=form.cleaned_data['date_fin']
-            )
-        if form.cleaned_data['type_mouvement']:
-            mouvements = mouvements.filter(
-                type_mouvement=form.cleaned_data['type_mouvement']
-            )
-        if form.cleaned_data['produit']:
-            mouvements = mouvements.filter(
-                produit=form.cleaned_data['produit']
+
+# Erreurs de lignes affichées après un import (le total reste indiqué)
+MAX_ERREURS_AFFICHEES = 200
+
+
+def importer_mouvements(request):
+    """Importer en une fois les mouvements d'un fichier CSV ou JSON lines"""
+    rapport = None
+    if request.method == 'POST':
+        form = ImportMouvementsForm(request.POST, request.FILES)
+        if form.is_valid():
+            fichier = form.cleaned_data['fichier']
+            format_fichier = (
+                form.cleaned_data['format'] or format_depuis_nom(fichier.name)
             )
+            flux = io.TextIOWrapper(fichier.file, encoding='utf-8-sig', newline='')
+            try:
+                rapport = importer(
+                    lire_lignes(flux, format_fichier),
+                    partiel=form.cleaned_data['partiel'],
+                )
+            except UnicodeDecodeError:
+                form.add_error('fichier', 'Файл має бути в кодуванні UTF-8.')
+            except csv.Error as exc:
+                form.add_error('fichier', f'Некоректний файл CSV: {exc}.')
+            else:
+                if rapport.importees:
+                    messages.success(
+                        request,
+                        f'Імпортовано рухів: {rapport.importees} з {rapport.lignes}.'
+                    )
+                if not rapport.erreurs:
+                    return redirect('liste_mouvements')
+    else:
+        form = ImportMouvementsForm()
+    return render(request, 'inventory/import_mouvements.html', {
+        'form': form,
+        'rapport': rapport,
+        'erreurs': rapport.erreurs[:MAX_ERREURS_AFFICHEES] if rapport else [],
+    })
+
+
+# Nombre de lignes lues par aller-retour SQLite pendant l'export CSV
+TAILLE_LOT_EXPORT = 2000
+
+
+class _TamponCSV:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de la stocker"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _lignes_csv(mouvements, avec_valeurs):
+    """Génère l'export CSV ligne par ligne, en mémoire constante"""
+    writer = csv.writer(_TamponCSV())
+    entetes = ['Дата', 'Товар', 'Тип операції', 'Кількість', 'Коментар']
+    if avec_valeurs:
+        entetes += ['Ціна за одиницю', 'Собівартість за одиницю', 'Вартість']
+    yield '\ufeff' + writer.writerow(entetes)  # BOM pour Excel
+
+    types = dict(Mouvement.TYPE_CHOICES)
+    lignes = mouvements.values_list(
+        'date_mouvement', 'produit__description', 'type_mouvement',
+        'quantite', 'commentaire', 'prix_unitaire', 'cout_unitaire'
+    ).iterator(chunk_size=TAILLE_LOT_EXPORT)
+    for date, description, type_mouvement, quantite, commentaire, prix, cout in lignes:
+        ligne = [
+            date.strftime('%d.%m.%Y %H:%M'),
+            description,
+            types[type_mouvement],
+            quantite,
+            commentaire or ''
+        ]
+        if avec_valeurs:
+            unitaire = prix if type_mouvement == 'sortie' else cout
+            ligne += [
+                '' if prix is None else prix,
+                '' if cout is None else cout,
+                '' if unitaire is None else quantite * unitaire,
+            ]
+        yield writer.writerow(ligne)
+
+
+@lecture_seule
+def export_mouvements_csv(request):
+    """Exporter les mouvements en CSV (réponse en streaming).
 
-    for mouvement in mouvements:
-        writer.writerow([
-            mouvement.date_mouvement.strftime('%d.%m.%Y %H:%M'),
-            mouvement.produit.description,
-            mouvement.get_type_mouvement_display(),
-            mouvement.quantite,
-            mouvement.commentaire or ''
-        ])
+    Le paramètre valeurs=1 ajoute prix unitaire, coût unitaire et valeur
+    de la ligne.
+    """
+    # Appliquer les mêmes filtres que la liste
+    form = FiltreMovementForm(request.GET)
+    mouvements = form.filtrer(Mouvement.objects.all())
+    avec_valeurs = request.GET.get('valeurs') == '1'
 
+    response = StreamingHttpResponse(
+        _lignes_csv(mouvements, avec_valeurs), content_type='text/csv'
+    )
+    response['Content-Disposition'] = 'attachment; filename="mouvements.csv"'
     return response
 
 
@@ -248,6 +337,7 @@ def toggle_prix_actif(request, pk, prix_pk):
     
     return redirect('detail_produit', pk=pk)
 
+@lecture_seule
 def get_prix_produit(request, pk):
     """Retourner les prix disponibles pour un produit (AJAX)"""
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -326,6 +416,7 @@ def toggle_cout_actif(request, pk, cout_pk):
     return redirect('detail_produit', pk=pk)
 
 
+@lecture_seule
 def get_cout_produit(request, pk):
     """Retourner les coûts disponibles pour un produit (AJAX)"""
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -353,3 +444,271 @@ def get_cout_produit(request, pk):
         return JsonResponse({'couts': cout_list})
     
     return JsonResponse({'error': 'Requête invalide'}, status=400)
+
+
+def _produits_demandes(request):
+    """Identifiants passés dans ?produits=1,2,3 (None pour tout le catalogue)"""
+    brut = request.GET.get('produits', '')
+    if not brut:
+        return None
+    return [int(pk) for pk in brut.split(',') if pk.strip().isdigit()]
+
+
+@lecture_seule
+def catalogue_prix(request):
+    """Prix et coûts (de base et négociés actifs) en un seul document JSON.
+
+    Sans paramètre, tout le catalogue est renvoyé ; ?produits=1,2 restreint
+    aux produits listés. La réponse porte un ETag et un Last-Modified tirés
+    de la dernière modification des produits, que rafraichir_* met à jour à
+    chaque changement de prix ou de coût : le navigateur revalide et reçoit
+    un 304 tant que rien n'a changé.
+    """
+    produits = Produit.objects.order_by()
+    ids = _produits_demandes(request)
+    if ids is not None:
+        produits = produits.filter(pk__in=ids)
+
+    etat = produits.aggregate(nombre=Count('pk'), maj=Max('date_modification'))
+    maj = etat['maj']
+    etag = quote_etag(
+        f"catalogue-{etat['nombre']}-{maj.timestamp() if maj else 0:.6f}"
+    )
+    derniere_modif = maj.timestamp() if maj else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=derniere_modif
+    )
+    if response is None:
+        catalogue = {
+            str(pk): {
+                'prix_vente': str(prix_vente),
+                'cout_achat': str(cout_achat),
+                'prix': [],
+                'couts': [],
+            }
+            for pk, prix_vente, cout_achat in produits.values_list(
+                'pk', 'prix_vente', 'cout_achat'
+            )
+        }
+        # Entrées compactes [id, montant, client ou fournisseur]
+        prix = PrixVente.objects.filter(actif=True)
+        couts = CoutAchat.objects.filter(actif=True)
+        if ids is not None:
+            prix = prix.filter(produit_id__in=ids)
+            couts = couts.filter(produit_id__in=ids)
+        for produit_id, pk, montant, client in prix.values_list(
+            'produit_id', 'pk', 'prix', 'client'
+        ):
+            catalogue[str(produit_id)]['prix'].append([pk, str(montant), client])
+        for produit_id, pk, montant, fournisseur in couts.values_list(
+            'produit_id', 'pk', 'cout', 'fournisseur'
+        ):
+            catalogue[str(produit_id)]['couts'].append(
+                [pk, str(montant), fournisseur]
+            )
+        response = JsonResponse({'produits': catalogue})
+    response['ETag'] = etag
+    if derniere_modif is not None:
+        response['Last-Modified'] = http_date(derniere_modif)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# Sources du point d'accès de recherche : modèle, champ cherché, ordre unique
+SOURCES_RECHERCHE = {
+    'produits': (Produit, 'description', ORDRE_PRODUITS),
+    'prix': (PrixVente, 'client', ('-date_creation', '-id')),
+    'couts': (CoutAchat, 'fournisseur', ('-date_creation', '-id')),
+}
+TAILLE_PAGE_RECHERCHE = 20
+
+
+@lecture_seule
+def recherche_options(request, source):
+    """Options des listes déroulantes chargées à la demande (JSON paginé).
+
+    ?q= filtre sur la description (produits), le client (prix) ou le
+    fournisseur (coûts) ; ?produit= restreint prix et coûts à un produit ;
+    ?curseur= donne la page suivante.
+    """
+    if source not in SOURCES_RECHERCHE:
+        return JsonResponse({'error': 'Джерело не знайдено'}, status=404)
+    modele, champ, ordre = SOURCES_RECHERCHE[source]
+    objets = modele.objects.all()
+    if modele is not Produit:
+        objets = objets.select_related('produit')
+        produit = request.GET.get('produit', '')
+        if produit.isdigit():
+            objets = objets.filter(produit_id=produit)
+    terme = request.GET.get('q', '').strip()
+    if terme:
+        objets = objets.filter(**{f'{champ}__icontains': terme})
+    page = paginer_par_cle(
+        objets, ordre, curseur=request.GET.get('curseur'),
+        taille=TAILLE_PAGE_RECHERCHE,
+    )
+    return JsonResponse({
+        'resultats': [{'id': objet.pk, 'texte': str(objet)} for objet in page],
+        'suivant': page.curseur_suivant,
+    })
+
+
+@lecture_seule
+def stock_a_date(request):
+    """Stock et valorisation à une date, depuis la photographie la plus proche"""
+    form = StockADateForm(request.GET or {'date': timezone.localdate()})
+    lignes = []
+    valeur_totale = 0
+    if form.is_valid():
+        produit = form.cleaned_data['produit']
+        stocks = stocks_at(
+            form.cleaned_data['date'], [produit.pk] if produit else None
+        )
+        for p in Produit.objects.filter(pk__in=stocks).only('description'):
+            lignes.append({'produit': p, **stocks[p.pk]})
+        valeur_totale = sum(ligne['valeur'] for ligne in lignes)
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        return JsonResponse({
+            'date': form.cleaned_data['date'].isoformat(),
+            'valeur_totale': float(valeur_totale),
+            'stocks': [{
+                'produit': ligne['produit'].pk,
+                'description': ligne['produit'].description,
+                'quantite': ligne['quantite'],
+                'cout_unitaire': float(ligne['cout_unitaire']),
+                'valeur': float(ligne['valeur']),
+            } for ligne in lignes],
+        })
+
+    return render(request, 'inventory/stock_a_date.html', {
+        'form': form,
+        'lignes': lignes,
+        'valeur_totale': valeur_totale,
+    })
+
+
+@lecture_seule
+def series_mouvements(request):
+    """Séries des mouvements par période (JSON pour graphiques).
+
+    Lit uniquement les cumuls journaliers : ceux du produit (MouvementDaily)
+    ou, sans produit, ceux de tout le catalogue (MouvementDailyTotal).
+    Paramètres : granularite=mois|jour, nombre de périodes, produit
+    (optionnel).
+    """
+    granularite = request.GET.get('granularite', 'mois')
+    if granularite not in ('mois', 'jour'):
+        return JsonResponse({'error': 'Granularité invalide'}, status=400)
+    try:
+        nombre = int(request.GET.get('nombre', 12 if granularite == 'mois' else 30))
+        produit_id = int(request.GET['produit']) if request.GET.get('produit') else None
+    except ValueError:
+        return JsonResponse({'error': 'Paramètre invalide'}, status=400)
+    nombre = max(1, min(nombre, 366))
+
+    aujourd_hui = timezone.localdate()
+    if granularite == 'mois':
+        periodes = []
+        annee, mois = aujourd_hui.year, aujourd_hui.month
+        for _ in range(nombre):
+            periodes.append(aujourd_hui.replace(year=annee, month=mois, day=1))
+            annee, mois = (annee, mois - 1) if mois > 1 else (annee - 1, 12)
+        periodes.reverse()
+        labels = [p.strftime('%Y-%m') for p in periodes]
+    else:
+        periodes = [
+            aujourd_hui - timedelta(days=n) for n in range(nombre - 1, -1, -1)
+        ]
+        labels = [p.isoformat() for p in periodes]
+
+    if produit_id is not None:
+        cumuls = MouvementDaily.objects.filter(produit_id=produit_id)
+    else:
+        cumuls = MouvementDailyTotal.objects.all()
+    cumuls = cumuls.filter(jour__gte=periodes[0])
+    if granularite == 'mois':
+        cumuls = cumuls.annotate(periode=TruncMonth('jour'))
+    else:
+        cumuls = cumuls.annotate(periode=F('jour'))
+
+    index = {periode: i for i, periode in enumerate(periodes)}
+    series = {
+        type_mouvement: {
+            'quantite': [0] * len(periodes),
+            'valeur': [0.0] * len(periodes),
+        }
+        for type_mouvement, _ in Mouvement.TYPE_CHOICES
+    }
+    for ligne in cumuls.order_by().values('periode', 'type_mouvement').annotate(
+        total_quantite=Sum('quantite'), total_valeur=Sum('valeur')
+    ):
+        i = index.get(ligne['periode'])
+        if i is None:
+            continue
+        serie = series[ligne['type_mouvement']]
+        serie['quantite'][i] = ligne['total_quantite']
+        serie['valeur'][i] = float(ligne['total_valeur'])
+
+    return JsonResponse({
+        'granularite': granularite,
+        'produit': produit_id,
+        'labels': labels,
+        **series,
+    })
+
+
+def metriques(request):
+    """Histogrammes de performance par vue, au format texte Prometheus.
+
+    Réservé au personnel connecté ou, si METRIQUES['JETON'] est renseigné,
+    aux requêtes portant « Authorization: Bearer <jeton> ».
+    """
+    jeton = mesures.configuration()['JETON']
+    autorise = request.user.is_active and request.user.is_staff
+    if not autorise and jeton:
+        autorise = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {jeton}'
+        )
+    if not autorise:
+        return HttpResponse(status=401 if jeton else 403)
+    return HttpResponse(
+        mesures.exposer(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+# Captures affichées sur la page d'administration des profils
+MAX_PROFILS_AFFICHES = 100
+
+
+def liste_profils(request):
+    """Page d'administration : captures cProfile récentes (staff uniquement)"""
+    liste = profilage.captures(MAX_PROFILS_AFFICHES)
+    vue = request.GET.get('vue')
+    if vue:
+        liste = [capture for capture in liste if capture.get('vue') == vue]
+    if request.GET.get('tri') == 'duree':
+        liste.sort(key=lambda capture: capture.get('duree_ms') or 0, reverse=True)
+    return render(request, 'admin/inventory/profils.html', {
+        **admin.site.each_context(request),
+        'title': 'Профілі запитів',
+        'captures': liste,
+        'vue': vue,
+        'jeton': profilage.generer_jeton(request.user),
+        'entete': profilage.ENTETE,
+        'parametre': profilage.PARAMETRE,
+    })
+
+
+def telecharger_profil(request, identifiant, extension):
+    """Télécharger le fichier .prof ou .txt d'une capture (staff uniquement)"""
+    chemin = profilage.chemin_capture(identifiant, extension)
+    if chemin is None:
+        raise Http404('Профіль не знайдено')
+    return FileResponse(
+        open(chemin, 'rb'), as_attachment=True,
+        filename=f'{identifiant}.{extension}'
+    )
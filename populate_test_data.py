@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 """
-Script pour populer l'application avec des données de test
+Script pour populer l'application avec des données de test.
+
+Quelques produits pour essayer l'interface ; pour un jeu de données
+volumineux (benchmarks), utiliser `manage.py generate_benchmark_data`.
 """
 import os
 import django
@@ -17,7 +20,6 @@ def create_test_data():
     
     # Créer des produits
     produit1 = Produit.objects.create(
-        nom="Ordinateur portable Dell",
         description="Ordinateur portable Dell Inspiron 15 pouces",
         cout_achat=Decimal('800.00'),
         prix_vente=Decimal('1200.00'),
@@ -25,7 +27,6 @@ def create_test_data():
     )
     
     produit2 = Produit.objects.create(
-        nom="Souris sans fil Logitech",
         description="Souris sans fil Logitech MX Master 3",
         cout_achat=Decimal('45.00'),
         prix_vente=Decimal('75.00'),
@@ -91,8 +92,8 @@ def create_test_data():
     )
     
     print("✅ Données de test créées avec succès !")
-    print(f"📦 Produit 1: {produit1.nom} - Stock: {produit1.stock_actuel()} unités")
-    print(f"📦 Produit 2: {produit2.nom} - Stock: {produit2.stock_actuel()} unités")
+    print(f"📦 Produit 1: {produit1.description} - Stock: {produit1.stock_actuel()} unités")
+    print(f"📦 Produit 2: {produit2.description} - Stock: {produit2.stock_actuel()} unités")
     print(f"💶 Prix négociés créés: {PrixVente.objects.count()} prix")
     print(f"📊 Mouvements créés: {Mouvement.objects.count()} mouvements")
 
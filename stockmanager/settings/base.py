@@ -20,11 +20,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête : la durée mesurée comprend les autres middlewares
+    "inventory.metriques.MiddlewareMetriques",
+    "inventory.requetes_lentes.MiddlewareRequetesLentes",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Après l'authentification : le profilage est réservé au staff
+    "inventory.profilage.MiddlewareProfilage",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -33,7 +38,8 @@ ROOT_URLCONF = "stockmanager.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates avec mesure du temps de rendu (inventory/metriques.py)
+        "BACKEND": "inventory.metriques.DjangoTemplatesMesures",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -76,5 +82,86 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# Cache partagé entre les workers gunicorn (fichiers, sans service externe).
+# inventory.cache_stock y range les calculs de stock sous des clés versionnées.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
+}
+
+# Profil SQLite de production (activé par production.py, mesuré par
+# benchmarks/sqlite_concurrence.py). Les transactions prennent le verrou
+# d'écriture dès le BEGIN (IMMEDIATE) pour que l'attente s'applique au lieu
+# d'un « database is locked » immédiat ; WAL évite que les lecteurs
+# bloquent pendant les écritures. Maintenance : `manage.py sqlite_maintenance`.
+SQLITE_OPTIONS_PRODUCTION = {
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+SQLITE_PRAGMAS_PRODUCTION = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 268435456,  # 256 Mo
+    "cache_size": -65536,  # 64 Mo (valeur négative = Kio)
+    "temp_store": "MEMORY",
+}
+# PRAGMA appliqués à chaque connexion (inventory.signals.appliquer_pragmas_sqlite)
+SQLITE_PRAGMAS = {}
+
+# Écriture groupée des mouvements saisis (inventory/ecriture_groupee.py) :
+# les saisies simultanées d'un worker sont validées ensemble, au plus tard
+# après FENETRE_MS millisecondes ou TAILLE_MAX mouvements. Désactivée par
+# défaut ; utile avec des workers gunicorn à plusieurs threads. Au-delà de
+# ATTENTE_MAX secondes, un mouvement encore en file est annulé et la requête
+# échoue ; un mouvement déjà en cours d'écriture est attendu jusqu'au bout.
+ECRITURE_GROUPEE = {
+    "ACTIF": False,
+    "FENETRE_MS": 20,
+    "TAILLE_MAX": 50,
+    "ATTENTE_MAX": 30,
+}
+
+# Lectures des vues de consultation sur l'alias « lecture » s'il existe
+# (voir inventory/routers.py), tout le reste sur « default »
+DATABASE_ROUTERS = ["inventory.routers.RouteurLectureEcriture"]
+
+# Mesures par vue (inventory/metriques.py) : en-tête Server-Timing et
+# histogrammes servis par /metrics. Avec FICHIER, les workers y versent
+# leurs histogrammes toutes les INTERVALLE secondes et /metrics les agrège.
+# /metrics est réservé au personnel connecté, ou aux requêtes portant
+# « Authorization: Bearer <JETON> » si JETON est renseigné.
+METRIQUES = {
+    "ACTIF": True,
+    "FICHIER": None,
+    "INTERVALLE": 10,
+    "JETON": "",
+}
+
+# Journal des requêtes SQL lentes (plus de SEUIL_MS) et des formes répétées
+# au moins REPETITIONS fois par requête HTTP (N+1), avec EXPLAIN QUERY PLAN
+# (inventory/requetes_lentes.py). Activé en production ; synthèse :
+# `manage.py requetes_lentes`.
+REQUETES_LENTES = {
+    "ACTIF": False,
+    "SEUIL_MS": 100,
+    "REPETITIONS": 10,
+    "FICHIER": None,
+}
+
+# Profilage cProfile à la demande (inventory/profilage.py) : ?profiler=1 pour
+# le staff connecté ou en-tête X-Profiler avec un jeton signé. Captures
+# (.prof, piles repliées .txt) listées sur /admin/profils/.
+PROFILAGE = {
+    "ACTIF": True,
+    "DOSSIER": BASE_DIR / "logs" / "profiles",
+    "CONSERVER": 200,
+    "DUREE_JETON": 3600,
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
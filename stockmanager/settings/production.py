@@ -29,12 +29,53 @@ extra_hosts = os.environ.get('ALLOWED_HOST', '')
 if extra_hosts:
     ALLOWED_HOSTS += [h.strip() for h in extra_hosts.split(',') if h.strip()]
 
-# Database de production (toujours SQLite pour ce projet)
+# Database de production (toujours SQLite pour ce projet), avec le profil
+# SQLite de production défini dans base.py : connexions persistantes
+# vérifiées avant réutilisation, WAL et PRAGMA appliqués à chaque connexion.
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": SQLITE_OPTIONS_PRODUCTION,
+    },
+    # Même fichier, connexion en lecture seule pour les vues de consultation
+    "lecture": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"timeout": SQLITE_OPTIONS_PRODUCTION["timeout"]},
+        "PRAGMAS": {"query_only": "ON"},
+    },
+}
+SQLITE_PRAGMAS = SQLITE_PRAGMAS_PRODUCTION
+
+# Écriture groupée des mouvements, activée par ECRITURE_GROUPEE=1 (avec
+# THREADS > 1 dans docker-compose.yml)
+ECRITURE_GROUPEE = {
+    **ECRITURE_GROUPEE,
+    "ACTIF": os.environ.get('ECRITURE_GROUPEE') == '1',
+    "FENETRE_MS": int(os.environ.get('ECRITURE_GROUPEE_FENETRE_MS', 20)),
+}
+
+# Histogrammes de tous les workers agrégés dans logs/ ; /metrics accessible
+# au collecteur par METRIQUES_JETON (Authorization: Bearer <jeton>), sinon
+# au personnel connecté seulement
+METRIQUES = {
+    **METRIQUES,
+    "FICHIER": LOGS_DIR / "metriques.sqlite3",
+    "JETON": os.environ.get('METRIQUES_JETON', ''),
+}
+
+# Requêtes SQL lentes et N+1 en JSONL tournant dans logs/ (handler
+# « requetes_lentes » ci-dessous)
+REQUETES_LENTES = {
+    **REQUETES_LENTES,
+    "ACTIF": True,
+    "SEUIL_MS": int(os.environ.get('REQUETES_LENTES_SEUIL_MS', 100)),
+    "FICHIER": LOGS_DIR / "requetes_lentes.jsonl",
 }
 
 # Configuration des fichiers statiques pour la production
@@ -49,12 +90,26 @@ X_FRAME_OPTIONS = 'DENY'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'jsonl': {
+            'format': '%(message)s',
+        },
+    },
     'handlers': {
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'logs' / 'prod.txt',
         },
+        'requetes_lentes': {
+            'level': 'WARNING',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': REQUETES_LENTES['FICHIER'],
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'formatter': 'jsonl',
+        },
     },
     'loggers': {
         'django': {
@@ -62,5 +117,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'inventory.requetes_lentes': {
+            'handlers': ['requetes_lentes'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
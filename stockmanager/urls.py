@@ -20,7 +20,20 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from inventory import views as inventory_views
+
 urlpatterns = [
+    # Captures du profilage à la demande (inventory/profilage.py)
+    path(
+        "admin/profils/",
+        admin.site.admin_view(inventory_views.liste_profils),
+        name="liste_profils",
+    ),
+    path(
+        "admin/profils/<str:identifiant>.<str:extension>",
+        admin.site.admin_view(inventory_views.telecharger_profil),
+        name="telecharger_profil",
+    ),
     path("admin/", admin.site.urls),
     path("", include("inventory.urls")),
 ]